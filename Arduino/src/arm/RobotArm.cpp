@@ -4,6 +4,9 @@
  * * This file contains the core logic for parsing the 4-byte binary protocol
  * using a finite state machine. It validates packets and controls the
  * ServoController. This replaces the CommandParser.
+ * * It also accepts a multi-servo "frame" packet that carries only the
+ * joints that changed since the previous frame:
+ * [0xFF, FRAME_MARKER, SEQ, MASK, ANGLE (one per set bit, ascending)..., CHECKSUM]
  */
 
 #include "RobotArm.h"
@@ -21,13 +24,21 @@ static ServoController servoController;
 // Define the "magic number" that starts every packet
 #define PACKET_HEADER 0xFF
 
+// Marks a multi-servo frame. Single-servo packets use 0-5 in this position,
+// so any value >= SERVO_COUNT can never be confused with a servo index.
+#define PACKET_FRAME_MARKER 0xF0
+
 // Define the states for our finite state machine
 enum PacketReadState
 {
     WAITING_FOR_HEADER, // State 0: Waiting for 0xFF
     READING_INDEX,      // State 1: Waiting for Servo Index byte
     READING_ANGLE,      // State 2: Waiting for Angle byte
-    READING_CHECKSUM    // State 3: Waiting for Checksum byte
+    READING_CHECKSUM,   // State 3: Waiting for Checksum byte
+    READING_FRAME_SEQ,  // Frame: Waiting for Sequence byte
+    READING_FRAME_MASK, // Frame: Waiting for joint bit mask
+    READING_FRAME_ANGLES, // Frame: Waiting for one angle per set mask bit
+    READING_FRAME_CHECKSUM // Frame: Waiting for Checksum byte
 };
 
 // ---- Module-Private (static) Variables ----
@@ -42,6 +53,61 @@ static PacketReadState currentState = WAITING_FOR_HEADER;
 // [3] = Checksum
 static uint8_t packet_buffer[4];
 
+// Buffers for an incoming multi-servo frame
+static uint8_t frame_seq = 0;
+static uint8_t frame_mask = 0;
+static uint8_t frame_angles[SERVO_COUNT];
+static uint8_t frame_angle_count = 0;    // Angles expected (set bits in mask)
+static uint8_t frame_angles_read = 0;    // Angles received so far
+static uint8_t frame_checksum = 0;       // Running sum of all bytes so far
+
+// ---------------------------------
+// ---- Private Helper Functions ----
+// ---------------------------------
+
+/**
+ * @brief Counts the set bits of the joint mask (one angle byte per bit).
+ */
+static uint8_t countMaskBits(uint8_t mask)
+{
+    uint8_t count = 0;
+    while (mask)
+    {
+        count += mask & 1;
+        mask >>= 1;
+    }
+    return count;
+}
+
+/**
+ * @brief Validates and applies a completed frame, then acknowledges it.
+ */
+static void applyFrame()
+{
+    // Validate every angle before moving anything (all-or-nothing)
+    for (uint8_t i = 0; i < frame_angle_count; i++)
+    {
+        if (frame_angles[i] > 180)
+        {
+            Serial.println("ERR: Invalid data range");
+            return;
+        }
+    }
+
+    uint8_t next = 0;
+    for (uint8_t servoIndex = 0; servoIndex < SERVO_COUNT; servoIndex++)
+    {
+        if (frame_mask & (1 << servoIndex))
+        {
+            servoController.setAngle(servoIndex, frame_angles[next++]);
+        }
+    }
+
+    // Acknowledge with the sequence number so the host can match it
+    Serial.print("ACK:");
+    Serial.println(frame_seq);
+}
+
 // ---------------------------------
 // ---- Public Function Implementations ----
 // ---------------------------------
@@ -90,6 +156,13 @@ void processRobotArmByte(uint8_t incomingByte)
      * State 1: Waiting for the Servo Index
      */
     case READING_INDEX:
+        if (incomingByte == PACKET_FRAME_MARKER)
+        {
+            // Multi-servo frame instead of a single-servo packet
+            frame_checksum = (uint8_t)(PACKET_HEADER + incomingByte);
+            currentState = READING_FRAME_SEQ;
+            break;
+        }
         // This is the 2nd byte (Servo Index)
         packet_buffer[1] = incomingByte;
         currentState = READING_ANGLE; // Move to the next state
@@ -154,6 +227,63 @@ void processRobotArmByte(uint8_t incomingByte)
         currentState = WAITING_FOR_HEADER;
         break;
 
+    /**
+     * Frame: Sequence number (echoed back in the ACK)
+     */
+    case READING_FRAME_SEQ:
+        frame_seq = incomingByte;
+        frame_checksum += incomingByte;
+        currentState = READING_FRAME_MASK;
+        break;
+
+    /**
+     * Frame: Joint bit mask (bit i = servo i is included)
+     */
+    case READING_FRAME_MASK:
+        frame_mask = incomingByte;
+        frame_checksum += incomingByte;
+        frame_angle_count = countMaskBits(frame_mask);
+        frame_angles_read = 0;
+
+        if (frame_mask >= (1 << SERVO_COUNT) || frame_angle_count == 0)
+        {
+            // Mask names a servo that does not exist (or no servo at all)
+            Serial.println("ERR: Invalid data range");
+            currentState = WAITING_FOR_HEADER;
+        }
+        else
+        {
+            currentState = READING_FRAME_ANGLES;
+        }
+        break;
+
+    /**
+     * Frame: One angle byte per set mask bit, in ascending servo order
+     */
+    case READING_FRAME_ANGLES:
+        frame_angles[frame_angles_read++] = incomingByte;
+        frame_checksum += incomingByte;
+        if (frame_angles_read == frame_angle_count)
+        {
+            currentState = READING_FRAME_CHECKSUM;
+        }
+        break;
+
+    /**
+     * Frame: Checksum (sum of every previous byte, truncated to 8 bits)
+     */
+    case READING_FRAME_CHECKSUM:
+        if (frame_checksum == incomingByte)
+        {
+            applyFrame();
+        }
+        else
+        {
+            Serial.println("ERR: Checksum mismatch");
+        }
+        currentState = WAITING_FOR_HEADER;
+        break;
+
     /**
      * Default case (should never happen)
      */
@@ -0,0 +1,113 @@
+"""
+bench_camera.py
+フレーム取り込みのベンチマーク: 旧 get_frame (capture_array + cvtColor で毎回確保)
+vs リングバッファ (カメラのバッファからリングへ直接変換)
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.bench_camera              (合成フレームで変換部分だけを比較)
+    python -m benchmarks.bench_camera --camera     (実機カメラで取り込み込みの比較)
+    python -m benchmarks.bench_camera --frames 500
+
+1フレームあたりの時間 [ms] と、tracemalloc で数えた新規確保 [MB] を表示する。
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import config
+
+
+def allocated_bytes_per_frame(fn, frames):
+    """1フレームあたりに新しく確保されるバイト数 (すぐ解放されるものも含む)"""
+    tracemalloc.start()
+    total = 0
+    for _ in range(frames):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - current
+    tracemalloc.stop()
+    return total / frames
+
+
+def measure(label, fn, frames):
+    """fn を frames 回呼び、1フレームあたりの時間と確保量を表示する"""
+    for _ in range(5):  # ウォームアップ
+        fn()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    per_frame_ms = (time.perf_counter() - start) / frames * 1000
+
+    # (tracemalloc は遅くなるので、時間とは別に数える)
+    alloc_mb = allocated_bytes_per_frame(fn, min(frames, 50)) / 1e6
+    print(f"[Bench] {label:<24}: {per_frame_ms:7.3f} ms/フレーム  確保 {alloc_mb:6.2f} MB/フレーム")
+    return per_frame_ms
+
+
+def bench_synthetic(width, height, frames, ring_size):
+    """カメラを使わず、XRGB8888 (メモリ上は BGRX) のバッファから変換部分だけを比較する"""
+    rng = np.random.default_rng(0)
+    dma_buffer = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+    ring = np.empty((ring_size, height, width, 3), dtype=np.uint8)
+    index = [0]
+
+    def old_path():
+        frame_xrgb = dma_buffer.copy()  # capture_array() 相当のコピー
+        return cv2.cvtColor(frame_xrgb, cv2.COLOR_RGB2BGR)  # 新しい配列を確保
+
+    def ring_path():
+        frame = ring[index[0]]
+        index[0] = (index[0] + 1) % ring_size
+        cv2.cvtColor(dma_buffer, cv2.COLOR_BGRA2BGR, dst=frame)
+        return frame
+
+    # 旧実装は 4ch の BGRX に RGB2BGR をかけていたので、結果は R と B が入れ替わった画像だった
+    old = old_path()
+    new = ring_path()
+    print(f"[Bench] 合成フレーム {width}x{height}  旧実装の出力が BGR と一致: {np.array_equal(old, new)}"
+          f"  (新実装は X を落とすだけで BGR)")
+
+    t_old = measure("旧: コピー + cvtColor", old_path, frames)
+    t_new = measure("新: リングへ直接変換", ring_path, frames)
+    print(f"[Bench] 1フレームあたり {t_old - t_new:.3f} ms 短縮 (1フレーム = {width * height * 3 / 1e6:.2f} MB)")
+
+
+def bench_camera(width, height, frames, ring_size):
+    """実機カメラで、旧 get_frame と新 get_frame を比較する"""
+    from src.hardware.camera import Camera
+
+    cam = Camera(config.CAMERA_ID, width, height, ring_size=ring_size)
+    try:
+        def old_get_frame():
+            frame_rgb = cam.picam2.capture_array("main")
+            return cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+
+        t_old = measure("旧 get_frame", old_get_frame, frames)
+        t_new = measure("新 get_frame (リング)", cam.get_frame, frames)
+        print(f"[Bench] 1フレームあたり {t_old - t_new:.3f} ms 短縮 (フレーム待ちの時間を含む)")
+    finally:
+        cam.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300, help="計測するフレーム数")
+    parser.add_argument("--camera", action="store_true", help="実機カメラで計測する")
+    args = parser.parse_args()
+
+    width, height = config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT
+    if args.camera:
+        bench_camera(width, height, args.frames, config.CAMERA_FRAME_RING_SIZE)
+    else:
+        bench_synthetic(width, height, args.frames, config.CAMERA_FRAME_RING_SIZE)
+
+
+if __name__ == "__main__":
+    main()
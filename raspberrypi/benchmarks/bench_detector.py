@@ -0,0 +1,130 @@
+"""
+bench_detector.py
+検出器バックエンドのベンチマーク: PyTorch (ultralytics / torch.hub) vs ONNX Runtime
+(src/processing/detector.py)
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.bench_detector --export        (YOLO_MODEL_PATH から固定サイズの ONNX を作る)
+    python -m benchmarks.bench_detector                 (ultralytics と onnxruntime を比較)
+    python -m benchmarks.bench_detector --backends yolov5_hub onnxruntime --frames 100
+    python -m benchmarks.bench_detector --images path/to/images
+
+1フレームあたりの時間 (平均 / p50 / p95) [ms] と FPS、
+最初のバックエンドとの検出結果の一致 (IoU >= 0.5 で対応が取れた割合) を表示する。
+フレームは検証用の画像 (無ければ乱数の合成画像) をカメラの解像度にして使う。
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+import config
+from src.processing.detector import BACKEND_ONNX, BACKEND_ULTRALYTICS, create_detector, inference_threads
+
+DEFAULT_IMAGE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "ai-models", "object-detection", "yolov5", "dataset", "valid", "images",
+)
+
+
+def load_frames(image_dir, width, height, count):
+    """検証用の画像をカメラの解像度の BGR フレームにして返す (無ければ合成画像)"""
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+    frames = [cv2.resize(cv2.imread(p), (width, height)) for p in paths[:count]]
+    if frames:
+        print(f"[Bench] 画像 {len(frames)} 枚を使用 ({image_dir})")
+        return frames
+    print(f"[Bench] 画像が見つからないため合成フレームを使用 ({image_dir})")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8) for _ in range(8)]
+
+
+def export_onnx(model_path, output_path, imgsz):
+    """ultralytics で固定入力サイズの ONNX をエクスポートする"""
+    from ultralytics import YOLO
+
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        os.replace(exported, output_path)
+    print(f"[Bench] ONNX をエクスポートしました: {output_path} (入力 {imgsz}x{imgsz})")
+
+
+def box_iou(a, b):
+    """(N, 4) x (M, 4) の IoU 行列"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def agreement(reference, other):
+    """基準の検出のうち、同じクラスで IoU >= 0.5 の検出が相手にもある割合"""
+    if len(reference) == 0:
+        return 1.0 if len(other) == 0 else 0.0
+    if len(other) == 0:
+        return 0.0
+    iou = box_iou(reference.boxes, other.boxes)
+    iou[reference.class_ids[:, None] != other.class_ids[None, :]] = 0.0
+    return float(np.mean(iou.max(axis=1) >= 0.5))
+
+
+def measure(backend, frames, count):
+    """1つのバックエンドで count フレーム推論し、時間と検出結果を返す"""
+    detector = create_detector(backend)
+    try:
+        for frame in frames[:3]:  # ウォームアップ
+            detector.detect(frame)
+
+        times_ms = np.empty(count)
+        results = []
+        for i in range(count):
+            frame = frames[i % len(frames)]
+            start = time.perf_counter()
+            detections = detector.detect(frame)
+            times_ms[i] = (time.perf_counter() - start) * 1000
+            if i < len(frames):
+                results.append(detections)
+    finally:
+        detector.close()
+    return times_ms, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=[BACKEND_ULTRALYTICS, BACKEND_ONNX],
+                        help="比較するバックエンド (最初のものを基準にする)")
+    parser.add_argument("--frames", type=int, default=200, help="計測するフレーム数")
+    parser.add_argument("--images", default=DEFAULT_IMAGE_DIR, help="入力に使う画像のディレクトリ")
+    parser.add_argument("--export", action="store_true", help="YOLO_MODEL_PATH から ONNX をエクスポートして終了")
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx(config.YOLO_MODEL_PATH, config.DETECTOR_ONNX_MODEL_PATHS["fp32"], config.DETECTOR_INPUT_SIZE)
+        return
+
+    width, height = config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT
+    frames = load_frames(args.images, width, height, args.frames)
+    print(f"[Bench] 推論スレッド数: {inference_threads()} (残すコア数 {config.DETECTOR_RESERVED_CORES})")
+
+    reference = None
+    for backend in args.backends:
+        times_ms, results = measure(backend, frames, args.frames)
+        p50, p95 = np.percentile(times_ms, [50, 95])
+        line = (f"[Bench] {backend:<12}: 平均 {times_ms.mean():7.2f} ms  p50 {p50:7.2f} ms  "
+                f"p95 {p95:7.2f} ms  {1000 / times_ms.mean():6.2f} FPS")
+        if reference is None:
+            reference = results
+        else:
+            match = np.mean([agreement(r, o) for r, o in zip(reference, results)])
+            line += f"  一致率 {match * 100:5.1f}% (対 {args.backends[0]})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+bench_ik.py
+KinematicsSolver のベンチマーク: 1点ずつのループ vs calculate_ik_batch
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.bench_ik
+    python -m benchmarks.bench_ik --n 10000 --repeat 5
+    python -m benchmarks.bench_ik --lookup   (事前計算テーブルも比較)
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import config
+from src.processing.kinematics import KinematicsSolver
+
+
+def reference_calculate_ik(solver, x, y, z):
+    """
+    ベクトル化前の1点版IK (比較用。計算内容は旧 calculate_ik と同一)
+    """
+    try:
+        theta_0_deg = np.degrees(np.arctan2(y, x))
+        r = np.sqrt(x**2 + y**2)
+        z_prime = z - solver.base_height
+        d_squared = r**2 + z_prime**2
+        d = np.sqrt(d_squared)
+        if d > solver.l1_plus_l2 or d < solver.l1_minus_l2_abs:
+            return None
+        cos_phi_2_arg = np.clip((solver.l1**2 + solver.l2**2 - d_squared) / (2 * solver.l1 * solver.l2), -1.0, 1.0)
+        theta_2_deg = np.degrees(np.pi - np.arccos(cos_phi_2_arg))
+        alpha_rad = np.arctan2(z_prime, r)
+        cos_beta_arg = np.clip((solver.l1**2 + d_squared - solver.l2**2) / (2 * solver.l1 * d), -1.0, 1.0)
+        theta_1_deg = np.degrees(alpha_rad + np.arccos(cos_beta_arg))
+        return {
+            "base":     int(np.clip(theta_0_deg, 0, 180)),
+            "shoulder": int(np.clip(theta_1_deg, 0, 180)),
+            "elbow":    int(np.clip(theta_2_deg, 0, 180))
+        }
+    except Exception:
+        return None
+
+
+def random_targets(solver, n, seed=0):
+    """アームの作業空間を少しはみ出す範囲で (N, 3) の目標点を生成する"""
+    rng = np.random.default_rng(seed)
+    reach = solver.l1_plus_l2 * 1.1
+    targets = rng.uniform(-reach, reach, size=(n, 3))
+    targets[:, 2] += solver.base_height
+    return targets
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=10000, help="目標点の数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数 (最速値を採用)")
+    parser.add_argument("--lookup", action="store_true", help="事前計算テーブル (lookup_ik_batch) も計測する")
+    args = parser.parse_args()
+
+    solver = KinematicsSolver(config.ARM_L1_CM, config.ARM_L2_CM, config.ARM_BASE_HEIGHT_CM)
+    targets = random_targets(solver, args.n)
+
+    # --- 正しさの確認: 旧1点版と結果が一致すること ---
+    angles, reachable = solver.calculate_ik_batch(targets)
+    mismatches = 0
+    for i, (x, y, z) in enumerate(targets):
+        expected = reference_calculate_ik(solver, x, y, z)
+        if expected is None:
+            mismatches += bool(reachable[i])
+        elif not reachable[i] or [expected["base"], expected["shoulder"], expected["elbow"]] != angles[i].astype(int).tolist():
+            mismatches += 1
+    print(f"[Bench] N={args.n}  到達可能: {int(reachable.sum())}  旧実装との不一致: {mismatches}")
+
+    # --- 速度 ---
+    t_loop = best_of(args.repeat, lambda: [reference_calculate_ik(solver, x, y, z) for x, y, z in targets])
+    t_batch = best_of(args.repeat, lambda: solver.calculate_ik_batch(targets))
+
+    print(f"[Bench] 1点ずつのループ : {t_loop * 1000:9.2f} ms  ({args.n / t_loop:12,.0f} 点/秒)")
+    print(f"[Bench] バッチ (N,3)    : {t_batch * 1000:9.2f} ms  ({args.n / t_batch:12,.0f} 点/秒)")
+    print(f"[Bench] スループット比  : {t_loop / t_batch:.0f}x")
+
+    if args.lookup:
+        solver.build_lookup_table(config.IK_LOOKUP_CACHE_DIR, config.IK_LOOKUP_RESOLUTION_CM)
+        lut_angles, lut_reachable = solver.lookup_ik_batch(targets)
+        both = reachable & lut_reachable
+        max_err = np.max(np.abs(lut_angles[both] - angles[both])) if both.any() else 0.0
+        t_lut = best_of(args.repeat, lambda: solver.lookup_ik_batch(targets))
+        print(f"[Bench] テーブル補間    : {t_lut * 1000:9.2f} ms  ({args.n / t_lut:12,.0f} 点/秒)"
+              f"  到達判定の不一致: {int((reachable != lut_reachable).sum())}  最大誤差: {max_err:.2f}度")
+
+
+if __name__ == "__main__":
+    main()
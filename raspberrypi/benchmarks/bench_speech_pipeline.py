@@ -0,0 +1,134 @@
+"""
+bench_speech_pipeline.py
+音声パイプライン (src/core/speech_pipeline.py) を、マイクと OpenAI の代わりに
+合成音声と代役サーバー (benchmarks/speech_stub_server.py) で動かし、
+「発話の終わり -> 指示の送信」までの時間を測る。
+
+- 合成音声: 雑音の発話 (--utterance-s 秒) と無音 (--gap-s 秒) を --utterances 回くり返す
+            実際のマイクと同じく、ブロック (config.AUDIO_BLOCK_MS) ごとに実時間で流し込む
+- 比較用に、従来の順番に処理する方式 (無音 AUDIO_SILENCE_DURATION 秒で録音終了 -> 認識 -> LLM、
+  その間マイクは止まる) の待ち時間も同じ遅延から見積もって表示する
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.bench_speech_pipeline
+    python -m benchmarks.bench_speech_pipeline --stt-delay 1.5 --llm-delay 2.0 --gap-s 1.0
+    python -m benchmarks.bench_speech_pipeline --base-url http://192.168.0.10:8001/v1   (別のサーバーを使う)
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+import numpy as np
+from openai import AsyncOpenAI
+
+import config
+from benchmarks.speech_stub_server import start_server
+from src.core.speech_pipeline import SpeechClient, SpeechPipeline
+from src.processing.vad import StreamingVad
+
+
+def synth_audio(samplerate, utterances, utterance_s, gap_s, seed=0):
+    """
+    雑音の発話と無音を交互に並べた int16 の音声
+    @return (tuple): (音声 (N, 1) int16, 各発話の終わりの時刻 [秒] のリスト)
+    """
+    rng = np.random.default_rng(seed)
+    pieces, ends, t = [], [], 0.0
+    for _ in range(utterances):
+        silence = rng.normal(0, 30, int(gap_s * samplerate))          # 周囲の雑音 (小)
+        speech = rng.normal(0, 3000, int(utterance_s * samplerate))   # 発話 (大)
+        pieces += [silence, speech]
+        t += gap_s + utterance_s
+        ends.append(t)
+    pieces.append(rng.normal(0, 30, int(2.5 * samplerate)))
+    audio = np.clip(np.concatenate(pieces), -32768, 32767).astype(np.int16)
+    return audio.reshape(-1, 1), ends
+
+
+def feed_audio(pipeline, audio, block_samples, samplerate, start_event):
+    """(マイクの代わり) ブロックごとに実時間でリングバッファへ書き込む"""
+    start_event.wait()
+    started = time.perf_counter()
+    for i, offset in enumerate(range(0, len(audio), block_samples)):
+        delay = started + (i + 1) * block_samples / samplerate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pipeline.ring.write(audio[offset:offset + block_samples])
+        pipeline.on_block(pipeline.ring.end)
+    time.sleep(0.5)
+    pipeline.stop()
+
+
+async def run_pipeline(args, audio, samplerate):
+    client = AsyncOpenAI(api_key="stub", base_url=args.base_url)
+    speech = SpeechClient(client, config.STT_MODEL, config.LLM_MODEL, config.STT_LANGUAGE)
+    dispatched = []
+    vad = StreamingVad(
+        samplerate, config.AUDIO_SILENCE_THRESHOLD, config.AUDIO_VAD_END_SILENCE_S, config.AUDIO_VAD_MIN_SPEECH_S,
+        config.AUDIO_VAD_PRE_ROLL_S, config.AUDIO_VAD_MAX_UTTERANCE_S, config.AUDIO_VAD_NOISE_RATIO,
+    )
+    pipeline = SpeechPipeline(
+        speech, lambda task: dispatched.append((time.perf_counter(), task)), samplerate, 1,
+        config.AUDIO_RING_SECONDS, vad, config.SPEECH_MAX_CONCURRENT_REQUESTS,
+    )
+    block_samples = int(samplerate * config.AUDIO_BLOCK_MS / 1000)
+    start_event = threading.Event()
+    feeder = threading.Thread(target=feed_audio, args=(pipeline, audio, block_samples, samplerate, start_event), daemon=True)
+    feeder.start()
+
+    run = asyncio.create_task(pipeline.run())
+    await asyncio.sleep(0.05)  # run() がリングバッファの読み始めを決めてから流し込む
+    started = time.perf_counter()
+    start_event.set()
+    await run
+    await client.close()
+    return started, dispatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="代役サーバーの URL (省略時はこのスクリプト内で起動する)")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--stt-delay", type=float, default=0.8)
+    parser.add_argument("--llm-delay", type=float, default=1.2)
+    parser.add_argument("--utterances", type=int, default=4)
+    parser.add_argument("--utterance-s", type=float, default=1.5)
+    parser.add_argument("--gap-s", type=float, default=1.5, help="発話の間の無音 [秒]")
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url is None:
+        server = start_server(port=args.port, stt_delay=args.stt_delay, llm_delay=args.llm_delay)
+        args.base_url = f"http://127.0.0.1:{args.port}/v1"
+
+    samplerate = config.AUDIO_SAMPLE_RATE
+    audio, speech_ends = synth_audio(samplerate, args.utterances, args.utterance_s, args.gap_s)
+    print(f"[Bench] 合成音声 {len(audio) / samplerate:.1f} 秒 ({args.utterances} 発話) を実時間で流します "
+          f"(認識 {args.stt_delay:.1f} s + LLM {args.llm_delay:.1f} s の代役: {args.base_url})")
+
+    started, dispatched = asyncio.run(run_pipeline(args, audio, samplerate))
+    if server is not None:
+        server.shutdown()
+
+    print(f"\n{'発話':>4} {'発話の終わり':>12} {'指示':>10} {'遅れ':>10}  指示の内容")
+    latencies = []
+    for i, (speech_end, (at, task)) in enumerate(zip(speech_ends, dispatched)):
+        latency = at - started - speech_end
+        latencies.append(latency)
+        print(f"{i + 1:>4} {speech_end:>10.2f} s {at - started:>8.2f} s {latency:>8.2f} s  {task}")
+    if len(dispatched) != len(speech_ends):
+        print(f"[Bench] Warning: 指示の数 ({len(dispatched)}) が発話の数 ({len(speech_ends)}) と違います。")
+
+    # 従来の方式の見積もり: 無音 AUDIO_SILENCE_DURATION 秒で録音終了 -> 認識 -> LLM (その間は次の発話を聞けない)
+    serial_latency = config.AUDIO_SILENCE_DURATION + args.stt_delay + args.llm_delay
+    missed = args.gap_s < args.stt_delay + args.llm_delay + config.AUDIO_SILENCE_DURATION - args.utterance_s
+    if latencies:
+        print(f"\n[Bench] 発話の終わり -> 指示: 平均 {np.mean(latencies):.2f} s / 最大 {np.max(latencies):.2f} s")
+    print(f"[Bench] (参考) 従来の方式: 1発話あたり約 {serial_latency:.2f} s"
+          + (" / 発話の間隔が短く、処理中の発話は聞き逃す" if missed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+calibrate_hand_eye.py
+test_integrated_sys のスナップショットのログ (calibration_data_log.jsonl) から、
+カメラの内部・外部パラメータと IR の距離カーブをまとめて求め、キャリブレーションファイルに保存する。
+(計算は src/processing/calibration.py)
+
+スナップショットの撮り方:
+    GUI でグリッパー先端をターゲット (検出されている物体) に合わせてから「スナップショット」を押す。
+    画面の色々な位置・距離で 15 件以上撮る (同じような姿勢ばかりだと解が定まらない)
+
+結果は models/calibration/calibration_<日時>.json に保存し、
+config.CALIBRATION_PATH (起動時に CameraModel.from_config() が読むファイル) にもコピーする。
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.calibrate_hand_eye --log path/to/calibration_data_log.jsonl
+    python -m benchmarks.calibrate_hand_eye --log ... --fit-distortion   (k1, k2 も求める。30 件以上推奨)
+    python -m benchmarks.calibrate_hand_eye --log ... --dry-run          (保存しない)
+"""
+
+import argparse
+
+import numpy as np
+
+import config
+from src.processing.calibration import (
+    DEFAULT_IR_CURVE, fit_calibration, load_calibration, load_snapshots, save_calibration,
+)
+from src.processing.camera_model import make_transform
+
+MIN_SNAPSHOTS = 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="calibration_data_log.jsonl", help="/api/snapshot_log が書いたログ")
+    parser.add_argument("--angles-key", default="user_angles", choices=["user_angles", "arduino_angles"],
+                        help="関節角度に使う列 (IK と同じ角度の定義なのは user_angles)")
+    parser.add_argument("--fit-distortion", action="store_true", help="歪み係数 k1, k2 も求める")
+    parser.add_argument("--from-current", action="store_true",
+                        help="初期値を config.py ではなく今のキャリブレーションファイルにする")
+    parser.add_argument("--dry-run", action="store_true", help="結果を表示するだけで保存しない")
+    args = parser.parse_args()
+
+    snapshots = load_snapshots(args.log, args.angles_key)
+    n = len(snapshots["ir_raw"])
+    print(f"[Calibrate] {args.log}: {n} 件のスナップショット")
+    if n < MIN_SNAPSHOTS:
+        print(f"[Calibrate] Error: スナップショットが少なすぎます (最低 {MIN_SNAPSHOTS} 件)。")
+        return
+
+    # --- 初期値 ---
+    current = (load_calibration() if args.from_current else None) or {}
+    K = np.array([
+        [config.CAMERA_FOCAL_LENGTH_X, 0.0, config.CAMERA_CENTER_X],
+        [0.0, config.CAMERA_FOCAL_LENGTH_Y, config.CAMERA_CENTER_Y],
+        [0.0, 0.0, 1.0],
+    ])
+    dist = np.asarray(config.CAMERA_DISTORTION_COEFFS, dtype=np.float64)
+    T = make_transform(config.CAMERA_ROTATION_ARM_FROM_CAM, config.CAMERA_TRANSLATION_ARM_FROM_CAM_CM)
+    ir_curve = current.get("ir_curve", DEFAULT_IR_CURVE)
+    if "camera" in current:
+        K = np.array(current["camera"]["K"])
+        dist = np.array(current["camera"]["dist"])
+        T = np.array(current["camera"]["T_arm_cam"])
+
+    result = fit_calibration(snapshots, K, dist, T, ir_curve, fit_distortion=args.fit_distortion)
+    result["source_log"] = args.log
+    result["angles_key"] = args.angles_key
+
+    # --- 結果 ---
+    rms = result["rms"]
+    camera = result["camera"]
+    print(f"[Calibrate] {result['solver']['message']} (評価回数 {result['solver']['nfev']})")
+    print(f"  再投影誤差 RMS : {rms['pixel_before']:7.2f} px -> {rms['pixel_after']:7.2f} px")
+    print(f"  距離誤差 RMS   : {rms['range_cm_before']:7.2f} cm -> {rms['range_cm_after']:7.2f} cm")
+    print(f"  fx, fy = {camera['K'][0][0]:.1f}, {camera['K'][1][1]:.1f}   cx, cy = {camera['K'][0][2]:.1f}, {camera['K'][1][2]:.1f}")
+    if args.fit_distortion:
+        print(f"  k1, k2 = {camera['dist'][0]:.4f}, {camera['dist'][1]:.4f}")
+    print(f"  カメラ位置 (アーム座標) = {np.round(np.array(camera['T_arm_cam'])[:3, 3], 2)} cm")
+    curve = result["ir_curve"]
+    print(f"  IR カーブ: 距離 = {curve['a']:.1f} / (raw - {curve['b']:.2f}) - {curve['c']:.2f}")
+
+    worst = np.argsort(result["per_snapshot"]["pixel_error"])[::-1][:3]
+    for i in worst:
+        print(f"  (誤差の大きいスナップショット) #{i}: {result['per_snapshot']['pixel_error'][i]:.1f} px, "
+              f"{result['per_snapshot']['range_error_cm'][i]:.1f} cm")
+
+    if args.dry_run:
+        return
+    path = save_calibration(result)
+    print(f"[Calibrate] 保存しました: {path}")
+    print(f"[Calibrate] 起動時に読むファイル: {config.CALIBRATION_PATH}")
+
+
+if __name__ == "__main__":
+    main()
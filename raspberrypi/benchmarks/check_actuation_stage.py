@@ -0,0 +1,88 @@
+"""
+check_actuation_stage.py
+駆動ステージ (src/core/pipeline.py の ActuationStage) が、軌道のストリーミング中・終了後に
+空回りしないことのチェック。実機は使わず、送信回数を数えるだけの代役の Arduino で動かす。
+
+- 未読の姿勢を command_slot に置いたまま start_trajectory() する (GRAB / STOP / 終了処理の直前に
+  submit_pose() が来た場合と同じ順番: put -> clear -> start_trajectory)
+- 軌道の間の send_frame() が stream_hz x 軌道の長さ 程度に収まること
+- 軌道が終わった後、新しい指令が無い間に send_frame() / refresh() が回り続けないこと
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.check_actuation_stage
+    python -m benchmarks.check_actuation_stage --duration 0.7 --stream-hz 50
+
+異常があれば終了コード 1 を返す。
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from src.core.latency import LatencyHistograms
+from src.core.pipeline import ActuationStage, LatestValueSlot
+from src.processing.trajectory import JointTrajectory
+
+
+class CountingArduino:
+    """send_frame() / refresh() の呼び出し回数を数えるだけの代役"""
+
+    def __init__(self):
+        self.frames = 0
+        self.refreshes = 0
+
+    def send_frame(self, angles):
+        self.frames += 1
+        return True
+
+    def refresh(self):
+        self.refreshes += 1
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=0.7, help="軌道の長さ [秒]")
+    parser.add_argument("--stream-hz", type=float, default=50.0)
+    parser.add_argument("--idle", type=float, default=0.5, help="軌道の後に様子を見る時間 [秒]")
+    args = parser.parse_args()
+
+    arduino = CountingArduino()
+    command_slot = LatestValueSlot()
+    stop_event = threading.Event()
+    stage = ActuationStage(arduino, command_slot, stop_event, args.stream_hz, LatencyHistograms())
+    stage.start()
+
+    # 未読の姿勢を置いたまま軌道を始める
+    command_slot.put([90] * 6)
+    trajectory = JointTrajectory([90] * 6, [120] * 6, args.duration)
+    stage.start_trajectory(trajectory)
+
+    deadline = time.time() + args.duration + 1.0
+    while stage.is_moving() and time.time() < deadline:
+        time.sleep(0.01)
+    moving_frames = arduino.frames
+    refreshes_before = arduino.refreshes
+    time.sleep(args.idle)
+    idle_frames = arduino.frames - moving_frames
+    idle_refreshes = arduino.refreshes - refreshes_before
+    stop_event.set()
+    stage.join(timeout=1.0)
+
+    # (軌道中は stream_hz で送る。終了後は 0.1 秒ごとに refresh() を呼ぶだけのはず)
+    expected_frames = args.duration * args.stream_hz
+    max_idle_refreshes = args.idle / 0.1 + 2
+    ok_moving = moving_frames <= expected_frames * 1.5 + 2
+    ok_idle = idle_frames == 0 and idle_refreshes <= max_idle_refreshes
+    print(f"[Actuation] 軌道 {args.duration:.2f} 秒: send_frame {moving_frames} 回 (目安 {expected_frames:.0f} 回)")
+    print(f"[Actuation] 終了後 {args.idle:.2f} 秒: send_frame {idle_frames} 回 / refresh {idle_refreshes} 回 "
+          f"(上限 {max_idle_refreshes:.0f} 回)")
+
+    ok = ok_moving and ok_idle and not stage.is_moving()
+    print("[Check] OK" if ok else "[Check] NG")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+check_fk_ik_roundtrip.py
+FK(IK(x)) の往復チェックと、解析ヤコビアンの数値微分チェック。
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.check_fk_ik_roundtrip
+    python -m benchmarks.check_fk_ik_roundtrip --n 100000 --tol 1e-6
+
+異常があれば終了コード 1 を返す。
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+import config
+from src.processing.forward_kinematics import ForwardKinematics
+from src.processing.kinematics import KinematicsSolver
+
+
+def check_roundtrip(solver, fk, n, tol, rng):
+    """到達可能な目標点について、IK -> FK で元の点に戻ることを確認する"""
+    reach = solver.l1_plus_l2
+    targets = rng.uniform(-reach, reach, size=(n, 3))
+    targets[:, 2] += solver.base_height
+
+    angles, reachable = solver.calculate_ik_batch(targets)
+
+    # 0/180度でクリップされた点は、そもそも関節の可動域外なので往復しない
+    inside = reachable & np.all((angles > 0.0) & (angles < 180.0), axis=1)
+    errors = np.linalg.norm(fk.wrist_positions(angles[inside]) - targets[inside], axis=1)
+
+    worst = errors.max() if errors.size else 0.0
+    print(f"[RoundTrip] 目標 {n} 点 / 到達可能 {int(reachable.sum())} / 可動域内 {int(inside.sum())}")
+    print(f"[RoundTrip] |FK(IK(x)) - x| 最大 {worst:.3e} cm / 平均 {errors.mean() if errors.size else 0.0:.3e} cm")
+    return worst <= tol
+
+
+def check_jacobian(fk, n, tol, rng, step_deg=1e-4):
+    """解析ヤコビアンと中心差分の数値ヤコビアンを比べる"""
+    q = rng.uniform(0.0, 180.0, size=(n, 4))
+    analytic = fk.jacobian(q)
+
+    numeric = np.empty_like(analytic)
+    for j in range(4):
+        dq = np.zeros(4)
+        dq[j] = step_deg
+        numeric[:, :, j] = (fk.tool_positions(q + dq) - fk.tool_positions(q - dq)) / (2 * step_deg)
+
+    worst = np.abs(analytic - numeric).max()
+    print(f"[Jacobian] {n} 姿勢 / 解析解と数値微分の差 最大 {worst:.3e} cm/度")
+    return worst <= tol
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=10000, help="サンプル数")
+    parser.add_argument("--tol", type=float, default=1e-6, help="許容誤差")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    solver = KinematicsSolver(config.ARM_L1_CM, config.ARM_L2_CM, config.ARM_BASE_HEIGHT_CM)
+    fk = ForwardKinematics(config.ARM_L1_CM, config.ARM_L2_CM, config.ARM_BASE_HEIGHT_CM, config.ARM_L3_CM)
+
+    ok = check_roundtrip(solver, fk, args.n, args.tol, rng)
+    ok &= check_jacobian(fk, min(args.n, 2000), args.tol, rng)
+
+    print("[Check] OK" if ok else "[Check] NG")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
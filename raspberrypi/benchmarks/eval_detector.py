@@ -0,0 +1,187 @@
+"""
+eval_detector.py
+検出モデルの精度と速度を同じ画像で並べて比較する (FP32 vs INT8 など)。
+
+- 精度: ラベル付きの検証データ (YOLO 形式の labels/*.txt) で mAP@0.5 と mAP@0.5:0.95
+        (COCO と同じ 101 点補間)。1つ目のモデルとの差 (Δ) も表示する
+- 速度: 1フレームあたりの推論時間 (平均 / p50 / p95) [ms] と FPS (前処理・NMS を含む)
+
+モデルは拡張子で実行方法を決める (.onnx -> OnnxDetector, .pt -> UltralyticsDetector)。
+INT8 の mAP@0.5 の低下が config.DETECTOR_INT8_MAX_MAP_DROP 以内なら、
+config.DETECTOR_ONNX_PRECISION = "int8" に切り替えてよい。
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.eval_detector                            (FP32 と INT8 の ONNX を比較)
+    python -m benchmarks.eval_detector --models models/best.pt models/best.onnx
+    python -m benchmarks.eval_detector --data path/to/dataset/valid
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+import config
+from benchmarks.bench_detector import box_iou
+from src.processing.detector import OnnxDetector, UltralyticsDetector
+
+DEFAULT_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "ai-models", "object-detection", "yolov5", "dataset", "valid",
+)
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+EVAL_CONF_THRESHOLD = 0.001  # mAP は低い信頼度まで含めて計算する
+
+
+def load_dataset(data_dir):
+    """
+    images/*.jpg と labels/*.txt ([class cx cy w h] 正規化座標) を読む
+    @return (list): [(BGR画像, (G, 4) xyxy 画素, (G,) クラスID), ...]
+    """
+    samples = []
+    for image_path in sorted(glob.glob(os.path.join(data_dir, "images", "*"))):
+        image = cv2.imread(image_path)
+        if image is None:
+            continue
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        label_path = os.path.join(data_dir, "labels", stem + ".txt")
+        labels = np.loadtxt(label_path, ndmin=2) if os.path.exists(label_path) else np.empty((0, 5))
+        labels = labels.reshape(-1, 5)
+
+        height, width = image.shape[:2]
+        cxcywh = labels[:, 1:] * [width, height, width, height]
+        boxes = np.concatenate([cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, :2] + cxcywh[:, 2:] / 2], axis=1)
+        samples.append((image, boxes.astype(np.float32), labels[:, 0].astype(np.int32)))
+    return samples
+
+
+def match_predictions(detections, gt_boxes, gt_classes):
+    """
+    各検出が IoU しきい値ごとに正解 (TP) かどうか
+    (信頼度の高い順に、同じクラスでまだ対応していない正解のうち IoU 最大のものと対応させる)
+    @return (ndarray): (N, len(IOU_THRESHOLDS)) bool
+    """
+    tp = np.zeros((len(detections), IOU_THRESHOLDS.size), dtype=bool)
+    if len(detections) == 0 or gt_boxes.shape[0] == 0:
+        return tp
+    iou = box_iou(detections.boxes, gt_boxes)
+    iou[detections.class_ids[:, None] != gt_classes[None, :]] = 0.0
+    order = np.argsort(-detections.confidences)
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        matched = np.zeros(gt_boxes.shape[0], dtype=bool)
+        for p in order:
+            candidates = np.where(matched, 0.0, iou[p])
+            j = int(np.argmax(candidates))
+            if candidates[j] >= threshold:
+                tp[p, t] = True
+                matched[j] = True
+    return tp
+
+
+def average_precision(tp, confidences, num_gt):
+    """1クラス分の AP (IoU しきい値ごと)。101 点補間"""
+    if num_gt == 0:
+        return None
+    if tp.shape[0] == 0:
+        return np.zeros(IOU_THRESHOLDS.size)
+    order = np.argsort(-confidences)
+    tp = tp[order]
+    ctp = np.cumsum(tp, axis=0)
+    cfp = np.cumsum(~tp, axis=0)
+    recall = ctp / num_gt
+    precision = ctp / (ctp + cfp)
+    # 適合率を右から見た最大値にする (包絡線)
+    precision = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+
+    points = np.linspace(0, 1, 101)
+    ap = np.empty(IOU_THRESHOLDS.size)
+    for t in range(IOU_THRESHOLDS.size):
+        idx = np.searchsorted(recall[:, t], points, side="left")
+        sampled = np.where(idx < recall.shape[0], precision[np.minimum(idx, recall.shape[0] - 1), t], 0.0)
+        ap[t] = sampled.mean()
+    return ap
+
+
+def evaluate(detector, samples):
+    """全画像で推論し、(mAP@0.5, mAP@0.5:0.95, 推論時間 [ms] の配列) を返す"""
+    for image, _, _ in samples[:3]:  # ウォームアップ
+        detector.detect(image)
+
+    times_ms = np.empty(len(samples))
+    tps, confidences, pred_classes, gt_classes = [], [], [], []
+    for i, (image, boxes, classes) in enumerate(samples):
+        start = time.perf_counter()
+        detections = detector.detect(image)
+        times_ms[i] = (time.perf_counter() - start) * 1000
+
+        tps.append(match_predictions(detections, boxes, classes))
+        confidences.append(detections.confidences)
+        pred_classes.append(detections.class_ids)
+        gt_classes.append(classes)
+
+    tp = np.concatenate(tps)
+    confidences = np.concatenate(confidences)
+    pred_classes = np.concatenate(pred_classes)
+    gt_classes = np.concatenate(gt_classes)
+
+    aps = []
+    for class_id in np.unique(gt_classes):
+        keep = pred_classes == class_id
+        ap = average_precision(tp[keep], confidences[keep], int(np.sum(gt_classes == class_id)))
+        if ap is not None:
+            aps.append(ap)
+    if not aps:
+        return 0.0, 0.0, times_ms
+    aps = np.array(aps)
+    return float(aps[:, 0].mean()), float(aps.mean()), times_ms
+
+
+def load_detector(model_path, iou_threshold):
+    if model_path.endswith(".onnx"):
+        return OnnxDetector(model_path, EVAL_CONF_THRESHOLD, iou_threshold)
+    return UltralyticsDetector(model_path, EVAL_CONF_THRESHOLD, iou_threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+",
+                        default=[config.DETECTOR_ONNX_MODEL_PATHS["fp32"], config.DETECTOR_ONNX_MODEL_PATHS["int8"]],
+                        help="比較するモデル (最初のものを基準にする)")
+    parser.add_argument("--data", default=DEFAULT_DATA_DIR, help="images/ と labels/ を持つディレクトリ")
+    args = parser.parse_args()
+
+    samples = load_dataset(args.data)
+    if not samples:
+        print(f"[Eval] Error: {args.data} に画像がありません。")
+        return
+    print(f"[Eval] 検証画像 {len(samples)} 枚 ({args.data})")
+
+    baseline = None
+    for model_path in args.models:
+        if not os.path.exists(model_path):
+            print(f"[Eval] スキップ (ファイルが無い): {model_path}")
+            continue
+        detector = load_detector(model_path, config.DETECTOR_IOU_THRESHOLD)
+        try:
+            map50, map50_95, times_ms = evaluate(detector, samples)
+        finally:
+            detector.close()
+
+        if baseline is None:
+            baseline = map50
+        p50, p95 = np.percentile(times_ms, [50, 95])
+        print(f"[Eval] {os.path.basename(model_path):<20}: mAP@0.5 {map50:.4f} (Δ {map50 - baseline:+.4f})  "
+              f"mAP@0.5:0.95 {map50_95:.4f}  平均 {times_ms.mean():7.2f} ms  p50 {p50:7.2f} ms  "
+              f"p95 {p95:7.2f} ms  {1000 / times_ms.mean():6.2f} FPS")
+
+        is_int8 = model_path == config.DETECTOR_ONNX_MODEL_PATHS["int8"] and model_path != args.models[0]
+        if is_int8 and baseline - map50 <= config.DETECTOR_INT8_MAX_MAP_DROP:
+            print(f"[Eval] INT8 の mAP@0.5 の低下は {config.DETECTOR_INT8_MAX_MAP_DROP} 以内です。"
+                  f" config.DETECTOR_ONNX_PRECISION = \"int8\" に切り替えられます。")
+
+
+if __name__ == "__main__":
+    main()
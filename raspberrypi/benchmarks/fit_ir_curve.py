@@ -0,0 +1,79 @@
+"""
+fit_ir_curve.py
+アナログの IR 距離センサーの、生の値 -> 距離 のカーブ (距離 = a / (raw - b) - c) を
+実測の (生の値, 本当の距離) の組から求め、キャリブレーションファイルの "ir_curve" に保存する。
+(計算は src/processing/ir_calibration.py。GUI・検出結果の距離・スナップショットのログは、
+ 起動時にこのカーブから 1024 通りの表 (IrLookupTable) を作って使う)
+
+測定の記録 (CSV。1行目は見出し):
+    raw,distance_cm
+    512,10.0
+    301,20.0
+    ...
+    (GUI の IR 生値を読みながら、定規で測った距離と一緒に 10〜80cm の範囲で 10 組以上)
+
+今のキャリブレーションファイルがあれば、カメラのパラメータはそのまま引き継ぐ。
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.fit_ir_curve --pairs ir_pairs.csv
+    python -m benchmarks.fit_ir_curve --pairs ir_pairs.csv --dry-run   (保存しない)
+"""
+
+import argparse
+import datetime
+
+import numpy as np
+
+import config
+from src.processing.calibration import CALIBRATION_FORMAT_VERSION, load_calibration, save_calibration
+from src.processing.ir_calibration import IrLookupTable, fit_ir_curve, ir_curve_distance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", required=True, help="raw,distance_cm の CSV")
+    parser.add_argument("--dry-run", action="store_true", help="結果を表示するだけで保存しない")
+    args = parser.parse_args()
+
+    pairs = np.loadtxt(args.pairs, delimiter=",", skiprows=1, ndmin=2)
+    ir_raw, distances = pairs[:, 0], pairs[:, 1]
+    print(f"[FitIR] {args.pairs}: {len(ir_raw)} 組 (生の値 {ir_raw.min():.0f}〜{ir_raw.max():.0f}, "
+          f"距離 {distances.min():.1f}〜{distances.max():.1f} cm)")
+
+    current = load_calibration() or {}
+    initial = current.get("ir_curve", config.IR_ANALOG_CURVE)
+    before = ir_curve_distance(ir_raw, initial) - distances
+    curve, after = fit_ir_curve(ir_raw, distances, initial)
+
+    print(f"  カーブ: 距離 = {curve['a']:.1f} / (raw - {curve['b']:.2f}) - {curve['c']:.2f}")
+    print(f"  距離誤差 RMS: {np.sqrt(np.mean(before ** 2)):.2f} cm -> {np.sqrt(np.mean(after ** 2)):.2f} cm "
+          f"(最大 {np.abs(after).max():.2f} cm)")
+
+    # 表にしたときの誤差 (整数の生の値に丸める分と、範囲の切り詰め分)
+    min_cm, max_cm = config.IR_ANALOG_DISTANCE_RANGE_CM
+    table = IrLookupTable(curve, min_cm, max_cm)
+    inside = (distances >= min_cm) & (distances <= max_cm)
+    if np.any(inside):
+        table_error = table.distances(ir_raw[inside]) - distances[inside]
+        print(f"  表 (1024 通り) での誤差 RMS: {np.sqrt(np.mean(table_error ** 2)):.2f} cm "
+              f"({min_cm:.0f}〜{max_cm:.0f} cm の測定のみ)")
+
+    if args.dry_run:
+        return
+    result = dict(current)
+    result.update({
+        "format_version": CALIBRATION_FORMAT_VERSION,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "ir_curve": curve,
+        "ir_fit": {
+            "source_pairs": args.pairs,
+            "num_pairs": int(len(ir_raw)),
+            "rms_cm": float(np.sqrt(np.mean(after ** 2))),
+        },
+    })
+    path = save_calibration(result)
+    print(f"[FitIR] 保存しました: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+quantize_detector.py
+FP32 の ONNX 検出器から INT8 (静的量子化) の ONNX を作る。
+
+キャリブレーション (各層の値の範囲の推定) には、setup_programs/get_finetune_seed_images.py で
+撮りためた実機カメラの画像 (config.DETECTOR_CALIBRATION_IMAGE_DIR) を使う。
+画像は OnnxDetector.preprocess() (推論時と同じレターボックス + 正規化) を通して渡す。
+
+- 重みはチャンネルごとの INT8、活性は UINT8 (QDQ 形式。ARM の CPU では INT8 の行列積になる)
+- 最後の Detect ヘッドの座標の復元部分 (Conv 以外) は FP32 のまま残す
+  (画素単位の座標を 8bit にするとボックスがずれるため)
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.bench_detector --export       (先に FP32 の ONNX を作っておく)
+    python -m benchmarks.quantize_detector
+    python -m benchmarks.quantize_detector --images path/to/images --method percentile
+作ったモデルの精度と速度は benchmarks/eval_detector.py で確認する。
+"""
+
+import argparse
+import glob
+import os
+import re
+import tempfile
+
+import cv2
+
+import config
+from src.processing.detector import OnnxDetector
+
+# 撮りためた画像が無いときは、学習データの画像でキャリブレーションする
+FALLBACK_IMAGE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "ai-models", "object-detection", "yolov5", "dataset", "train", "images",
+)
+_MODULE_INDEX = re.compile(r"/model\.(\d+)/")
+
+
+def find_images(image_dir, max_images):
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+    return paths[:max_images]
+
+
+class CalibrationReader:
+    """onnxruntime.quantization の CalibrationDataReader (画像を1枚ずつ前処理して渡す)"""
+
+    def __init__(self, fp32_model_path, image_paths):
+        # (前処理だけに使う。推論時と同じ入力になることが大事)
+        self.detector = OnnxDetector(fp32_model_path, num_threads=1)
+        self.input_name = self.detector.session.get_inputs()[0].name
+        self.image_paths = iter(image_paths)
+
+    def get_next(self):
+        for path in self.image_paths:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"[Quantize] 読み込めない画像をスキップ: {path}")
+                continue
+            return {self.input_name: self.detector.preprocess(frame).copy()}
+        return None
+
+    def rewind(self):
+        pass
+
+
+def head_nodes_to_exclude(model_path):
+    """Detect ヘッド (最後の /model.N/ モジュール) のうち、Conv 以外のノード名"""
+    import onnx
+
+    nodes = onnx.load(model_path).graph.node
+    indices = [int(m.group(1)) for m in (_MODULE_INDEX.search(n.name) for n in nodes) if m]
+    if not indices:
+        return []
+    head = f"/model.{max(indices)}/"
+    return [n.name for n in nodes if head in n.name and n.op_type != "Conv"]
+
+
+def quantize(fp32_model_path, int8_model_path, image_paths, method="minmax", exclude_head=True):
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "percentile": CalibrationMethod.Percentile,
+        "entropy": CalibrationMethod.Entropy,
+    }
+    excluded = head_nodes_to_exclude(fp32_model_path) if exclude_head else []
+    print(f"[Quantize] キャリブレーション画像 {len(image_paths)} 枚, 方式 {method}, "
+          f"FP32 のまま残すノード {len(excluded)} 個")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 形状推論 + グラフの整理 (量子化の前処理として推奨されている)
+        prepared_path = os.path.join(work_dir, "prepared.onnx")
+        quant_pre_process(fp32_model_path, prepared_path, skip_symbolic_shape=True)  # (入力は固定サイズ)
+        quantize_static(
+            prepared_path,
+            int8_model_path,
+            CalibrationReader(fp32_model_path, image_paths),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=methods[method],
+            nodes_to_exclude=excluded,
+        )
+
+    size_fp32 = os.path.getsize(fp32_model_path) / 1e6
+    size_int8 = os.path.getsize(int8_model_path) / 1e6
+    print(f"[Quantize] INT8 モデルを保存しました: {int8_model_path} "
+          f"({size_fp32:.1f} MB -> {size_int8:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.DETECTOR_ONNX_MODEL_PATHS["fp32"], help="FP32 の ONNX")
+    parser.add_argument("--output", default=config.DETECTOR_ONNX_MODEL_PATHS["int8"], help="INT8 の ONNX の保存先")
+    parser.add_argument("--images", default=config.DETECTOR_CALIBRATION_IMAGE_DIR, help="キャリブレーション画像のディレクトリ")
+    parser.add_argument("--max-images", type=int, default=200, help="キャリブレーションに使う最大枚数")
+    parser.add_argument("--method", choices=("minmax", "percentile", "entropy"), default="minmax")
+    parser.add_argument("--quantize-head", action="store_true", help="Detect ヘッドも INT8 にする")
+    args = parser.parse_args()
+
+    image_paths = find_images(args.images, args.max_images)
+    if not image_paths:
+        print(f"[Quantize] 警告: {args.images} に画像が無いため、学習データの画像を使います。")
+        image_paths = find_images(FALLBACK_IMAGE_DIR, args.max_images)
+    if not image_paths:
+        print("[Quantize] Error: キャリブレーション画像が見つかりません。")
+        return
+
+    quantize(args.model, args.output, image_paths, args.method, exclude_head=not args.quantize_head)
+    print("[Quantize] 次に python -m benchmarks.eval_detector で FP32 との精度・速度を比較してください。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+speech_stub_server.py
+OpenAI の認識 (Whisper) と LLM (chat.completions) の代役をするローカルの HTTP サーバー。
+API キーも通信も使わずに、音声パイプライン (src/core/speech_pipeline.py) を試すためのもの。
+
+- POST /v1/audio/transcriptions : 受け取った WAV の長さに応じて、--phrases を順番に返す
+- POST /v1/chat/completions     : ユーザーの文から簡単なルールで JSON の指示を作って返す
+                                   (「置」-> PLACE、「止」-> STOP、それ以外 -> PICKUP)
+- --stt-delay / --llm-delay で、本物の API の待ち時間を真似る
+
+実行方法 (raspberrypi/ ディレクトリで):
+    python -m benchmarks.speech_stub_server --port 8001 --stt-delay 0.8 --llm-delay 1.2
+    (別のターミナルで) OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python main.py
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PHRASES = ["ペンを掴んで", "それを置いて", "止まって"]
+
+
+def make_handler(phrases, stt_delay, llm_delay):
+    phrase_cycle = itertools.cycle(phrases)
+    phrase_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass  # アクセスログは出さない (下で要点だけ表示する)
+
+        def _reply(self, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+
+            if self.path.endswith("/audio/transcriptions"):
+                time.sleep(stt_delay)
+                with phrase_lock:
+                    text = next(phrase_cycle)
+                print(f"[Stub] 認識: {len(body)} バイト -> '{text}'")
+                self._reply({"text": text})
+
+            elif self.path.endswith("/chat/completions"):
+                request = json.loads(body)
+                text = request["messages"][-1]["content"]
+                if "置" in text:
+                    command = {"command": "PLACE", "location": "テーブル"}
+                elif "止" in text:
+                    command = {"command": "STOP"}
+                else:
+                    command = {"command": "PICKUP", "target": text.split("を")[0]}
+                time.sleep(llm_delay)
+                print(f"[Stub] LLM: '{text}' -> {command}")
+                self._reply({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(command, ensure_ascii=False)},
+                        "finish_reason": "stop",
+                    }],
+                })
+
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=8001, phrases=None, stt_delay=0.8, llm_delay=1.2):
+    """
+    別スレッドでサーバーを起動する (ベンチマークから使う)
+    @return (ThreadingHTTPServer): 止めるときは shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(phrases or DEFAULT_PHRASES, stt_delay, llm_delay))
+    threading.Thread(target=server.serve_forever, name="SpeechStubServer", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--phrases", nargs="+", default=DEFAULT_PHRASES, help="認識結果として順番に返す文")
+    parser.add_argument("--stt-delay", type=float, default=0.8, help="認識の待ち時間 [秒]")
+    parser.add_argument("--llm-delay", type=float, default=1.2, help="LLM の待ち時間 [秒]")
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, args.phrases, args.stt_delay, args.llm_delay)
+    print(f"[Stub] http://{args.host}:{args.port}/v1 で待ち受け中 (Ctrl+C で終了)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
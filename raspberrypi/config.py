@@ -10,16 +10,33 @@ import numpy as np
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "YOUR_API_KEY_HERE")
 if OPENAI_API_KEY == "YOUR_API_KEY_HERE":
     print("警告: config.py に OpenAI APIキーが設定されていません。")
+# API の接続先 (None なら OpenAI 本体)。ローカルの代役サーバーで試すときは
+# OPENAI_BASE_URL=http://127.0.0.1:8001/v1 (benchmarks/speech_stub_server.py) を指定する
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+STT_MODEL = "whisper-1"
+STT_LANGUAGE = "ja"
+LLM_MODEL = "gpt-4-turbo"  # または gpt-3.5-turbo
 
 # --- 2. Arduino 通信設定 ---
 SERIAL_PORT = "/dev/ttyACM0"
 BAUD_RATE = 115200
 PACKET_HEADER = 0xFF
+# 全サーボ一括フレーム: [HEADER, FRAME_MARKER, SEQ, MASK, 角度(MASKのビット順)..., CHECKSUM]
+# (単軸パケットのINDEXは0-5なので、それ以外の値でフレームを識別する)
+PACKET_FRAME_MARKER = 0xF0
+# 差分フレームは応答 (ACK) を確認しないので、チェックサム不一致で捨てられた関節が古い角度のまま残らないよう、
+# この間隔ごとに全関節を載せたフレームを送り直す [秒]
+ARDUINO_FULL_FRAME_INTERVAL_S = 0.5
 
 # --- 3. ハードウェア設定 (カメラ) ---
 CAMERA_ID = 0
 CAMERA_RESOLUTION_WIDTH = 640
 CAMERA_RESOLUTION_HEIGHT = 480
+# Camera を直接使う場合のリングバッファの枚数 (撮影中 + 受け渡し待ち + 推論中 の3枚より多く)
+CAMERA_FRAME_RING_SIZE = 4
+# フレームバス (CameraProcess -> 各プロセス の共有メモリ。src/core/frame_bus.py)
+FRAME_BUS_NAME = "robotarm_frames"
+FRAME_BUS_SLOTS = 8  # 読み手の推論 (〜数百ms) の間に一周しない枚数
 
 # --- 4. カメラキャリブレーションパラメータ (最重要) ---
 # (これらは使用するレンズに依存する「仮値」。必ずキャリブレーションしてください)
@@ -38,23 +55,111 @@ CAMERA_MOUNT_OFFSET_CM = np.array([
     30.0   # Z (上/下)
 ])
 
+# レンズの歪み係数 (OpenCV 形式: k1, k2, p1, p2, k3)。未キャリブレーションなら 0
+CAMERA_DISTORTION_COEFFS = np.zeros(5)
+# カメラ座標系 -> アーム座標系 の外部パラメータ (src/processing/camera_model.py)
+# p_arm = R @ p_cam + t 。カメラが傾いている場合は R に回転を入れる
+CAMERA_ROTATION_ARM_FROM_CAM = np.eye(3)
+CAMERA_TRANSLATION_ARM_FROM_CAM_CM = -CAMERA_MOUNT_OFFSET_CM  # (従来の cam_coords - offset と同じ変換)
+
+# ハンドアイキャリブレーションの結果 (benchmarks/calibrate_hand_eye.py が書く)
+# ファイルがあれば起動時に読み、上のカメラパラメータより優先する。無ければ上の値を使う
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "calibration", "current.json")
+
 # --- 5. AI / 処理設定 ---
 # 作業ディレクトリとは異なり、実際に Raspberry Pi 5の方にファイルをマウントするときに関連づけるというか実際に配置をするパスを適切に指定することで対応。
 # 必要に応じてRPiの方で rm -rf ~/.cache/torch/hub/ultralytics_yolov5_master を実行してキャッシュクリーン。
 YOLO_MODEL_PATH = "/home/yutoseki/robot_arm_project/models/best.pt"
  # (学習済みモデルへのパス)
+YOLOV5_REPO_DIR = "/home/yutoseki/robot_arm_project/yolov5"  # torch.hub の YOLOv5 のクローン (GUI 用)
+
+# 検出器のバックエンド (src/processing/detector.py)
+# "ultralytics" : YOLO_MODEL_PATH (.pt) を PyTorch で実行 (従来どおり)
+# "yolov5_hub"  : YOLO_MODEL_PATH (.pt) を torch.hub の YOLOv5 で実行
+# "onnxruntime" : DETECTOR_ONNX_MODEL_PATHS[DETECTOR_ONNX_PRECISION] を ONNX Runtime で実行
+#                 (FP32 の作り方: python -m benchmarks.bench_detector --export
+#                  INT8 の作り方: python -m benchmarks.quantize_detector
+#                  精度と速度の確認: python -m benchmarks.eval_detector)
+DETECTOR_BACKEND = "ultralytics"
+GUI_DETECTOR_BACKEND = "yolov5_hub"  # GUI (test_integrated_sys) 側の検出器
+DETECTOR_ONNX_MODEL_PATHS = {
+    "fp32": "/home/yutoseki/robot_arm_project/models/best.onnx",
+    "int8": "/home/yutoseki/robot_arm_project/models/best.int8.onnx",
+}
+DETECTOR_ONNX_PRECISION = "fp32"  # eval_detector で mAP の低下が許容範囲なら "int8" にする
+DETECTOR_INPUT_SIZE = 640             # ONNX エクスポート時の固定入力サイズ [画素]
+DETECTOR_ONNX_PROVIDERS = ["CPUExecutionProvider"]  # OpenVINO: ["OpenVINOExecutionProvider", "CPUExecutionProvider"]
+DETECTOR_CONF_THRESHOLD = 0.25
+DETECTOR_IOU_THRESHOLD = 0.45
+DETECTOR_RESERVED_CORES = 2  # 推論に使わずに残すコア数 (制御ループ + カメラプロセス)
+# INT8 量子化のキャリブレーション画像 (setup_programs/get_finetune_seed_images.py が保存する先)
+DETECTOR_CALIBRATION_IMAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "setup_programs", "images"
+)
+DETECTOR_INT8_MAX_MAP_DROP = 0.01  # INT8 に切り替えてよい mAP@0.5 の低下の上限
+
+# ROI 追跡 (src/processing/roi_tracker.py)
+# ターゲットを見つけたら光学フローで追跡し、検出器は切り抜きで N フレームごとにだけ回す
+ROI_TRACKING_ENABLED = True
+ROI_REDETECT_INTERVAL = 5       # 何フレームごとに切り抜きで検出し直すか
+ROI_CROP_PADDING = 0.5          # 切り抜きの余白 (ボックスの幅・高さに対する割合、片側)
+ROI_CROP_MIN_SIZE_PX = 160      # 切り抜きの最小の一辺 [画素]
+ROI_MIN_TRACK_QUALITY = 0.5     # 追跡できた特徴点の割合がこれを下回ったら全画面で探し直す
+
+# ターゲット位置の推定 (src/processing/target_estimator.py の EKF)
+ESTIMATOR_PIXEL_NOISE_PX = 4.0             # 検出のボックス中心のばらつき [画素]
+ESTIMATOR_RANGE_NOISE_CM = 1.5             # IRセンサーの距離のばらつき [cm]
+ESTIMATOR_ACCEL_NOISE_CM_S2 = 20.0         # 想定するターゲットの加速度 (大きいほど素早く追従、ノイズも通す)
+ESTIMATOR_INITIAL_VELOCITY_STD_CM_S = 10.0 # 見つけた直後の速度の不確かさ [cm/s]
+ESTIMATOR_MAX_COAST_S = 0.5                # 検出が途切れても予測だけで追い続ける時間 [秒]
+
+# ターゲット名の別名 (src/processing/target_index.py)
+# LLM が返す日本語や言い換えを、モデルのクラス名 (キー) に対応させる。
+# モデルに無いクラスの行は無視されるので、よく使う物体を先に書いておいてよい
+TARGET_SYNONYMS = {
+    "ship": ["船", "ふね", "ボート", "boat", "シップ", "おもちゃの船"],
+    "apple": ["りんご", "林檎"],
+    "orange": ["みかん", "オレンジ"],
+    "banana": ["バナナ"],
+    "bottle": ["ボトル", "ペットボトル", "瓶", "びん"],
+    "cup": ["コップ", "カップ", "湯呑み"],
+    "cell phone": ["スマホ", "スマートフォン", "携帯", "phone", "smartphone"],
+    "book": ["本"],
+    "mouse": ["マウス"],
+    "scissors": ["はさみ", "ハサミ", "鋏"],
+}
 
 # --- 6. 音声入力設定 ---
 AUDIO_SAMPLE_RATE = 16000 # 16kHz (Whisper推奨)
 AUDIO_CHANNELS = 1
-AUDIO_SILENCE_THRESHOLD = 0.01
+AUDIO_SILENCE_THRESHOLD = 0.01  # 音声とみなす RMS (int16 を 32768 で割った -1..1 の振幅で。録音・VAD 共通)
 AUDIO_SILENCE_DURATION = 2.0
 
+# 音声の常時取り込み + 発話区間の検出 (src/core/speech_pipeline.py)
+# マイクは止めずにリングバッファへ書き続け、発話が終わるたびに認識を並行して投げる
+SPEECH_STREAMING = True            # False: 従来どおり「録音 -> 認識 -> LLM」を順番に行う
+AUDIO_BLOCK_MS = 30                # マイクから受け取る1ブロック (= VAD の判定単位) [ms]
+AUDIO_RING_SECONDS = 30.0          # リングバッファに残す長さ [秒] (最長の発話より長く)
+AUDIO_VAD_END_SILENCE_S = 0.8      # この長さ無音が続いたら発話の終わりとみなす [秒]
+AUDIO_VAD_MIN_SPEECH_S = 0.3       # これより短い音 (物音など) は発話として扱わない [秒]
+AUDIO_VAD_PRE_ROLL_S = 0.3         # 発話の始まりの前も含めて切り出す長さ [秒] (語頭の欠けを防ぐ)
+AUDIO_VAD_MAX_UTTERANCE_S = 15.0   # これより長い発話は途中で区切って認識に回す [秒]
+AUDIO_VAD_NOISE_RATIO = 3.0        # 周囲の雑音レベルの何倍を音声とみなすか (しきい値は AUDIO_SILENCE_THRESHOLD 以上)
+SPEECH_MAX_CONCURRENT_REQUESTS = 2 # 同時に処理する発話の数 (認識 + LLM)
+
 # --- 7. 逆運動学 (IK) 設定 (要件3対応) ---
 # (※あなたのアームの物理的な長さに合わせて変更必須)
 ARM_BASE_HEIGHT_CM = 10.0 # 地面からサーボ1(肩)の回転軸までの高さ [cm]
 ARM_L1_CM = 15.0  # 肩(サーボ1)から肘(サーボ2)までの長さ [cm]
 ARM_L2_CM = 10.0  # 肘(サーボ2)から手首(サーボ3)までの長さ [cm]
+ARM_L3_CM = 8.0   # 手首(サーボ3)からグリッパー先端までの長さ [cm] (順運動学用)
+
+# IKの事前計算テーブル (起動時に作成し、形状定数ごとにキャッシュ)
+# (NumPyではベクトル化した厳密解の方が速いため既定は無効。
+#  python -m benchmarks.bench_ik --lookup で実機の速度を確認してから有効にする)
+IK_USE_LOOKUP_TABLE = False
+IK_LOOKUP_RESOLUTION_CM = 0.5
+IK_LOOKUP_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "ik_cache")
 
 
 
@@ -97,10 +202,52 @@ SEARCH_POSE_ANGLES = [
 GRIPPER_OPEN_ANGLE = 90
 GRIPPER_CLOSED_ANGLE = 30
 
+# IRセンサーの距離がこれ以下になったら GRAB (掴む) に移行する [cm]
+GRAB_DISTANCE_THRESHOLD_CM = 8.0
+
+# IRセンサー (VL53L0X) の連続測定 (src/hardware/ir_sensor_service.py)
+# 専用スレッドで読み続け、制御ループは共有メモリの最新値を読むだけ (待たない)
+# 測定モード: "fast" (探索・接近中) / "accurate" (掴む直前だけ)。制御ステートに合わせて実行中に切り替える
+IR_TIMING_BUDGETS_US = {        # 1回の測定時間 [マイクロ秒] (VL53L0X の下限は 20000)
+    "fast": 20000,              # 約50Hz。ノイズは下のフィルタで抑える
+    "accurate": 200000,         # 約5Hz。高精度モード
+}
+IR_FILTER_MEDIAN_WINDOWS = {    # 移動中央値の件数 (スパイク状の外れ値を消す。低速なモードほど少なく = 遅れを減らす)
+    "fast": 5,
+    "accurate": 3,
+}
+IR_FILTER_EMA_ALPHA = 0.5        # 中央値の後の EMA の係数 (大きいほど素早く追従)
+IR_VALID_RANGE_CM = (1.0, 120.0) # この範囲外の測定値は無効 (対象なしのとき約 819cm が返る)
+IR_MAX_SAMPLE_AGE_S = 0.5        # これより古い測定値は無効として扱う [秒] (accurate の 200ms x 2 + 余裕)
+IR_ACCURATE_MARGIN_CM = 5.0      # 推定距離が GRAB_DISTANCE_THRESHOLD_CM + これ 以内で accurate に切り替える
+IR_MODE_HYSTERESIS_CM = 2.0      # fast に戻すのは、さらにこれだけ離れてから (しきい値付近で行き来しないように)
+
+# アナログの IR センサー (Sharp GP2Y0A21。テスト用リグ setup_programs/test_integrated_sys で使用)
+# 生の値 (analogRead 0..1023) -> 距離 = a / (raw - b) - c  (src/processing/ir_calibration.py)
+# キャリブレーションファイル (CALIBRATION_PATH) に "ir_curve" があればそちらを使う
+IR_ANALOG_CURVE = {"a": 6762.0, "b": 9.0, "c": 4.0}
+IR_ANALOG_DISTANCE_RANGE_CM = (10.0, 80.0)  # センサーが測れる範囲 (範囲外は端の値に切り詰める)
+
 # 「置く」動作の定義 (アーム座標系での X, Y, Z [cm])
 PLACE_TARGET_COORDS_ARM = (15.0, 0.0, 5.0) # (X=15cm, Y=0cm, Z=5cm)
 
 # 探索ルーチン (土台サーボ)
 SEARCH_RANGE_MIN = 45  # 45度
 SEARCH_RANGE_MAX = 135 # 135度
-SEARCH_STEP_PER_LOOP = 0.5
+# 土台を回す速さ [度/秒]。1ティックあたり SEARCH_SPEED_DEG_S / CONTROL_LOOP_HZ 度 (30 Hz で約 0.083 度) 進める
+# (以前は推論を待つ1ループごとに 0.5 度 = 約 2.5 度/秒。検出は撮影から数百 ms 遅れて届くので、
+#  速く回すと見つけた時には目標を通り過ぎ、ブレも増える)
+SEARCH_SPEED_DEG_S = 2.5
+
+# 制御ループの周期 (src/core/scheduler.py)
+CONTROL_LOOP_HZ = 30  # 制御ティックの周期 [Hz] (サーボ指令の更新間隔を一定にする)
+CONTROL_IDLE_HZ = 10  # IDLE / IDLE_HOLDING 中の周期 [Hz] (指示の確認だけなので低くてよい)
+LATENCY_REPORT_INTERVAL_S = 5.0  # 各ステージの処理時間 (p50/p95/p99) を main.py が表示する間隔 [秒]
+
+# 関節軌道 (src/processing/trajectory.py)
+# 目標姿勢を一気に送らず、速度・加速度の上限を守る軌道を一定周期で流す
+TRAJECTORY_STREAM_HZ = 50                 # 駆動ステージが角度を送る周期 [Hz]
+TRAJECTORY_MAX_JOINT_SPEED_DEG_S = 90.0   # 関節の最大速度 [度/秒]
+TRAJECTORY_MAX_JOINT_ACCEL_DEG_S2 = 360.0 # 関節の最大加速度 [度/秒^2]
+TRAJECTORY_MIN_DURATION_S = 0.3           # 小さな動きでもこの時間はかける [秒]
+TRAJECTORY_PROFILE = "minimum_jerk"       # "minimum_jerk" or "trapezoidal"
@@ -2,6 +2,10 @@ import multiprocessing as mp
 import time
 from src.core.orchestrator import OrchestratorProcess
 from src.core.real_time_control import RealTimeControlProcess
+from src.core.latency import LatencyHistograms
+from src.core.frame_bus import FrameBus
+from src.core.camera_process import CameraProcess
+import config
 
 # TODO どこにサーボによるアームの各角度というか物理的位置情報とirセンサーおよびカメラワークとの相対位置を調整し、一致させるロジック部分が存在するか；下記メモから調整実施
 # 数値調整計算要件
@@ -14,21 +18,45 @@ def main():
     # プロセス間で通信するためのキューを作成
     # Orchestrator (B) -> RealTime (A) への指示用
     task_queue = mp.Queue()
+    # プロセスAの各ステージの処理時間 (共有メモリのヒストグラム)
+    latency = LatencyHistograms()
+    # カメラのフレームを共有するバス (書き手は CameraProcess だけ)
+    frame_bus = FrameBus.create(
+        config.FRAME_BUS_NAME, config.FRAME_BUS_SLOTS,
+        config.CAMERA_RESOLUTION_HEIGHT, config.CAMERA_RESOLUTION_WIDTH,
+    )
 
     try:
+        # --- カメラプロセス (フレームバスへの書き込み) の作成 ---
+        camera_process = CameraProcess(
+            config.FRAME_BUS_NAME, config.CAMERA_ID,
+            config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT,
+            latency=latency,
+        )
+
         # --- プロセスA (リアルタイム制御) の作成 ---
-        process_a = RealTimeControlProcess(task_queue)
+        process_a = RealTimeControlProcess(task_queue, latency, config.FRAME_BUS_NAME)
 
         # --- プロセスB (API・思考) の作成 ---
         process_b = OrchestratorProcess(task_queue)
 
         print("[Main] 両プロセスを開始します...")
+        camera_process.start()
         process_a.start()
         process_b.start()
 
         # 両方のプロセスが終了するまで待機
+        # (待機の合間に、プロセスAの処理時間の分布を定期的に表示する)
+        last_report_time = time.time()
+        last_snapshot = latency.snapshot()
         while process_a.is_alive() and process_b.is_alive():
             time.sleep(0.5)
+            if time.time() - last_report_time >= config.LATENCY_REPORT_INTERVAL_S:
+                text = latency.format_summary(since=last_snapshot)
+                if text:
+                    print(f"[Latency] 直近 {config.LATENCY_REPORT_INTERVAL_S:.0f} 秒の処理時間:\n{text}")
+                last_report_time = time.time()
+                last_snapshot = latency.snapshot()
 
     except KeyboardInterrupt:
         print("\n[Main] Ctrl+Cを検出。全プロセスに終了を通知します...")
@@ -49,6 +77,11 @@ def main():
             if process_a.is_alive():
                 process_a.kill()
 
+        if 'camera_process' in locals() and camera_process.is_alive():
+            camera_process.terminate()
+            camera_process.join(timeout=2)
+
+        frame_bus.close()
         print("[Main] システムをシャットダウンしました。")
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+"""
+camera_process.py
+カメラを1つのプロセスだけが持ち、フレームをフレームバス (src/core/frame_bus.py) に流す。
+制御プロセス・GUIの配信・記録などは、バスから同じフレームを読む。
+(カメラを複数プロセスで開けない問題と、見る人ごとに撮影し直す無駄を無くす)
+"""
+
+import multiprocessing as mp
+import time
+
+from src.core.frame_bus import FrameBus
+from src.core.latency import STAGE_CAPTURE, STAGE_CONVERT
+from src.hardware.camera import Camera
+
+
+class CameraProcess(mp.Process):
+
+    def __init__(self, bus_name, camera_id, width, height, channel_order="BGR", latency=None):
+        """
+        @param bus_name: main.py で FrameBus.create() したバスの名前
+        @param latency: LatencyHistograms (撮影・色変換の時間を記録する。None なら記録しない)
+        """
+        super().__init__(daemon=True)
+        self.bus_name = bus_name
+        self.camera_id = camera_id
+        self.width = width
+        self.height = height
+        self.channel_order = channel_order
+        self.latency = latency
+
+    def _timed(self, stage, fn, *args, **kwargs):
+        if self.latency is None:
+            return fn(*args, **kwargs)
+        with self.latency.timer(stage):
+            return fn(*args, **kwargs)
+
+    def run(self):
+        print(f"[CameraProcess] 起動 (PID: {self.pid})")
+        bus = FrameBus.attach(self.bus_name)
+        # (リングはバス側にあるので、カメラ自身のリングは最小の1枚でよい)
+        cam = Camera(self.camera_id, self.width, self.height, ring_size=1, channel_order=self.channel_order)
+
+        try:
+            while True:
+                ret, request = self._timed(STAGE_CAPTURE, cam.capture)
+                if not ret:
+                    time.sleep(0.01)
+                    continue
+
+                # カメラのバッファからバスのスロットへ直接変換する (中間のコピーなし)
+                slot = bus.begin_write()
+                try:
+                    self._timed(STAGE_CONVERT, cam.to_bgr, request, dst=slot)
+                except Exception as e:
+                    print(f"[CameraProcess] Error: フレームの変換に失敗: {e}")
+                    bus.abort_write()
+                    continue
+                bus.commit_write()
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cam.release()
+            bus.close()
+            print("[CameraProcess] 終了しました。")
@@ -0,0 +1,201 @@
+"""
+frame_bus.py
+カメラのフレームを複数プロセスで共有するための「フレームバス」。
+(multiprocessing.shared_memory 上のスロット付きリングバッファ)
+
+- 書き手 (CameraProcess) は1つだけ。カメラから各スロットへ直接書き込む
+- 読み手 (制御プロセス、GUIの配信、記録など) は何個でもよい。
+  フレームは共有メモリの読み取り専用ビューとして受け取る (コピーしない)
+- 各スロットにはシーケンスロック (version) がある
+    書き込み開始で奇数、書き込み完了で偶数に進める。
+    読み手は受け取ったときの version を覚えておき、使い終わった後に
+    FrameRef.intact() で「途中で上書きされていないか」を確認できる
+
+共有メモリのレイアウト:
+    [ヘッダ int64 x 8][version int64 x N][frame_seq int64 x N][timestamp float64 x N][フレーム uint8 x N*H*W*C]
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_HEADER_FIELDS = 8
+_H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_LATEST_SEQ = range(5)
+_FRAME_ALIGN = 64  # フレーム領域の先頭をキャッシュラインに揃える
+
+
+def _layout(slots):
+    """(version, frame_seq, timestamp, フレーム) の各領域の開始バイト位置"""
+    version_offset = _HEADER_FIELDS * 8
+    frame_seq_offset = version_offset + slots * 8
+    timestamp_offset = frame_seq_offset + slots * 8
+    frames_offset = timestamp_offset + slots * 8
+    frames_offset = (frames_offset + _FRAME_ALIGN - 1) // _FRAME_ALIGN * _FRAME_ALIGN
+    return version_offset, frame_seq_offset, timestamp_offset, frames_offset
+
+
+class FrameRef:
+    """読み手が受け取る1フレーム (共有メモリのビューと、その時点の version)"""
+
+    __slots__ = ("bus", "seq", "slot", "version", "frame", "timestamp")
+
+    def __init__(self, bus, seq, slot, version, frame, timestamp):
+        self.bus = bus
+        self.seq = seq
+        self.slot = slot
+        self.version = version
+        self.frame = frame
+        self.timestamp = timestamp
+
+    def intact(self):
+        """受け取ってから今までに、書き手がこのスロットを上書きしていないか"""
+        return int(self.bus._version[self.slot]) == self.version
+
+
+class FrameBus:
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner  # True: 作成したプロセス (close 時に unlink する)
+
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.slots = int(self._header[_H_SLOTS])
+        self.shape = (int(self._header[_H_HEIGHT]), int(self._header[_H_WIDTH]), int(self._header[_H_CHANNELS]))
+
+        version_offset, frame_seq_offset, timestamp_offset, frames_offset = _layout(self.slots)
+        self._version = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=version_offset)
+        self._frame_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=frame_seq_offset)
+        self._timestamp = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=timestamp_offset)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=frames_offset)
+
+        # 読み手に渡すのは書き込み不可のビュー
+        self._frames_readonly = self._frames.view()
+        self._frames_readonly.flags.writeable = False
+
+        self._writing_slot = None
+        self._writing_seq = None
+
+    # --- 作成・接続 ---
+
+    @classmethod
+    def create(cls, name, slots, height, width, channels=3):
+        """
+        共有メモリを確保してバスを作る (main.py で1回だけ呼ぶ)
+        (前回の異常終了で同名の領域が残っていれば、削除してから作り直す)
+        """
+        size = _layout(slots)[3] + slots * height * width * channels
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            print(f"[FrameBus] 古い共有メモリ '{name}' を削除して作り直します。")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS] = slots
+        header[_H_HEIGHT] = height
+        header[_H_WIDTH] = width
+        header[_H_CHANNELS] = channels
+        del header  # (close() の前にビューを手放す)
+
+        print(f"[FrameBus] 作成: '{name}' ({slots} スロット x {width}x{height}x{channels}, {size / 1e6:.1f} MB)")
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, timeout=10.0):
+        """
+        既存のバスに接続する (各プロセスの中で呼ぶ)
+        (main.py と同じ resource_tracker を使う spawn の子プロセスを前提とする)
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return cls(shared_memory.SharedMemory(name=name), owner=False)
+            except FileNotFoundError:
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def close(self):
+        """ビューを手放して共有メモリを閉じる (作成したプロセスなら削除もする)"""
+        self._header = self._version = self._frame_seq = self._timestamp = None
+        self._frames = self._frames_readonly = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # (FrameRef がまだ残っている。プロセス終了時に解放されるので無視してよい)
+            print(f"[FrameBus] Warning: 使用中のフレームが残っているため '{self.name}' を閉じられません。")
+        if self.owner:
+            self.shm.unlink()
+            print(f"[FrameBus] 共有メモリ '{self.name}' を削除しました。")
+
+    # --- 書き手 (1プロセスのみ) ---
+
+    def begin_write(self):
+        """
+        次のスロットを書き込み中にして、その書き込み先 (H, W, C) を返す
+        (カメラの変換結果を dst= で直接ここに書く)
+        """
+        seq = int(self._header[_H_LATEST_SEQ]) + 1
+        slot = seq % self.slots
+        self._version[slot] += 1  # 奇数 = 書き込み中
+        self._writing_slot, self._writing_seq = slot, seq
+        return self._frames[slot]
+
+    def commit_write(self, timestamp=None):
+        """書き込みを完了し、読み手に公開する"""
+        slot = self._writing_slot
+        self._frame_seq[slot] = self._writing_seq
+        self._timestamp[slot] = time.time() if timestamp is None else timestamp
+        self._version[slot] += 1  # 偶数 = 完了
+        self._header[_H_LATEST_SEQ] = self._writing_seq
+        self._writing_slot = self._writing_seq = None
+
+    def abort_write(self):
+        """書き込みを取り消す (スロットの中身は壊れているので、そのスロットの古い参照は無効になる)"""
+        if self._writing_slot is not None:
+            self._version[self._writing_slot] += 1
+            self._writing_slot = self._writing_seq = None
+
+    def publish(self, frame, timestamp=None):
+        """既にある配列をコピーして公開する (カメラから直接書けない場合用)"""
+        np.copyto(self.begin_write(), frame)
+        self.commit_write(timestamp)
+
+    # --- 読み手 (何プロセスでも) ---
+
+    @property
+    def latest_seq(self):
+        return int(self._header[_H_LATEST_SEQ])
+
+    def read_latest(self, last_seq=0):
+        """
+        last_seq より新しい最新フレームを返す (待たない)
+        @return (FrameRef): 新しいフレームが無い / 書き込み途中なら None
+        """
+        seq = int(self._header[_H_LATEST_SEQ])
+        if seq <= last_seq:
+            return None
+        slot = seq % self.slots
+        version = int(self._version[slot])
+        if version % 2 or int(self._frame_seq[slot]) != seq:
+            return None  # 書き手がもう次の周回でこのスロットを書いている
+        return FrameRef(self, seq, slot, version, self._frames_readonly[slot], float(self._timestamp[slot]))
+
+    def wait_latest(self, last_seq=0, timeout=0.1, poll_interval=0.002):
+        """
+        新しいフレームが来るまで待つ
+        (プロセスをまたぐ通知は使わず、短い間隔で見に行く)
+        @return (FrameRef): タイムアウト時は None
+        """
+        deadline = time.time() + timeout
+        while True:
+            ref = self.read_latest(last_seq)
+            if ref is not None or time.time() >= deadline:
+                return ref
+            time.sleep(poll_interval)
@@ -0,0 +1,172 @@
+"""
+latency.py
+制御プロセス (プロセスA) の処理時間を、ステージごとにヒストグラムで記録する。
+(撮影 / 色変換 / YOLO / IR / IK / シリアル書き込み / 制御ティック全体)
+
+- ヒストグラムは HDR Histogram と同じ「対数 + 線形」のバケット
+  (2のべき乗ごとの区間を16等分。相対誤差 6% 以内で 1us 〜 約33秒 を固定サイズで持つ)
+- カウンタは共有メモリ (multiprocessing.RawArray) に置く。
+  制御ループ側は「バケットを1つ数える」だけで、ロックもメモリ確保もしない
+- パーセンタイル (p50/p95/p99) の計算は読み手 (main.py など) が
+  スナップショットの差分から行うので、ホットループには一切触れない
+
+各ステージは1つのスレッドだけが書く (書き手が1人なのでロック不要)。
+"""
+
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+STAGE_CAPTURE = "capture"   # カメラからの取り込み
+STAGE_CONVERT = "convert"   # 色変換 (XRGB -> BGR)
+STAGE_YOLO = "yolo"         # YOLO推論 + ターゲット探索
+STAGE_IR = "ir"             # IRセンサーの読み取り
+STAGE_IK = "ik"             # 座標変換 + 逆運動学
+STAGE_SERIAL = "serial"     # Arduinoへの書き込み
+STAGE_TICK = "tick"         # 制御ティック全体
+
+STAGES = (STAGE_CAPTURE, STAGE_CONVERT, STAGE_YOLO, STAGE_IR, STAGE_IK, STAGE_SERIAL, STAGE_TICK)
+
+# --- バケットの定義 (単位: マイクロ秒) ---
+_SUB_BITS = 5
+_SUB_COUNT = 1 << _SUB_BITS        # 32: 0-31us はそのまま1us刻み
+_HALF_COUNT = _SUB_COUNT // 2      # 16: それ以降は2のべき乗ごとに16分割
+_MAX_EXPONENT = 20                 # 2^25us (約33.5秒) まで。それ以上は最後のバケット
+NUM_BUCKETS = _SUB_COUNT + _MAX_EXPONENT * _HALF_COUNT
+
+# 1ステージ分のレイアウト: [バケット..., 件数, 合計us, 最大us]
+_ROW_SIZE = NUM_BUCKETS + 3
+_COUNT, _SUM, _MAX = NUM_BUCKETS, NUM_BUCKETS + 1, NUM_BUCKETS + 2
+
+
+def bucket_index(value_us):
+    """マイクロ秒の値 -> バケット番号"""
+    if value_us < _SUB_COUNT:
+        return max(value_us, 0)
+    exponent = value_us.bit_length() - _SUB_BITS
+    if exponent > _MAX_EXPONENT:
+        return NUM_BUCKETS - 1
+    return _SUB_COUNT + (exponent - 1) * _HALF_COUNT + (value_us >> exponent) - _HALF_COUNT
+
+
+def _bucket_upper_bounds_us():
+    """各バケットの上端 [us] (パーセンタイルはこの値で返す = 少し大きめに見積もる)"""
+    bounds = np.empty(NUM_BUCKETS)
+    bounds[:_SUB_COUNT] = np.arange(1, _SUB_COUNT + 1)
+    for exponent in range(1, _MAX_EXPONENT + 1):
+        start = _SUB_COUNT + (exponent - 1) * _HALF_COUNT
+        mantissa = np.arange(_HALF_COUNT, _SUB_COUNT)
+        bounds[start:start + _HALF_COUNT] = (mantissa + 1) << exponent
+    return bounds
+
+
+_UPPER_BOUNDS_US = _bucket_upper_bounds_us()
+
+
+class _StageTimer:
+    """with 文で囲んだ区間の時間を1つのステージに記録する (ステージごとに使い回す)"""
+
+    __slots__ = ("_histograms", "_offset", "_start")
+
+    def __init__(self, histograms, offset):
+        self._histograms = histograms
+        self._offset = offset
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histograms._record_at(self._offset, time.perf_counter() - self._start)
+        return False
+
+
+class LatencyHistograms:
+    """
+    ステージごとのレイテンシ・ヒストグラム (共有メモリ)。
+    main.py で作成し、プロセスAにそのまま渡す (spawn 時に共有メモリごと引き継がれる)
+    """
+
+    def __init__(self, stages=STAGES):
+        self.stages = tuple(stages)
+        self._offsets = {name: i * _ROW_SIZE for i, name in enumerate(self.stages)}
+        # 'q' = int64。書き手はステージごとに1スレッドなのでロックは付けない
+        self._buf = mp.RawArray("q", len(self.stages) * _ROW_SIZE)
+        self._timers = {}
+
+    def __getstate__(self):
+        # タイマーはプロセスごとに作り直す (共有メモリ本体だけを渡す)
+        state = self.__dict__.copy()
+        state["_timers"] = {}
+        return state
+
+    # --- 書き込み側 (ホットループ) ---
+
+    def _record_at(self, offset, seconds):
+        value_us = int(seconds * 1e6)
+        buf = self._buf
+        buf[offset + bucket_index(value_us)] += 1
+        buf[offset + _COUNT] += 1
+        buf[offset + _SUM] += value_us
+        if value_us > buf[offset + _MAX]:
+            buf[offset + _MAX] = value_us
+
+    def record(self, stage, seconds):
+        """計測済みの時間 [秒] を記録する"""
+        self._record_at(self._offsets[stage], seconds)
+
+    def timer(self, stage):
+        """
+        with latency.timer("ik"): ... の形で区間を計測する
+        (同じステージのタイマーは使い回すので、入れ子にはできない)
+        """
+        timer = self._timers.get(stage)
+        if timer is None:
+            timer = self._timers[stage] = _StageTimer(self, self._offsets[stage])
+        return timer
+
+    # --- 読み取り側 (ホットループの外) ---
+
+    def snapshot(self):
+        """全ステージのカウンタのコピー (stages 数, 行サイズ)"""
+        return np.frombuffer(self._buf, dtype=np.int64).reshape(len(self.stages), _ROW_SIZE).copy()
+
+    def summary(self, since=None, percentiles=(50, 95, 99)):
+        """
+        ステージごとの件数・平均・パーセンタイル [ms]
+        @param since: 以前の snapshot()。指定するとその時点からの差分 (区間の統計) になる
+        @return (dict): {stage: {"count", "mean_ms", "p50_ms", ..., "max_ms"}}
+        """
+        current = self.snapshot()
+        rows = current - since if since is not None else current
+
+        result = {}
+        for i, stage in enumerate(self.stages):
+            counts = rows[i, :NUM_BUCKETS]
+            total = int(rows[i, _COUNT])
+            stats = {"count": total, "mean_ms": float(rows[i, _SUM]) / total / 1000 if total else 0.0}
+            cumulative = np.cumsum(counts)
+            for p in percentiles:
+                if total:
+                    index = int(np.searchsorted(cumulative, total * p / 100.0))
+                    stats[f"p{p}_ms"] = float(_UPPER_BOUNDS_US[min(index, NUM_BUCKETS - 1)]) / 1000
+                else:
+                    stats[f"p{p}_ms"] = 0.0
+            # 最大値は区間ではなく起動からの値 (差分が取れないため)
+            stats["max_ms"] = float(current[i, _MAX]) / 1000
+            result[stage] = stats
+        return result
+
+    def format_summary(self, since=None):
+        """summary() をコンソール表示用の複数行の文字列にする"""
+        lines = []
+        for stage, s in self.summary(since).items():
+            if not s["count"]:
+                continue
+            lines.append(
+                f"  {stage:<8} n={s['count']:<6} p50 {s['p50_ms']:7.2f} | p95 {s['p95_ms']:7.2f} | "
+                f"p99 {s['p99_ms']:7.2f} | max {s['max_ms']:7.2f} ms"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,308 @@
+"""
+pipeline.py
+プロセスA (リアルタイム制御) 内部のステージ並列化。
+(撮影 -> 推論 -> 駆動) を別スレッドに分け、各ステージを重ねて動かす。
+
+- CaptureStage   : フレームバス (CameraProcess が撮影) の最新フレーム + IRセンサーの最新値
+                   (IR は IRSensorService が別スレッドで測定済み。ここでは共有メモリを読むだけ)
+- InferenceStage : YOLO推論 (src/processing/detector.py のバックエンド) + ターゲット探索
+- ActuationStage : Arduinoへのフレーム書き込み (軌道があれば一定周期でストリーミング)
+
+ステージ間は LatestValueSlot (容量1・古い値を捨てる) で接続する。
+理由: 制御に必要なのは「最新の」フレーム/指令だけであり、
+      遅いステージの後ろにキューが溜まると遅延がどんどん増えるため。
+"""
+
+import threading
+import time
+
+from src.core.latency import STAGE_IR, STAGE_SERIAL, STAGE_YOLO
+
+
+class LatestValueSlot:
+    """
+    容量1のスロット。書き込みは常に上書き (drop-oldest)。
+    読み手は「前回読んだ通し番号」より新しい値が来るまで待てる。
+    clear() で捨てた値は「新しい値」に数えない (読み手は次の put() まで待つ)。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._seq = 0          # 書き込みごとに+1する通し番号
+        self._taken_seq = 0    # 最後に読まれた通し番号
+        self._cleared_seq = 0  # clear() した時点の通し番号 (これ以前の値は読ませない)
+        self.dropped = 0       # 読まれずに上書きされた数
+
+    def put(self, value):
+        """最新値を書き込む (未読の古い値は破棄される)"""
+        with self._cond:
+            if self._seq > self._taken_seq:
+                self.dropped += 1
+            self._value = value
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, last_seq=0, timeout=None):
+        """
+        last_seq より新しい値が来るまで待って返す
+        @return (tuple): (seq, value)。タイムアウト時は (last_seq, None)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > max(last_seq, self._cleared_seq), timeout):
+                return last_seq, None
+            self._taken_seq = self._seq
+            return self._seq, self._value
+
+    def get_nowait(self, last_seq=0):
+        """待たずに get() する"""
+        return self.get(last_seq, timeout=0)
+
+    def clear(self):
+        """
+        未読の値を捨てる (ステート切り替え時に古い指令を残さないため)
+        待っている読み手は起こさない。次に読めるのは、この後に put() された値
+        """
+        with self._cond:
+            self._value = None
+            self._taken_seq = self._cleared_seq = self._seq
+
+
+class _StageThread(threading.Thread):
+    """各ステージ共通の土台 (停止フラグと稼働フラグを持つ)"""
+
+    def __init__(self, name, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.stop_event = stop_event
+        self.active = threading.Event()  # セットされている間だけ処理する
+
+    def wait_active(self, timeout=0.1):
+        """稼働フラグが立つまで待つ。停止要求が来たら False"""
+        while not self.stop_event.is_set():
+            if self.active.wait(timeout):
+                return True
+        return False
+
+
+class CaptureStage(_StageThread):
+    """
+    フレームバスの最新フレームとIRセンサーの最新値 (共有メモリ) を読み、frame_slot に流す
+    (撮影と色変換は CameraProcess が行い、その時間もそちらで記録される)
+    """
+
+    def __init__(self, frame_bus, ir, frame_slot, stop_event, latency):
+        super().__init__("CaptureStage", stop_event)
+        self.frame_bus = frame_bus
+        self.ir = ir
+        self.frame_slot = frame_slot
+        self.latency = latency
+
+    def run(self):
+        last_frame_seq = 0
+        while self.wait_active():
+            # (フレームは共有メモリのビュー。コピーせずに推論ステージへ渡す)
+            ref = self.frame_bus.wait_latest(last_frame_seq, timeout=0.1)
+            if ref is None:
+                continue
+            last_frame_seq = ref.seq
+            with self.latency.timer(STAGE_IR):
+                ir_distance, ir_timestamp, ir_valid = self.ir.read()
+            self.frame_slot.put({
+                "frame": ref.frame,
+                "frame_ref": ref,
+                "ir_distance": ir_distance if ir_valid else -1.0,
+                "ir_timestamp": ir_timestamp,
+                "timestamp": ref.timestamp,
+            })
+
+
+class InferenceStage(_StageThread):
+    """
+    frame_slot の最新フレームでYOLO推論を行い、
+    ターゲットの画素座標を detection_slot に流す
+    (tracker があれば、見つけた後は追跡 + 切り抜きでの再検出にして全画面の推論を減らす)
+    """
+
+    def __init__(self, detector, find_target, frame_slot, detection_slot, stop_event, latency, tracker=None):
+        super().__init__("InferenceStage", stop_event)
+        self.latency = latency
+        self.torn_frames = 0  # 推論中にバスのスロットが上書きされて捨てた数
+        self.detector = detector  # detect(BGRフレーム) -> Detections
+        self.find_target = find_target  # (Detections, target_class_id) -> (px, py) or None
+        self.frame_slot = frame_slot
+        self.detection_slot = detection_slot
+        self.target_class_id = None
+        self.tracker = tracker  # RoiTracker or None
+        self.tracking_reset = threading.Event()  # ターゲットが変わったら追跡を捨てる
+
+    def run(self):
+        last_seq = 0
+        while self.wait_active():
+            seq, packet = self.frame_slot.get(last_seq, timeout=0.1)
+            if packet is None:
+                continue
+            last_seq = seq
+
+            target_class_id = self.target_class_id
+            if target_class_id is None:
+                continue
+
+            if self.tracker is not None and self.tracking_reset.is_set():
+                self.tracking_reset.clear()
+                self.tracker.reset()
+
+            try:
+                with self.latency.timer(STAGE_YOLO):
+                    if self.tracker is not None:
+                        detections, _ = self.tracker.update(packet["frame"], target_class_id)
+                    else:
+                        detections = self.detector.detect(packet["frame"])
+                    pixel_coords = self.find_target(detections, target_class_id)
+            except Exception as e:
+                print(f"[Pipeline] Error: 推論に失敗: {e}")
+                continue
+
+            # 推論中にカメラがバスを一周していたら、フレームが混ざっているので捨てる
+            if not packet["frame_ref"].intact():
+                self.torn_frames += 1
+                continue
+
+            self.detection_slot.put({
+                "target_class_id": target_class_id,
+                "pixel_coords": pixel_coords,
+                "detections": detections,
+                "ir_distance": packet["ir_distance"],
+                "ir_timestamp": packet["ir_timestamp"],
+                "timestamp": packet["timestamp"],
+            })
+
+
+class ActuationStage(_StageThread):
+    """
+    command_slot の最新の目標姿勢 (全サーボの角度リスト) を
+    1フレームのパケットとしてArduinoに書き込む
+    (制御ループ側はシリアル書き込みを待たずに次の処理へ進める)
+
+    軌道 (JointTrajectory) が設定されている間は、stream_hz の一定周期で
+    軌道上の角度を流し続ける。新しい目標姿勢が来たら軌道は打ち切る。
+    """
+
+    def __init__(self, arduino, command_slot, stop_event, stream_hz, latency):
+        super().__init__("ActuationStage", stop_event)
+        self.latency = latency
+        self.arduino = arduino
+        self.command_slot = command_slot
+        self.period = 1.0 / stream_hz
+        self.active.set()  # 駆動はステートに関係なく常に稼働
+
+        self._trajectory = None
+        self._trajectory_lock = threading.Lock()
+
+    def start_trajectory(self, trajectory):
+        """軌道のストリーミングを開始する (実行中の軌道・未送信の姿勢は破棄)"""
+        with self._trajectory_lock:
+            self.command_slot.clear()
+            self._trajectory = trajectory.begin(time.time())
+
+    def is_moving(self):
+        return self._trajectory is not None
+
+    def run(self):
+        last_seq = 0
+        next_tick = time.time()
+        while not self.stop_event.is_set():
+            with self._trajectory_lock:
+                streaming = self._trajectory is not None
+            timeout = max(0.0, next_tick - time.time()) if streaming else 0.1
+
+            seq, angles = self.command_slot.get(last_seq, timeout=timeout)
+            last_seq = seq  # (値が None でも進める: 同じ通し番号で待たずに返り続けないように)
+            if angles is not None:
+                with self._trajectory_lock:
+                    self._trajectory = None  # 直接指令が軌道より優先
+                # 変化した関節だけが送られる (ArduinoCommunicator.send_frame)
+                with self.latency.timer(STAGE_SERIAL):
+                    self.arduino.send_frame(angles)
+                continue
+
+            with self._trajectory_lock:
+                trajectory = self._trajectory
+                if trajectory is not None:
+                    now = time.time()
+                    setpoint = trajectory.angles_at(now)
+                    if trajectory.finished(now):
+                        self._trajectory = None
+            if trajectory is None:
+                # 指令が無い間も、定期的に全関節を送り直す (壊れて捨てられたフレームの取りこぼし対策)
+                self.arduino.refresh()
+                continue
+
+            with self.latency.timer(STAGE_SERIAL):
+                self.arduino.send_frame(setpoint)
+            # 絶対時刻で次の周期を決める (処理時間で周期がずれないように)
+            next_tick = max(next_tick + self.period, now)
+
+
+class ControlPipeline:
+    """3ステージをまとめて起動・停止するための入れ物"""
+
+    def __init__(self, frame_bus, ir, detector, find_target, arduino, stream_hz, latency, tracker=None):
+        """
+        @param frame_bus: FrameBus (CameraProcess が書き込むフレームバスに接続したもの)
+        @param ir: IRSensorService (read() -> (距離 cm, 時刻, 有効か))
+        @param detector: 検出器 (src/processing/detector.py の create_detector() で作ったもの)
+        @param tracker: RoiTracker (None なら毎フレーム全画面で推論する)
+        @param latency: LatencyHistograms (各ステージの処理時間をここに記録する)
+        """
+        self.stop_event = threading.Event()
+        self.frame_slot = LatestValueSlot()
+        self.detection_slot = LatestValueSlot()
+        self.command_slot = LatestValueSlot()
+
+        self.capture = CaptureStage(frame_bus, ir, self.frame_slot, self.stop_event, latency)
+        self.inference = InferenceStage(
+            detector, find_target, self.frame_slot, self.detection_slot, self.stop_event, latency, tracker
+        )
+        self.actuation = ActuationStage(arduino, self.command_slot, self.stop_event, stream_hz, latency)
+        self._stages = (self.capture, self.inference, self.actuation)
+
+    def start(self):
+        for stage in self._stages:
+            stage.start()
+        print("[Pipeline] Capture / Inference / Actuation ステージを開始しました。")
+
+    def set_target(self, target_class_id):
+        """
+        推論対象 (クラスID) を設定する。None なら撮影・推論を休止する
+        (IDLEなどで無駄にCPUを使わないため)
+        """
+        self.inference.target_class_id = target_class_id
+        self.inference.tracking_reset.set()
+        if target_class_id is not None:
+            self.capture.active.set()
+            self.inference.active.set()
+        else:
+            self.capture.active.clear()
+            self.inference.active.clear()
+            self.detection_slot.clear()
+
+    def submit_pose(self, angles):
+        """
+        駆動ステージに最新の目標姿勢を渡す (未送信の古い姿勢は破棄)
+        (姿勢は絶対角度なので、途中を捨てても最終的な位置は変わらない)
+        """
+        self.command_slot.put(list(angles))
+
+    def start_trajectory(self, trajectory):
+        """駆動ステージに軌道を渡す (一定周期で途中の角度が送られる)"""
+        self.actuation.start_trajectory(trajectory)
+
+    def is_moving(self):
+        return self.actuation.is_moving()
+
+    def stop(self):
+        self.stop_event.set()
+        for stage in self._stages:
+            if stage.is_alive():
+                stage.join(timeout=1.0)
+        print("[Pipeline] 全ステージを停止しました。")
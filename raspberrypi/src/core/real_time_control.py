@@ -6,35 +6,66 @@ real_time_control.py (プロセスA)
 ★★★ ロジック追加修正版 ★★★
 - PICKUPステートが、近距離でGRABステートに移行するよう修正
 - GRAB (掴む), LIFT (持ち上げ), IDLE_HOLDING (待機) ステートを追加
+- 撮影 / 推論 / 駆動 を別スレッドのステージに分割 (src/core/pipeline.py)
+  ループ周期が「全ステージの合計」ではなく「最も遅いステージ」で決まるようにする
+- GRAB / LIFT / PLACE / STOP の移動は time.sleep() で待たず、関節軌道を
+  駆動ステージに渡して MOVING ステートで完了を待つ (src/processing/trajectory.py)
+- 制御ティックを一定周期で回す (src/core/scheduler.py)。待機ステートは眠り、
+  締め切りに間に合わなかったティックは数えて報告する
+- 各ステージの処理時間を共有メモリのヒストグラムに記録する (src/core/latency.py)
+  p50/p95/p99 の集計・表示は main.py 側で行う
+- カメラは開かず、CameraProcess が書き込むフレームバス (src/core/frame_bus.py) から読む
+- IRセンサーは専用スレッドで連続測定し (src/hardware/ir_sensor_service.py)、
+  制御側は共有メモリの最新値を読むだけにする (1回 200ms の測定を待たない)
 """
 
 import multiprocessing as mp
 import time
-import cv2
-from ultralytics import YOLO
-import numpy as np
 import config
 from src.hardware.arduino_com import ArduinoCommunicator
-from src.hardware.camera import Camera
+from src.core.frame_bus import FrameBus
 from src.hardware.ir_sensor import IRSensor
-from src.hardware.kinematics import KinematicsSolver # ★ 3D-IKソルバーをインポート
+from src.hardware.ir_sensor_service import IRSensorService, MODE_ACCURATE, MODE_FAST
+from src.processing.kinematics import KinematicsSolver # ★ 3D-IKソルバーをインポート
+from src.processing.trajectory import TrajectoryPlanner
+from src.processing.target_index import TargetIndex
+from src.processing.detector import create_detector
+from src.processing.roi_tracker import RoiTracker
+from src.processing.target_estimator import TargetEstimator
+from src.processing.camera_model import CameraModel
+from src.core.pipeline import ControlPipeline
+from src.core.scheduler import RateScheduler
+from src.core.latency import STAGE_IK, STAGE_TICK
 
 class RealTimeControlProcess(mp.Process):
 
-    def __init__(self, task_queue):
+    def __init__(self, task_queue, latency, frame_bus_name):
+        """
+        @param latency: LatencyHistograms (main.py で作成した共有メモリのヒストグラム)
+        @param frame_bus_name: main.py で作成したフレームバスの名前
+        """
         super().__init__()
         self.task_queue = task_queue
+        self.latency = latency
+        self.frame_bus_name = frame_bus_name
 
         # --- ステート管理 ---
         self.current_task = {"command": "STOP"} # 初期状態はSTOP
 
         # --- 探索用変数 ---
         self.search_angle = config.HOME_POSITION_ANGLES[config.SERVO_ID_BASE]
-        self.search_direction = config.SEARCH_STEP_PER_LOOP
+        self.search_direction = 1  # +1 / -1 (回す向き)
+
+        # --- 現在の目標姿勢 (全サーボ)。1ティックにつき1フレームで送る ---
+        self.target_angles = list(config.HOME_POSITION_ANGLES)
+
+        # --- パイプライン (initialize_hardware で生成) ---
+        self.pipeline = None
+        self.tracker = None
+        self.last_detection_seq = 0
 
-        # --- FPS計算用 ---
-        self.frame_count = 0
-        self.last_fps_time = time.time()
+        # --- 周期実行 (締め切り超過の集計もここで行う) ---
+        self.scheduler = RateScheduler(config.CONTROL_LOOP_HZ, config.CONTROL_IDLE_HZ)
 
         print(f"[RealTime] プロセスA (PID: {self.pid}) を初期化")
 
@@ -47,8 +78,21 @@ class RealTimeControlProcess(mp.Process):
             self.arduino = ArduinoCommunicator(config.SERIAL_PORT, config.BAUD_RATE)
             self.arduino.connect()
 
-            self.cam = Camera(config.CAMERA_ID, config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT)
-            self.ir = IRSensor()
+            # カメラは CameraProcess が持つ。ここではフレームバスに接続するだけ
+            self.frame_bus = FrameBus.attach(self.frame_bus_name)
+            # IRセンサーは専用スレッドで連続測定 (中央値 + EMA のフィルタ済みの値を共有メモリに置く)
+            # (測定時間は制御ステートに合わせて切り替える: 接近中は fast、掴む直前だけ accurate)
+            self.ir = IRSensorService(
+                IRSensor(config.IR_TIMING_BUDGETS_US[MODE_FAST]),
+                config.IR_TIMING_BUDGETS_US,
+                config.IR_FILTER_MEDIAN_WINDOWS,
+                config.IR_FILTER_EMA_ALPHA,
+                config.IR_VALID_RANGE_CM[0],
+                config.IR_VALID_RANGE_CM[1],
+                config.IR_MAX_SAMPLE_AGE_S,
+                MODE_FAST,
+            )
+            self.ir.start()
 
             # ★★★ 要件3対応 (DI) ★★★
             # 3D-IKソルバーに、configから「アームの物理形状」を渡す
@@ -57,17 +101,53 @@ class RealTimeControlProcess(mp.Process):
                 config.ARM_L2_CM,
                 config.ARM_BASE_HEIGHT_CM
             )
+            if config.IK_USE_LOOKUP_TABLE:
+                self.ik.build_lookup_table(config.IK_LOOKUP_CACHE_DIR, config.IK_LOOKUP_RESOLUTION_CM)
+
+            # 関節の速度・加速度の上限から、移動ごとの軌道を作る
+            self.planner = TrajectoryPlanner(
+                self.ik,
+                config.TRAJECTORY_MAX_JOINT_SPEED_DEG_S,
+                config.TRAJECTORY_MAX_JOINT_ACCEL_DEG_S2,
+                config.TRAJECTORY_MIN_DURATION_S,
+                config.TRAJECTORY_PROFILE,
+            )
 
-            # カメラパラメータをクラス変数として保持
-            self.fx = config.CAMERA_FOCAL_LENGTH_X
-            self.fy = config.CAMERA_FOCAL_LENGTH_Y
-            self.cx = config.CAMERA_CENTER_X
-            self.cy = config.CAMERA_CENTER_Y
-            # カメラの取り付け位置オフセット(numpy配列)
-            self.cam_offset = config.CAMERA_MOUNT_OFFSET_CM
+            # カメラモデル (内部パラメータ・歪み・外部パラメータ。変換に使う値は起動時に事前計算)
+            self.camera_model = CameraModel.from_config()
+
+            # ターゲット位置の推定 (検出の画素と IR の距離を EKF で融合する)
+            self.estimator = TargetEstimator(
+                self.arm_to_pixel, self.arm_to_range, self.pixel_to_arm_coords,
+                config.ESTIMATOR_PIXEL_NOISE_PX,
+                config.ESTIMATOR_RANGE_NOISE_CM,
+                config.ESTIMATOR_ACCEL_NOISE_CM_S2,
+                config.ESTIMATOR_INITIAL_VELOCITY_STD_CM_S,
+                config.ESTIMATOR_MAX_COAST_S,
+            )
 
-            print("[RealTime] YOLOモデルをロード中...")
-            self.yolo_model = YOLO(config.YOLO_MODEL_PATH)
+            print(f"[RealTime] YOLOモデルをロード中 (バックエンド: {config.DETECTOR_BACKEND})...")
+            self.detector = create_detector(config.DETECTOR_BACKEND)
+            # ターゲット名 (日本語・別名を含む) -> クラスID の索引 (モデル読み込み時に1回だけ作る)
+            self.target_index = TargetIndex(self.detector.names, config.TARGET_SYNONYMS)
+
+            # ターゲットを見つけた後は追跡 + 切り抜きでの再検出にする (全画面の推論を減らす)
+            self.tracker = None
+            if config.ROI_TRACKING_ENABLED:
+                self.tracker = RoiTracker(
+                    self.detector,
+                    config.ROI_REDETECT_INTERVAL,
+                    config.ROI_CROP_PADDING,
+                    config.ROI_CROP_MIN_SIZE_PX,
+                    config.DETECTOR_CONF_THRESHOLD,
+                    config.ROI_MIN_TRACK_QUALITY,
+                )
+
+            # 撮影 / 推論 / 駆動 の3ステージを構築 (開始は run() で行う)
+            self.pipeline = ControlPipeline(
+                self.frame_bus, self.ir, self.detector, self.find_target_in_results, self.arduino,
+                config.TRAJECTORY_STREAM_HZ, self.latency, self.tracker,
+            )
             print("[RealTime] 全ての初期化が完了。")
             return True
         except Exception as e:
@@ -76,6 +156,9 @@ class RealTimeControlProcess(mp.Process):
 
     def check_for_new_task(self):
         """プロセスBからの指示をノンブロッキングで確認"""
+        # 移動中(MOVING)は指示を読まない (キューに残し、移動完了後に処理する)
+        if self.current_task.get("command") == "MOVING":
+            return
         try:
             # 掴んで待機中(IDLE_HOLDING)は、"PLACE"以外の指示を無視する
             if self.current_task.get("command") == "IDLE_HOLDING":
@@ -89,144 +172,335 @@ class RealTimeControlProcess(mp.Process):
                 new_task = self.task_queue.get_nowait()
                 if new_task:
                     print(f"[RealTime] 新タスク受信: {new_task}")
+                    if not self._resolve_task_target(new_task):
+                        return # 解決できないターゲットは探しても見つからないので無視する
                     self.search_angle = config.HOME_POSITION_ANGLES[config.SERVO_ID_BASE]
                     self.current_task = new_task
         except mp.queues.Empty:
             pass
 
-    def find_target_in_results(self, results, target_name):
-        """YOLOの推論結果から、指定された物体を探す"""
-        best_confidence = 0.0
-        best_box_center = None
-
-        target_class_id = -1
-        class_names = results[0].names
-        for class_id, name in class_names.items():
-            if name.lower() == target_name.lower():
-                target_class_id = class_id
-                break
-        if target_class_id == -1: return None
-
-        for r in results:
-            for box in r.boxes:
-                if box.cls == target_class_id and box.conf > best_confidence:
-                    best_confidence = box.conf
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
-                    best_box_center = (int(center_x), int(center_y))
-        return best_box_center
+    def find_target_in_results(self, detections, target_class_id):
+        """
+        検出結果 (Detections) から、指定されたクラスの最も信頼度の高いボックス中心を探す
+        (ターゲット名 -> クラスID はタスク受信時に解決済み)
+        """
+        return detections.best_center(target_class_id)
+
+    def _resolve_task_target(self, task):
+        """
+        タスクのターゲット名をクラスIDに解決し、task["target_class_id"] に入れる
+        @return (bool): ターゲットが不要なタスク、または解決できた場合 True
+        """
+        if task.get("command") != "PICKUP":
+            return True
+        class_id = self.target_index.resolve(task.get("target"))
+        if class_id is None:
+            print(f"[RealTime] Error: ターゲット '{task.get('target')}' はモデルのクラスにありません。"
+                  f" (候補: {', '.join(self.target_index.known_names())})")
+            return False
+        task["target_class_id"] = class_id
+        print(f"[RealTime] ターゲット '{task.get('target')}' -> クラス "
+              f"'{self.target_index.class_names[class_id]}' (ID: {class_id})")
+        return True
 
     # --- ★★★ 要件3対応: FBループの「調整」部分 ★★★ ---
     def pixel_to_arm_coords(self, pixel_coords, distance_cm):
         """
         YOLOの(px, py)とIRの(distance)を、アーム基準の(X, Y, Z)に変換する
+        (歪み補正 + ピンホールモデル + 回転・並進の外部パラメータ。CameraModel に任せる)
+        """
+        X_arm, Y_arm, Z_arm = self.camera_model.pixel_to_arm(pixel_coords, distance_cm)
+        return (X_arm, Y_arm, Z_arm)
+
+    def arm_to_pixel(self, arm_coords):
+        """pixel_to_arm_coords の逆: アーム基準の (X, Y, Z) -> 画素 (px, py) (推定器の観測モデル)"""
+        return self.camera_model.arm_to_pixel(arm_coords)
+
+    def arm_to_range(self, arm_coords):
+        """アーム基準の (X, Y, Z) -> IRセンサーが測る距離 (カメラの奥行き) [cm]"""
+        return self.camera_model.arm_to_depth(arm_coords)
+
+    def _print_scheduler_report(self):
+        """
+        1秒ごとに周期と締め切り超過をコンソールに出力する
+        (ステージごとの処理時間は latency のヒストグラムを main.py が表示する)
+        """
+        report = self.scheduler.poll_report()
+        if report:
+            print(f"[RealTime] State: {self.current_task['command']} | "
+                  f"最大ティック {report['max_busy_ms']:.1f} ms | {report['rate_hz']:.1f} Hz | "
+                  f"超過: {report['overruns']} 回 (最大遅れ {report['max_late_ms']:.1f} ms, 累計 {report['total_overruns']})")
+            if self.tracker is not None:
+                counts = self.tracker.pop_counts()
+                if any(counts.values()):
+                    print(f"[RealTime] 推論: 全画面 {counts['full']} / 切り抜き {counts['crop']} / 追跡 {counts['track']} フレーム")
+            ir_counts = self.ir.pop_counts()
+            print(f"[RealTime] IR ({ir_counts['mode']}): {ir_counts['rate_hz']:.1f} Hz, "
+                  f"測定 {ir_counts['samples']} 回 (範囲外・エラー {ir_counts['rejected']} 回)")
+
+    def _send_joints(self, commands):
+        """
+        [(servo_id, angle), ...] を目標姿勢に反映し、姿勢全体を1フレームとして
+        駆動ステージに渡す (シリアル書き込みは ActuationStage のスレッドだけが行う)
+        """
+        for servo_id, angle in commands:
+            self.target_angles[servo_id] = int(angle)
+        self.pipeline.submit_pose(self.target_angles)
+
+    def _start_move(self, trajectory, next_task):
         """
-        px, py = pixel_coords
-        Z_cam = distance_cm # IRセンサーの距離をカメラのZ軸(奥行き)とする
-
-        # 1. ピンホールモデルで「カメラ座標系」での (X, Y) を計算
-        X_cam = ((px - self.cx) * Z_cam) / self.fx
-        Y_cam = ((py - self.cy) * Z_cm) / self.fy
-
-        # (X_cam, Y_cam, Z_cam) の3Dベクトルを作成
-        cam_coords = np.array([X_cam, Y_cam, Z_cam])
-
-        # 2. アーム座標系に変換
-        # 理由: アームのIK計算は、アームの土台(0,0,0)を基準に
-        #       計算する必要があるため、カメラの取り付け位置の
-        #       オフセット(config.pyで定義)を考慮する。
-        # (※これは最も単純な「並進」のみの変換。
-        #    カメラが傾いている場合は、ここで「回転行列」も必要)
-        arm_coords = cam_coords - self.cam_offset
-
-        # (X_arm, Y_arm, Z_arm) を返す
-        return (arm_coords[0], arm_coords[1], arm_coords[2])
-
-    def _calculate_and_print_fps(self, loop_start_time_ms):
-        """1秒ごとにFPSとループ処理時間をコンソールに出力する"""
-        self.frame_count += 1
-        current_time = time.time()
-        elapsed_time = current_time - self.last_fps_time
-        if elapsed_time >= 1.0:
-            fps = self.frame_count / elapsed_time
-            print(f"[RealTime] State: {self.current_task['command']} | Loop: {loop_start_time_ms:.1f} ms (FPS: {fps:.1f})")
-            self.last_fps_time = current_time
-            self.frame_count = 0
+        軌道を駆動ステージに渡し、完了するまで MOVING ステートにする
+        (完了後は next_task に移行する)
+        """
+        self.pipeline.start_trajectory(trajectory)
+        self.target_angles = [int(round(a)) for a in trajectory.goal]
+        self.current_task = {"command": "MOVING", "next": next_task}
+
+    def _move_joints(self, commands, next_task):
+        """[(servo_id, angle), ...] の姿勢まで、現在の目標姿勢から軌道で移動する"""
+        goal = list(self.target_angles)
+        for servo_id, angle in commands:
+            goal[servo_id] = int(angle)
+        self._start_move(self.planner.plan_to_angles(self.target_angles, goal), next_task)
+
+    def _wait_for_move(self, timeout):
+        """(シャットダウン用) 軌道の完了をブロックして待つ"""
+        deadline = time.time() + timeout
+        while self.pipeline.is_moving() and time.time() < deadline:
+            time.sleep(0.02)
+
+    def _sync_pipeline_target(self, command):
+        """PICKUP/SEARCH の間だけ撮影・推論ステージを動かす"""
+        target_class_id = None
+        if command in ("PICKUP", "SEARCH"):
+            target_class_id = self.current_task.get("target_class_id")
+        if target_class_id != self.pipeline.inference.target_class_id:
+            self.pipeline.set_target(target_class_id)
+            self.estimator.reset()
+
+    def _update_ir_mode(self, command):
+        """
+        IRセンサーの測定モードを制御ステートに合わせる
+        推定距離が GRAB のしきい値 + IR_ACCURATE_MARGIN_CM 以内の PICKUP だけ accurate、それ以外は fast
+        (fast に戻すのは IR_MODE_HYSTERESIS_CM だけ余分に離れてから)
+        """
+        mode = MODE_FAST
+        if command == "PICKUP" and self.estimator.initialized:
+            switch_cm = config.GRAB_DISTANCE_THRESHOLD_CM + config.IR_ACCURATE_MARGIN_CM
+            if self.ir.mode == MODE_ACCURATE:
+                switch_cm += config.IR_MODE_HYSTERESIS_CM
+            if self.estimator.range_estimate() <= switch_cm:
+                mode = MODE_ACCURATE
+        if mode != self.ir.mode:
+            print(f"[RealTime] IRの測定モードを {mode} に切り替えます (State: {command})")
+            self.ir.set_mode(mode)
+
+    def _lose_target(self, target_name):
+        """見失ったので推定を捨てて SEARCH ステートに移行する"""
+        print(f"[RealTime] {target_name} を見失いました。SEARCHステートに移行します。")
+        self.estimator.reset()
+        self.current_task = {**self.current_task, "command": "SEARCH"}
+
+    def _poll_detection(self, target_class_id):
+        """
+        推論ステージから、前回より新しい検出結果を待たずに受け取る
+        (推論が制御周期より遅いときは、結果が来るまで前回の指令を維持する)
+        @return (dict): 検出結果 or None (新しい結果がまだ無い)
+        """
+        seq, detection = self.pipeline.detection_slot.get_nowait(self.last_detection_seq)
+        if detection is None:
+            return None
+        self.last_detection_seq = seq
+        if detection["target_class_id"] != target_class_id:
+            return None # ターゲット切り替え前のフレームの結果
+        return detection
 
     # --- ★★★ 要件2対応: 探索ルーチン ★★★ ---
     def _execute_search_routine(self):
         """ (実装) 目標が見つからない場合、土台を回転させ、他を固定 """
 
-        # 1. 土台の角度を更新
-        self.search_angle += self.search_direction
+        # 1. 土台の角度を更新 (ティックの周期に関係なく SEARCH_SPEED_DEG_S で回す)
+        self.search_angle += self.search_direction * config.SEARCH_SPEED_DEG_S * self.scheduler.period
         if self.search_angle >= config.SEARCH_RANGE_MAX:
             self.search_angle = config.SEARCH_RANGE_MAX
-            self.search_direction = -config.SEARCH_STEP_PER_LOOP
+            self.search_direction = -1
         elif self.search_angle <= config.SEARCH_RANGE_MIN:
             self.search_angle = config.SEARCH_RANGE_MIN
-            self.search_direction = config.SEARCH_STEP_PER_LOOP
+            self.search_direction = 1
 
         # 2. 全サーボに「探索ポーズ」の角度を送信
         # 理由: 土台(5)以外を固定角に保ち、地面を探索させる (要件2)
-
-        # グリッパー (0)
-        self.arduino.send_command(config.SERVO_ID_GRIPPER, config.SEARCH_POSE_ANGLES[config.SERVO_ID_GRIPPER])
-        # 肩 (1)
-        self.arduino.send_command(config.SERVO_ID_SHOULDER, config.SEARCH_POSE_ANGLES[config.SERVO_ID_SHOULDER])
-        # 肘 (2)
-        self.arduino.send_command(config.SERVO_ID_ELBOW, config.SEARCH_POSE_ANGLES[config.SERVO_ID_ELBOW])
-        # 手首 (3)
-        self.arduino.send_command(config.SERVO_ID_WRIST, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST])
-        # 手首回転 (4)
-        self.arduino.send_command(config.SERVO_ID_WRIST_ROTATE, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST_ROTATE])
-
-        # 土台 (5) - 探索角度で上書き
-        self.arduino.send_command(config.SERVO_ID_BASE, int(self.search_angle))
+        self._send_joints([
+            (config.SERVO_ID_GRIPPER, config.SEARCH_POSE_ANGLES[config.SERVO_ID_GRIPPER]),
+            (config.SERVO_ID_SHOULDER, config.SEARCH_POSE_ANGLES[config.SERVO_ID_SHOULDER]),
+            (config.SERVO_ID_ELBOW, config.SEARCH_POSE_ANGLES[config.SERVO_ID_ELBOW]),
+            (config.SERVO_ID_WRIST, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST]),
+            (config.SERVO_ID_WRIST_ROTATE, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST_ROTATE]),
+            # 土台 (5) - 探索角度で上書き
+            (config.SERVO_ID_BASE, int(self.search_angle)),
+        ])
 
     def _execute_place_routine(self):
         """ (実装) 事前に定義された位置にアームを移動させ、グリッパーを開く """
         print("[RealTime] PLACEルーチン実行...")
 
-        # 1. configで定義された「置く場所」の (X, Y, Z) 座標を取得
-        x, y, z = config.PLACE_TARGET_COORDS_ARM
+        # 1. configで定義された「置く場所」の (X, Y, Z) 座標への軌道 (3D-IK)
+        trajectory = self.planner.plan_to_point(
+            self.target_angles,
+            config.PLACE_TARGET_COORDS_ARM,
+            (config.SERVO_ID_BASE, config.SERVO_ID_SHOULDER, config.SERVO_ID_ELBOW),
+            overrides={
+                # (手首とグリッパーはホームポジションの角度を使う)
+                config.SERVO_ID_WRIST: config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST],
+                config.SERVO_ID_GRIPPER: config.GRIPPER_CLOSED_ANGLE, # 掴んだまま移動
+            },
+        )
+
+        if trajectory:
+            # 2. アームを移動し、到着したら RELEASE (グリッパーを開く) へ
+            self._start_move(trajectory, {"command": "RELEASE"})
+        else:
+            print("[RealTime] Error: PLACE座標に到達できません。")
+            self.current_task = {"command": "STOP"}
 
-        # 2. 3D-IK計算
-        angles_dict = self.ik.calculate_ik(x, y, z)
+    def _execute_release_routine(self):
+        """ (実装) グリッパー(サーボ0)を開き、完了後 STOP (ホームポジションに戻る) に移行 """
+        print("[RealTime] グリッパーを開きます。PLACE完了後はSTOPタスクに移行します。")
+        self._move_joints([(config.SERVO_ID_GRIPPER, config.GRIPPER_OPEN_ANGLE)], {"command": "STOP"})
 
-        if angles_dict:
-            # 3. アームを移動 (IKが計算した3軸)
-            self.arduino.send_command(config.SERVO_ID_BASE, angles_dict["base"])
-            self.arduino.send_command(config.SERVO_ID_SHOULDER, angles_dict["shoulder"])
-            self.arduino.send_command(config.SERVO_ID_ELBOW, angles_dict["elbow"])
-            # (手首とグリッパーはホームポジションの角度を使う)
-            self.arduino.send_command(config.SERVO_ID_WRIST, config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST])
-            self.arduino.send_command(config.SERVO_ID_GRIPPER, config.GRIPPER_CLOSED_ANGLE) # 掴んだまま移動
+    def _execute_stop_routine(self, blocking=False):
+        """
+        (実装) アームを安全な「ホームポジション」に戻す
+        @param blocking: True なら到着まで待つ (シャットダウン時)
+        """
+        print("[RealTime] STOPルーチン実行。ホームポジションに戻ります...")
 
-            time.sleep(1.0) # 移動待機
+        trajectory = self.planner.plan_to_angles(self.target_angles, config.HOME_POSITION_ANGLES)
+        self._start_move(trajectory, {"command": "IDLE"})
+
+        if blocking:
+            self._wait_for_move(trajectory.duration + 0.5)
+            print("[RealTime] ホームポジションに移動完了。")
+
+    def _control_tick(self, command):
+        """制御ループの1ティック分の処理 (ステートごとに分岐)"""
+        if command == "PICKUP":
+            target_name = self.current_task.get("target")
+            target_class_id = self.current_task.get("target_class_id")
+            if target_class_id is None:
+                self.current_task = {"command": "STOP"}
+                return
+
+            # (A)(B) 撮影・推論ステージから最新の結果を受け取り、推定器に入れる
+            # (撮影と推論は別スレッドで並行して進んでいる。距離と画素はそれぞれ別に更新する)
+            # (IR は自分の周期で測るので、前と同じ測定なら update_range が読み飛ばす)
+            detection = self._poll_detection(target_class_id)
+            if detection is not None:
+                if detection["ir_distance"] >= 0:
+                    self.estimator.update_range(detection["ir_timestamp"], detection["ir_distance"])
+                if detection["pixel_coords"]:
+                    self.estimator.update_pixel(detection["timestamp"], detection["pixel_coords"])
+
+            # (C) 新しい検出が無いティックも、推定器の予測で目標を進める
+            now = time.time()
+            if not self.estimator.initialized:
+                if detection is not None and not detection["pixel_coords"]:
+                    self._lose_target(target_name)
+                return
+            if self.estimator.is_lost(now):
+                # (G) ★目標見失う★ (max_coast_s より長く検出が途切れた) 探索ステートに移行
+                self._lose_target(target_name)
+                return
+            self.estimator.predict(now)
+
+            with self.latency.timer(STAGE_IK):
+                # (D) ★要件3: 座標変換 (FBループ)★ (推定器のフィルタ済みの位置を使う)
+                world_coords_arm = self.estimator.position()
+
+                # (E) ★要件3: 3D-IK計算★
+                angles_dict = self.ik.calculate_ik(world_coords_arm[0], world_coords_arm[1], world_coords_arm[2])
+
+            if angles_dict:
+                # (F) ★要件1: Arduinoにコマンド送信★
+
+                # IKが計算した3軸 + 固定角の手首とグリッパーを駆動ステージへ
+                self._send_joints([
+                    (config.SERVO_ID_BASE, angles_dict["base"]),
+                    (config.SERVO_ID_SHOULDER, angles_dict["shoulder"]),
+                    (config.SERVO_ID_ELBOW, angles_dict["elbow"]),
+                    (config.SERVO_ID_WRIST, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST]), # 水平維持
+                    (config.SERVO_ID_WRIST_ROTATE, config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST_ROTATE]),
+                    (config.SERVO_ID_GRIPPER, config.GRIPPER_OPEN_ANGLE), # 掴むまで開く
+                ])
+
+                # 推定した距離が「掴むしきい値」(configで定義)より近くなったら
+                # (生のIR距離ではなく、推定器で平滑化した距離を使う)
+                distance = self.estimator.range_estimate()
+                if distance <= config.GRAB_DISTANCE_THRESHOLD_CM:
+                    print(f"[RealTime] ターゲット捕捉 (距離: {distance:.1f}cm)。GRABステートに移行します。")
+                    self.current_task = {**self.current_task, "command": "GRAB"} # targetを維持
 
-            # 4. グリッパー(サーボ0)を開く
-            self.arduino.send_command(config.SERVO_ID_GRIPPER, config.GRIPPER_OPEN_ANGLE)
-            print("[RealTime] グリッパーを開きました。")
-            time.sleep(0.5)
+            else:
+                # リーチ外 (対象に近づくよう促すなど)
+                pass
+
+        elif command == "SEARCH":
+            # ★要件2: 探索ルーチン実行★
+            self._execute_search_routine()
+
+            # (カメラで再探索: 推論ステージの次の結果を待つ)
+            target_name = self.current_task.get("target")
+            detection = self._poll_detection(self.current_task.get("target_class_id"))
+            if detection is None: return
+
+            if detection["pixel_coords"]:
+                print(f"[RealTime] {target_name} を再発見！ PICKUPステートに移行します。")
+                self.current_task = {**self.current_task, "command": "PICKUP"}
+
+
+        elif command == "GRAB":
+            # 役割: グリッパーを閉じる
+            print(f"[RealTime] GRAB実行: {self.current_task.get('target')} を掴みます。")
+
+            # 1. グリッパーを閉じ、閉じ終わったら LIFTステートに移行
+            self._move_joints([(config.SERVO_ID_GRIPPER, config.GRIPPER_CLOSED_ANGLE)], {"command": "LIFT"})
+
+        elif command == "LIFT":
+            # 役割: 掴んだ物体を安全な高さまで持ち上げる
+            print("[RealTime] LIFT実行: 物体を持ち上げます。")
+
+            # 1. 安全な「持ち上げ」角度に移動 (ホームの肩/肘の角度を流用)
+            # (土台とグリッパーは現在の角度を維持)
+            # 2. 持ち上げ完了後、PLACE指示を待つIDLE状態に。
+            self._move_joints([
+                (config.SERVO_ID_SHOULDER, config.HOME_POSITION_ANGLES[config.SERVO_ID_SHOULDER]),
+                (config.SERVO_ID_ELBOW, config.HOME_POSITION_ANGLES[config.SERVO_ID_ELBOW]),
+                (config.SERVO_ID_WRIST, config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST]),
+            ], {"command": "IDLE_HOLDING"})
+
+        elif command == "IDLE_HOLDING":
+            # 役割: 物体を掴んだまま、次の指示(PLACE)を待つ
+            # (何もしない。ループで待機)
+            pass
 
-            # 5. 完了後、STOP (ホームポジションに戻る) タスクに移行
-            print("[RealTime] PLACE完了。STOPタスクに移行します。")
-            self.current_task = {"command": "STOP"}
-        else:
-            print("[RealTime] Error: PLACE座標に到達できません。")
-            self.current_task = {"command": "STOP"}
+        elif command == "PLACE":
+            self._execute_place_routine()
 
-    def _execute_stop_routine(self):
-        """ (実装) アームを安全な「ホームポジション」に戻す """
-        print("[RealTime] STOPルーチン実行。ホームポジションに戻ります...")
+        elif command == "RELEASE":
+            self._execute_release_routine()
+
+        elif command == "MOVING":
+            # 役割: 駆動ステージが軌道を流し終えるのを待つ (ブロックしない)
+            if not self.pipeline.is_moving():
+                next_task = self.current_task["next"]
+                print(f"[RealTime] 移動完了。{next_task['command']}ステートに移行します。")
+                self.current_task = next_task
 
-        for i in range(config.SERVO_COUNT):
-            self.arduino.send_command(i, config.HOME_POSITION_ANGLES[i])
-            time.sleep(0.05)
+        elif command == "STOP":
+            self._execute_stop_routine()
 
-        print("[RealTime] ホームポジションに移動完了。IDLE状態になります。")
-        self.current_task = {"command": "IDLE"}
+        elif command == "IDLE":
+            pass
 
     # --- メイン実行ループ ---
     def run(self):
@@ -235,134 +509,38 @@ class RealTimeControlProcess(mp.Process):
             return
 
         print(f"[RealTime] 制御ループ実行中 (PID: {self.pid})...")
+        self.pipeline.start()
+        self.scheduler.start()
 
         try:
             while True:
-                start_time = time.time()
-                self.check_for_new_task()
-                command = self.current_task.get("command", "IDLE") # デフォルトはIDLE
-
-                if command == "PICKUP":
-                    target_name = self.current_task.get("target")
-                    if not target_name:
-                        self.current_task = {"command": "STOP"}
-                        continue
-
-                    # (A) センサー群から情報を取得
-                    ret, frame = self.cam.get_frame()
-                    ir_distance = self.ir.get_distance_cm()
-                    if not ret or ir_distance < 0:
-                        continue
-
-                    # (B) YOLOv5 推論
-                    results = self.yolo_model(frame, verbose=False)
-                    pixel_coords = self.find_target_in_results(results, target_name)
-
-                    if pixel_coords:
-                        # (D) ★要件3: 座標変換 (FBループ)★
-                        world_coords_arm = self.pixel_to_arm_coords(pixel_coords, ir_distance)
-
-                        # (E) ★要件3: 3D-IK計算★
-                        angles_dict = self.ik.calculate_ik(world_coords_arm[0], world_coords_arm[1], world_coords_arm[2])
-
-                        if angles_dict:
-                            # (F) ★要件1: Arduinoにコマンド送信★
-
-                            # IKが計算した3軸を送信
-                            self.arduino.send_command(config.SERVO_ID_BASE, angles_dict["base"])
-                            self.arduino.send_command(config.SERVO_ID_SHOULDER, angles_dict["shoulder"])
-                            self.arduino.send_command(config.SERVO_ID_ELBOW, angles_dict["elbow"])
-
-                            # 手首とグリッパーは固定角
-                            self.arduino.send_command(config.SERVO_ID_WRIST, config.SEARCH_POSE_ANGLES[config.SERVO_ID_WRIST]) # 水平維持
-                            self.arduino.send_command(config.SERVO_ID_WRIST_ROTATE, config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST_ROTATE])
-                            self.arduino.send_command(config.SERVO_ID_GRIPPER, config.GRIPPER_OPEN_ANGLE) # 掴むまで開く
-
-                            # IRセンサーの距離が「掴むしきい値」(configで定義)より近くなったら
-                            # (ここでは生のIR距離をそのまま使う)
-                            if ir_distance <= config.GRAB_DISTANCE_THRESHOLD_CM:
-                                print(f"[RealTime] ターゲット捕捉 (距離: {ir_distance}cm)。GRABステートに移行します。")
-                                self.current_task = {"command": "GRAB", "target": target_name} # targetを維持
-
-                        else:
-                            # リーチ外 (対象に近づくよう促すなど)
-                            pass
-                    else:
-                        # (G) ★目標見失う★ 探索ステートに移行
-                        print(f"[RealTime] {target_name} を見失いました。SEARCHステートに移行します。")
-                        self.current_task = {"command": "SEARCH", "target": target_name}
-
-                elif command == "SEARCH":
-                    # ★要件2: 探索ルーチン実行★
-                    self._execute_search_routine()
-
-                    # (カメラで再探索)
-                    target_name = self.current_task.get("target")
-                    ret, frame = self.cam.get_frame()
-                    if not ret: continue
-
-                    results = self.yolo_model(frame, verbose=False)
-                    pixel_coords = self.find_target_in_results(results, target_name)
-
-                    if pixel_coords:
-                        print(f"[RealTime] {target_name} を再発見！ PICKUPステートに移行します。")
-                        self.current_task = {"command": "PICKUP", "target": target_name}
-
-
-                elif command == "GRAB":
-                    # 役割: グリッパーを閉じる
-                    print(f"[RealTime] GRAB実行: {self.current_task.get('target')} を掴みます。")
-
-                    # 1. グリッパーを閉じる
-                    self.arduino.send_command(config.SERVO_ID_GRIPPER, config.GRIPPER_CLOSED_ANGLE)
-                    time.sleep(0.5) # グリッパーが閉じるのを待つ
-                    print("[RealTime] グリッパーを閉じました。")
-
-                    # 2. LIFTステートに移行
-                    self.current_task = {"command": "LIFT"}
-
-                elif command == "LIFT":
-                    # 役割: 掴んだ物体を安全な高さまで持ち上げる
-                    print("[RealTime] LIFT実行: 物体を持ち上げます。")
-
-                    # 1. 安全な「持ち上げ」角度に移動 (ホームの肩/肘の角度を流用)
-                    self.arduino.send_command(config.SERVO_ID_SHOULDER, config.HOME_POSITION_ANGLES[config.SERVO_ID_SHOULDER])
-                    self.arduino.send_command(config.SERVO_ID_ELBOW, config.HOME_POSITION_ANGLES[config.SERVO_ID_ELBOW])
-                    self.arduino.send_command(config.SERVO_ID_WRIST, config.HOME_POSITION_ANGLES[config.SERVO_ID_WRIST])
-                    # (土台とグリッパーは現在の角度を維持)
-
-                    time.sleep(1.0) # 持ち上げ待機
-
-                    # 2. 持ち上げ完了。PLACE指示を待つIDLE状態に。
-                    print("[RealTime] 持ち上げ完了。PLACE指示を待機します。")
-                    self.current_task = {"command": "IDLE_HOLDING"}
-
-                elif command == "IDLE_HOLDING":
-                    # 役割: 物体を掴んだまま、次の指示(PLACE)を待つ
-                    # (何もしない。ループで待機)
-                    pass
-
-                elif command == "PLACE":
-                    self._execute_place_routine()
+                with self.latency.timer(STAGE_TICK):
+                    self.check_for_new_task()
+                    command = self.current_task.get("command", "IDLE") # デフォルトはIDLE
+                    self._sync_pipeline_target(command)
+                    self._update_ir_mode(command)
 
-                elif command == "STOP":
-                    self._execute_stop_routine()
+                    self._control_tick(command)
 
-                elif command == "IDLE":
-                    pass
+                self._print_scheduler_report()
 
-                loop_ms = (time.time() - start_time) * 1000
-                self._calculate_and_print_fps(loop_ms)
+                # 次のティックまで眠る (待機ステートは低い周期で)
+                self.scheduler.wait_next(idle=command in ("IDLE", "IDLE_HOLDING"))
 
         except KeyboardInterrupt:
             print("[RealTime] 終了シグナル受信。")
         finally:
             print("[RealTime] シャットダウン中... アームをホームポジションに戻します。")
-            self._execute_stop_routine()
-            time.sleep(1.0)
+            if self.pipeline:
+                self._execute_stop_routine(blocking=True)
+                self.pipeline.stop()
 
+            if hasattr(self, 'ir'):
+                self.ir.stop()
             if hasattr(self, 'arduino'):
                 self.arduino.disconnect()
-            if hasattr(self, 'cam'):
-                self.cam.release()
+            if hasattr(self, 'detector'):
+                self.detector.close()
+            if hasattr(self, 'frame_bus'):
+                self.frame_bus.close()
             print("[RealTime] ハードウェアを解放しました。")
@@ -0,0 +1,98 @@
+"""
+scheduler.py
+プロセスA (リアルタイム制御) の周期実行スケジューラ。
+制御ティックを決まった周期 (例: 30Hz) で回す。
+
+- 次の実行時刻は「絶対時刻」で管理する (処理時間の分だけ周期がずれていかない)
+- 締め切りに間に合わなかったティック (オーバーラン) は数えて報告する。
+  遅れを取り戻すために連続実行はせず、その時点から周期を数え直す
+- 待機中のステート (IDLE など) は低い周期で眠り、CPUを推論に譲る
+"""
+
+import time
+
+
+class RateScheduler:
+
+    def __init__(self, rate_hz, idle_rate_hz=None, report_interval_s=1.0):
+        """
+        @param rate_hz: 通常の制御周期 [Hz]
+        @param idle_rate_hz: 待機ステートでの周期 [Hz] (None なら rate_hz と同じ)
+        @param report_interval_s: 統計を区切る間隔 [秒]
+        """
+        self.period = 1.0 / rate_hz
+        self.idle_period = 1.0 / (idle_rate_hz or rate_hz)
+        self.report_interval = report_interval_s
+
+        self.next_deadline = None
+
+        # --- 統計 (累計) ---
+        self.total_ticks = 0
+        self.total_overruns = 0
+
+        # --- 統計 (報告間隔ごと) ---
+        self._window_start = time.monotonic()
+        self._window_ticks = 0
+        self._window_overruns = 0
+        self._window_max_late = 0.0
+        self._window_max_busy = 0.0
+        self._tick_start = None
+
+    def start(self):
+        """最初のティックの時刻を決める (ループ開始直前に呼ぶ)"""
+        now = time.monotonic()
+        self.next_deadline = now
+        self._window_start = now
+        self._tick_start = now
+
+    def wait_next(self, idle=False):
+        """
+        今回のティックを締めて、次のティックの時刻まで眠る
+        @param idle: True なら待機用の周期で眠る
+        @return (bool): 今回のティックが締め切りに間に合ったか
+        """
+        if self.next_deadline is None:
+            self.start()
+
+        now = time.monotonic()
+        self._window_max_busy = max(self._window_max_busy, now - self._tick_start)
+        self.total_ticks += 1
+        self._window_ticks += 1
+
+        self.next_deadline += self.idle_period if idle else self.period
+        on_time = now <= self.next_deadline
+        if on_time:
+            time.sleep(self.next_deadline - now)
+        else:
+            # オーバーラン: 数えて、遅れた時刻から周期を数え直す (まとめて取り戻さない)
+            self.total_overruns += 1
+            self._window_overruns += 1
+            self._window_max_late = max(self._window_max_late, now - self.next_deadline)
+            self.next_deadline = now
+
+        self._tick_start = time.monotonic()
+        return on_time
+
+    def poll_report(self):
+        """
+        報告間隔が過ぎていれば、その間の統計を返してリセットする
+        @return (dict): 統計 or None (まだ間隔が過ぎていない)
+        """
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.report_interval:
+            return None
+
+        report = {
+            "rate_hz": self._window_ticks / elapsed,
+            "overruns": self._window_overruns,
+            "max_late_ms": self._window_max_late * 1000,
+            "max_busy_ms": self._window_max_busy * 1000,
+            "total_overruns": self.total_overruns,
+        }
+        self._window_start = now
+        self._window_ticks = 0
+        self._window_overruns = 0
+        self._window_max_late = 0.0
+        self._window_max_busy = 0.0
+        return report
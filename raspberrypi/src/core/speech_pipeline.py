@@ -0,0 +1,230 @@
+"""
+speech_pipeline.py
+プロセスB (Orchestrator) の「音声 -> 認識 -> LLM -> 指示」を asyncio で並行に行う。
+
+従来は「録音 (2秒の無音まで) -> WAV の一時ファイル -> 認識 -> LLM」を順番に待っていたので、
+API を待っている間はマイクが止まり、発話ごとに全部の待ち時間が積み重なっていた。
+ここでは:
+- マイクは止めずに、ブロックごとにリングバッファへ書き続ける (src/hardware/audio.py の MicrophoneStream)
+- ブロックを1つずつストリーミングの VAD (src/processing/vad.py) に通し、発話の区間を切り出す
+- 切り出した発話はメモリ上の WAV にして、すぐに認識 + LLM のタスクとして投げる
+  (前の発話の API 応答を待たずに、次の発話の取り込み・認識が進む。同時実行数は max_concurrent まで)
+- 指示 (task_queue への送信) だけは発話の順番どおりに出す
+
+API は AsyncOpenAI を使う。接続先 (config.OPENAI_BASE_URL) を変えれば、
+ローカルの代役サーバー (benchmarks/speech_stub_server.py) で試せる。
+"""
+
+import asyncio
+import time
+
+from src.processing.audio_buffer import AudioRingBuffer, encode_wav
+from src.processing.llm_parser import parse_llm_response
+
+# ★★★ プロンプトエンジニアリングの核心 ★★★
+SYSTEM_PROMPT = """
+    あなたはロボットアームの司令塔です。
+    ユーザーからの自然言語の指示を、以下の厳密なJSON形式に変換してください。
+
+    1. 物体を探して掴む:
+    {"command": "PICKUP", "target": "物体名"}
+    2. 物体を置く:
+    {"command": "PLACE", "location": "場所名"}
+    3. 停止:
+    {"command": "STOP"}
+
+    例:
+    User: "りんごを掴んで" -> {"command": "PICKUP", "target": "りんご"}
+    User: "それをテーブルに置いて" -> {"command": "PLACE", "location": "テーブル"}
+    User: "止まって" -> {"command": "STOP"}
+
+    指示が無効な場合は {"command": "INVALID"} と返してください。
+    JSONのみを返答してください。
+    """
+
+
+class SpeechClient:
+    """認識 (Whisper) と LLM の API 呼び出し (失敗したら None を返す)"""
+
+    def __init__(self, client, stt_model, llm_model, language="ja"):
+        """
+        @param client: openai.AsyncOpenAI (base_url で接続先を差し替えられる)
+        """
+        self.client = client
+        self.stt_model = stt_model
+        self.llm_model = llm_model
+        self.language = language
+
+    async def transcribe_audio(self, audio_file):
+        """
+        Whisper APIで音声をテキストに変換
+        @param audio_file: 開いたファイル、または (ファイル名, WAV の bytes)
+        """
+        try:
+            transcription = await self.client.audio.transcriptions.create(
+                model=self.stt_model,
+                file=audio_file,
+                language=self.language,
+            )
+            print(f"[Speech] 認識結果: {transcription.text}")
+            return transcription.text
+        except Exception as e:
+            print(f"[Speech] Whisper APIエラー: {e}")
+            return None
+
+    async def get_llm_instruction(self, text):
+        """LLM APIでテキストをJSONコマンドに変換"""
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.llm_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": text}
+                ],
+                response_format={"type": "json_object"}
+            )
+            json_response = response.choices[0].message.content
+            print(f"[Speech] LLM応答 (JSON): {json_response}")
+            return json_response
+        except Exception as e:
+            print(f"[Speech] LLM APIエラー: {e}")
+            return None
+
+    async def text_to_task(self, text):
+        """テキスト -> 指示の辞書 (LLM + パース)。無効なら None"""
+        llm_json_command = await self.get_llm_instruction(text)
+        if not llm_json_command:
+            return None
+        task = parse_llm_response(llm_json_command)
+        if task and task.get("command") != "INVALID":
+            return task
+        return None
+
+
+class SpeechPipeline:
+
+    def __init__(self, speech_client, on_task, samplerate, channels, ring_seconds, vad, max_concurrent=2):
+        """
+        @param speech_client: SpeechClient
+        @param on_task: on_task(task) 指示の辞書を受け取る (発話の順番どおりに呼ばれる)
+        @param vad: StreamingVad
+        @param max_concurrent: 同時に API を待つ発話の数
+        """
+        self.speech = speech_client
+        self.on_task = on_task
+        self.samplerate = samplerate
+        self.channels = channels
+        self.vad = vad
+        self.ring = AudioRingBuffer(int(ring_seconds * samplerate), channels)
+        self.max_concurrent = max_concurrent
+
+        self.utterances = 0     # (ログ用) 切り出した発話の数
+        self.skipped_blocks = 0 # (ログ用) 処理が遅れて読めずに捨てたブロック
+        self.dropped_utterances = 0  # (ログ用) 読む前に上書きされて捨てた発話
+        self._loop = None
+        self._blocks = None
+        self._read_index = 0
+        self._semaphore = None
+        self._last_dispatch = None  # 直前の発話の「指示を出し終えた」Future
+        self._tasks = set()
+
+    def on_block(self, end_index):
+        """
+        (音声スレッドから呼ばれる) リングバッファに end_index まで書き込まれたことを知らせる
+        run() の開始前に届いたブロックは読まない
+        """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._blocks.put_nowait, end_index)
+
+    def stop(self):
+        """run() を終わらせる (どのスレッドから呼んでもよい)"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._blocks.put_nowait, None)
+
+    async def run(self):
+        """ブロックを VAD に通し続け、発話ごとに認識のタスクを起動する (stop() まで)"""
+        self._blocks = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._read_index = self.ring.end
+        self._loop = asyncio.get_running_loop()
+        print("[Speech] 音声の常時取り込みを開始しました。(話しかけてください)")
+
+        try:
+            while True:
+                end_index = await self._blocks.get()
+                if end_index is None:
+                    break
+                start_index = self._read_index
+                if start_index < self.ring.oldest():
+                    # 処理が遅れてリングバッファを一周された -> 発話の途中なら捨ててやり直す
+                    self.skipped_blocks += 1
+                    self.vad.reset()
+                    start_index = self.ring.oldest()
+                if end_index <= start_index:
+                    continue
+                try:
+                    block = self.ring.read(start_index, end_index)
+                except ValueError:
+                    # 確認してから読むまでの間に一周された -> 上と同じく捨ててやり直す
+                    self.skipped_blocks += 1
+                    self.vad.reset()
+                    self._read_index = end_index
+                    continue
+                self._read_index = end_index
+
+                for utterance_start, utterance_end in self.vad.process(block, end_index):
+                    self._start_utterance(utterance_start, utterance_end)
+        finally:
+            self._loop = None
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _start_utterance(self, start_index, end_index):
+        """発話を切り出し、認識 + LLM のタスクを起動する (待たない)"""
+        start_index = max(start_index, self.ring.oldest())
+        try:
+            samples = self.ring.read(start_index, end_index)
+        except ValueError as e:
+            # 処理が止まっている間にリングバッファが発話の終わりまで上書きされた
+            # (例外で run() を終わらせると、以降ずっと聞き取れなくなるので、この発話だけ捨てる)
+            self.dropped_utterances += 1
+            print(f"[Speech] Warning: 発話がリングバッファで上書きされたため捨てます ({e})")
+            return
+        self.utterances += 1
+        number = self.utterances
+        duration = len(samples) / self.samplerate
+        print(f"[Speech] 発話 #{number} を検出 ({duration:.1f} 秒)。認識に送ります。")
+
+        previous = self._last_dispatch
+        done = self._loop.create_future()
+        self._last_dispatch = done
+        job = asyncio.create_task(self._handle_utterance(number, samples, previous, done))
+        self._tasks.add(job)
+        job.add_done_callback(self._tasks.discard)
+
+    async def _handle_utterance(self, number, samples, previous, done):
+        detected_at = time.time()
+        text = task = None
+        try:
+            async with self._semaphore:
+                audio_file = (f"utterance_{number}.wav", encode_wav(samples, self.samplerate, self.channels))
+                text = await self.speech.transcribe_audio(audio_file)
+                transcribed_at = time.time()
+                if text:
+                    task = await self.speech.text_to_task(text)
+            answered_at = time.time()
+
+            # 指示は発話の順番どおりに出す (前の発話の処理が終わるまで待つ)
+            if previous is not None:
+                await previous
+            if task:
+                self.on_task(task)
+            if text:
+                print(f"[Speech] 発話 #{number}: 認識 {(transcribed_at - detected_at) * 1000:.0f} ms + "
+                      f"LLM {(answered_at - transcribed_at) * 1000:.0f} ms | "
+                      f"検出から指示まで {(time.time() - detected_at) * 1000:.0f} ms")
+        finally:
+            if not done.done():
+                done.set_result(task)
@@ -1,6 +1,9 @@
 # arduino_com.py
 # Arduinoと4バイトバイナリプロトコルで通信します。
 # [HEADER, INDEX, ANGLE, CHECKSUM]
+# 全サーボ一括フレーム (変化した関節のみ):
+# [HEADER, FRAME_MARKER, SEQ, MASK, ANGLE..., CHECKSUM]
+# (応答は確認しないので、ARDUINO_FULL_FRAME_INTERVAL_S ごとに全関節を送り直す)
 
 import serial
 import time
@@ -14,6 +17,13 @@ class ArduinoCommunicator:
         self.timeout = timeout
         self.ser = None
         self.header = config.PACKET_HEADER
+        self.frame_marker = config.PACKET_FRAME_MARKER
+
+        # フレーム送信用: 通し番号と、最後に送った角度 (差分送信のため)
+        self.frame_seq = 0
+        self.last_sent_angles = [None] * config.SERVO_COUNT
+        self.full_frame_interval = config.ARDUINO_FULL_FRAME_INTERVAL_S
+        self._last_full_frame = 0.0  # 最後に全関節を送った時刻
 
     def connect(self):
         if self.ser and self.ser.is_open:
@@ -24,6 +34,8 @@ class ArduinoCommunicator:
         time.sleep(2)
 
         self.ser.flushInput()
+        # 再接続時はArduino側の角度が不明なので、次のフレームで全関節を送る
+        self.last_sent_angles = [None] * config.SERVO_COUNT
         try:
             self.ser.readline()
             self.ser.readline()
@@ -60,6 +72,7 @@ class ArduinoCommunicator:
 
         try:
             self.ser.write(packet)
+            self.last_sent_angles[index_byte] = angle_byte
 
             # リアルタイム制御では、応答待ちは「遅延」になるため
             # 応答を待たない (Fire and Forget) か、
@@ -75,3 +88,63 @@ class ArduinoCommunicator:
             print(f"[ArduinoCom] Error: シリアル通信エラー: {e}")
             return False
 
+
+    def send_frame(self, angles):
+        """
+        全サーボの目標角度 (SERVO_COUNT要素) を1パケットで送る。
+        前回送った角度から変化した関節だけを MASK で指定して載せる。
+        (full_frame_interval 秒ごとに、変化の有無に関係なく全関節を載せる)
+        @return (bool): 送信成功 (変化なしで送信不要の場合も True)
+        """
+        if not self.ser or not self.ser.is_open:
+            print("[ArduinoCom] Error: Arduinoが接続されていません。")
+            return False
+
+        if len(angles) != config.SERVO_COUNT:
+            print(f"[ArduinoCom] Error: 角度リストは{config.SERVO_COUNT}要素必要です ({len(angles)}を受け取り)。")
+            return False
+
+        now = time.time()
+        full_frame = now - self._last_full_frame >= self.full_frame_interval
+        mask = 0
+        payload = []
+        for i, angle in enumerate(angles):
+            angle_byte = int(angle)
+            if angle_byte < 0 or angle_byte > 180:
+                print(f"[ArduinoCom] Error: 無効な角度 {angle} (サーボ {i})")
+                return False
+            if full_frame or self.last_sent_angles[i] != angle_byte:
+                mask |= (1 << i)
+                payload.append(angle_byte)
+
+        if mask == 0:
+            return True # 変化なし
+
+        self.frame_seq = (self.frame_seq + 1) & 0xFF
+        body = [self.header, self.frame_marker, self.frame_seq, mask] + payload
+        packet = bytes(body + [sum(body) & 0xFF])
+
+        try:
+            self.ser.write(packet)
+            for i, angle_byte in enumerate(angles):
+                if mask & (1 << i):
+                    self.last_sent_angles[i] = int(angle_byte)
+            if full_frame:
+                self._last_full_frame = now
+            return True # (応答 "ACK:<seq>" は確認しない)
+
+        except serial.SerialException as e:
+            print(f"[ArduinoCom] Error: シリアル通信エラー: {e}")
+            return False
+
+    def refresh(self):
+        """
+        新しい指令が無い間も、full_frame_interval ごとに最後の角度を全関節送り直す
+        (差分フレームが途中で壊れて捨てられても、その関節が古い角度のまま止まらないように)
+        @return (bool): 送信成功 (まだ送り直す時刻でない場合も True)
+        """
+        if None in self.last_sent_angles:
+            return True  # まだ全関節を送っていない (Arduino 側の角度が不明なので勝手に動かさない)
+        if time.time() - self._last_full_frame < self.full_frame_interval:
+            return True
+        return self.send_frame(list(self.last_sent_angles))
@@ -1,13 +1,18 @@
 """
 audio.py
 sounddevice を使った音声録音（簡易VAD付き）
+- AudioRecorder    : 話し始めから無音まで録音し、メモリ上の WAV を返す (ブロッキング。順番に処理する方式)
+- MicrophoneStream : マイクを止めずに、ブロックごとにリングバッファへ書き続ける
+                     (src/core/speech_pipeline.py が発話を切り出して並行して認識する)
 """
 
 import sounddevice as sd
 import numpy as np
-import scipy.io.wavfile as wav
-import tempfile
-import time
+
+from src.processing.audio_buffer import encode_wav
+
+_INITIAL_RECORD_SECONDS = 10.0  # 録音バッファの初期容量 (足りなくなったら倍に広げる)
+
 
 class AudioRecorder:
     def __init__(self, samplerate, channels, silence_threshold, silence_duration):
@@ -17,30 +22,45 @@ class AudioRecorder:
         self.silence_sec = silence_duration
         self.frames_per_buffer = int(samplerate * 0.1) # 100msごとに判定
         self.silence_buffers_needed = int(self.silence_sec * 10)
+        # 録音先の int16 バッファ (事前に確保し、録音のたびに使い回す)
+        self._recording = np.empty((int(samplerate * _INITIAL_RECORD_SECONDS), channels), dtype=np.int16)
 
     def _calculate_rms(self, data):
-        """音声フレームのエネルギー(RMS)を計算"""
-        return np.sqrt(np.mean(data**2))
+        """
+        音声フレームのエネルギー(RMS)を計算 (int16 -> -1..1 の振幅で)
+        (以前の float32 のストリームと同じ尺度なので、AUDIO_SILENCE_THRESHOLD はそのまま使える。
+         int16 のまま2乗すると桁あふれするので、必ず float にしてから計算する)
+        """
+        samples = data.astype(np.float32) / 32768.0
+        return np.sqrt(np.mean(samples**2))
+
+    def _append(self, length, frames):
+        """録音バッファの length の位置に frames を書き込む (容量が足りなければ倍に広げる)"""
+        end = length + len(frames)
+        if end > len(self._recording):
+            grown = np.empty((max(end, 2 * len(self._recording)), self.channels), dtype=np.int16)
+            grown[:length] = self._recording[:length]
+            self._recording = grown
+        self._recording[length:end] = frames
+        return end
 
     def listen_and_record(self):
         """
         話しかけられるまで待機し、録音を開始。
-        一定時間無音が続いたら録音を終了し、ファイルパスを返す。
+        一定時間無音が続いたら録音を終了し、メモリ上の WAV (bytes) を返す。
+        (ファイルには書かない。API にはファイル名と組にして渡す: ("speech.wav", data))
         """
-        recorded_frames = []
+        length = 0
         is_recording = False
         silent_buffers_count = 0
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav", prefix="rec_")
-        temp_file.close()
-
         try:
             # sounddeviceのInputStream
             with sd.InputStream(
                 samplerate=self.samplerate,
                 channels=self.channels,
                 blocksize=self.frames_per_buffer,
-                dtype='float32'
+                dtype='int16'
             ) as stream:
                 while True:
                     # 100ms分の音声データを読み込む
@@ -52,7 +72,7 @@ class AudioRecorder:
 
                     if is_recording:
                         # --- 録音中の処理 ---
-                        recorded_frames.append(frames)
+                        length = self._append(length, frames)
 
                         if rms < self.threshold:
                             silent_buffers_count += 1
@@ -68,16 +88,58 @@ class AudioRecorder:
                         if rms > self.threshold:
                             print("[Audio] 音声を検出。録音を開始します...")
                             is_recording = True
-                            recorded_frames.append(frames) # 録音開始
+                            length = self._append(length, frames) # 録音開始
 
-            # --- 録音終了後、ファイルに保存 ---
-            if recorded_frames:
-                recording = np.concatenate(recorded_frames, axis=0)
-                wav.write(temp_file.name, self.samplerate, recording)
-                return temp_file.name
+            # --- 録音終了後、メモリ上で WAV にする ---
+            if length:
+                return encode_wav(self._recording[:length], self.samplerate, self.channels)
             else:
                 return None
 
         except Exception as e:
             print(f"[Audio] Error: 録音中にエラー: {e}")
             return None
+
+
+class MicrophoneStream:
+    """
+    sounddevice のコールバック (音声スレッド) で、受け取ったブロックを
+    AudioRingBuffer (src/processing/audio_buffer.py) に書き込み、on_block に通知する
+    """
+
+    def __init__(self, ring, samplerate, channels, block_samples, on_block):
+        """
+        @param ring: AudioRingBuffer (書き手はこのストリームだけ)
+        @param on_block: on_block(end_index) 書き込んだブロックの終わりの通算サンプル番号を渡す
+                         (音声スレッドから呼ばれるので、asyncio へは call_soon_threadsafe で渡すこと)
+        """
+        self.ring = ring
+        self.samplerate = samplerate
+        self.channels = channels
+        self.block_samples = block_samples
+        self.on_block = on_block
+        self.overflows = 0
+        self._stream = None
+
+    def start(self):
+        self._stream = sd.InputStream(
+            samplerate=self.samplerate,
+            channels=self.channels,
+            blocksize=self.block_samples,
+            dtype='int16',
+            callback=self._callback,
+        )
+        self._stream.start()
+        print(f"[Audio] マイクの常時取り込みを開始 ({self.samplerate} Hz, {self.block_samples} サンプル/ブロック)")
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.overflows += 1
+        self.ring.write(indata)
+        self.on_block(self.ring.end)
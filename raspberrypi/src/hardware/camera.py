@@ -3,14 +3,35 @@ camera.py
 Raspberry Pi 5 (libcamera) ネイティブ対応版。
 picamera2ライブラリを使用してカメラを制御します。
 OpenCVのVideoCapture(V4L2)は使用しません。
+
+フレームは事前に確保したリングバッファ (ring_size 枚) に書き込んで返す。
+- XRGB8888 はメモリ上では [B, G, R, X] の順 (リトルエンディアン) なので、
+  BGR が欲しい場合は X を落とすだけでよい (チャンネルの並べ替えは不要)
+- カメラのバッファ (DMA) から、リングの1枚へ直接 cv2.cvtColor(dst=...) で書き込む
+  (capture_array() のコピーと、cvtColor の新規確保の2回分のメモリ確保が無くなる)
+
+注意: 返すフレームはリングの1枚を指すビュー。ring_size 回後の取り込みで上書きされる。
+      長く保持する場合は呼び出し側で .copy() すること。
 """
 
 import cv2
+import numpy as np
 import time
-from picamera2 import Picamera2
+from picamera2 import Picamera2, MappedArray
+
+# 検出器に渡すチャンネル順 -> XRGB8888 (メモリ上は BGRX) からの変換コード
+_CONVERSIONS = {
+    "BGR": cv2.COLOR_BGRA2BGR,  # ultralytics / OpenCV
+    "RGB": cv2.COLOR_BGRA2RGB,  # torch.hub の YOLOv5 (AutoShape) など
+}
 
 class Camera:
-    def __init__(self, camera_id, width, height):
+    def __init__(self, camera_id, width, height, ring_size=4, channel_order="BGR"):
+        """
+        @param ring_size: 使い回すフレームの枚数
+                          (撮影中 + 受け渡し待ち + 推論中 の3枚より多くしておく)
+        @param channel_order: 返すフレームのチャンネル順 ("BGR" or "RGB")
+        """
         # camera_id は picamera2 では 0, 1... で指定する
         print(f"[Camera] Picamera2 (libcamera) を初期化中 (ID: {camera_id})...")
         self.picam2 = Picamera2(camera_id)
@@ -32,26 +53,60 @@ class Camera:
              print(f"[Camera] 警告: 要求解像度 {width}x{height} と異なります。")
              print(f"[Camera] 設定サイズ: {self.width}x{self.height}")
 
+        # --- フレームのリングバッファ (起動時に一度だけ確保) ---
+        self.conversion = _CONVERSIONS[channel_order]
+        self.ring = np.empty((ring_size, height, width, 3), dtype=np.uint8)
+        self.ring_index = 0
+
         self.picam2.start()
         print(f"[Camera] プレビューストリーム開始。解像度: {self.width}x{self.height}")
         # 起動直後は不安定なため少し待つ
         time.sleep(0.5)
 
-    def get_frame(self):
+    def capture(self):
         """
-        picamera2からフレームを取得し、OpenCV (BGR) 形式のNumpy配列で返す
+        picamera2から "main" ストリームの次のフレーム (リクエスト) を取得する
+        (まだコピーはしない。to_bgr() で変換してから解放する)
         """
         try:
-            # capture_array() は "main" ストリームからRGB配列を取得する
-            frame_rgb = self.picam2.capture_array("main")
-
-            # YOLO (OpenCV) は BGR 形式を期待するので変換する
-            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+            return True, self.picam2.capture_request()
+        except Exception as e:
+            print(f"[Camera] Error: フレームのキャプチャに失敗: {e}")
+            return False, None
 
-            return True, frame_bgr
+    def to_bgr(self, request, dst=None):
+        """
+        カメラのバッファを、リングの次の1枚へ直接変換して書き込む
+        (capture と分けておき、取り込みと色変換の時間を別々に計測できるようにする)
+        @param dst: 書き込み先 (height, width, 3)。指定するとリングの代わりにここへ書く
+                    (フレームバスの共有メモリなど)
+        @return (ndarray): 書き込んだフレーム (リング内のビュー or dst)
+        """
+        if dst is None:
+            frame = self.ring[self.ring_index]
+            self.ring_index = (self.ring_index + 1) % len(self.ring)
+        else:
+            frame = dst
+        try:
+            with MappedArray(request, "main") as mapped:
+                # (行末にパディングがある場合に備えて幅で切る)
+                cv2.cvtColor(mapped.array[:, :self.width], self.conversion, dst=frame)
+        finally:
+            request.release()  # バッファをカメラに返す
+        return frame
 
+    def get_frame(self):
+        """
+        picamera2からフレームを取得し、OpenCV (BGR) 形式のNumpy配列で返す
+        (channel_order="RGB" の場合は RGB)
+        """
+        ret, request = self.capture()
+        if not ret:
+            return False, None
+        try:
+            return True, self.to_bgr(request)
         except Exception as e:
-            print(f"[Camera] Error: フレームのキャプチャに失敗: {e}")
+            print(f"[Camera] Error: フレームの変換に失敗: {e}")
             return False, None
 
     def release(self):
@@ -1,6 +1,7 @@
 """
 ir_sensor.py
 I2C接続の VL53L0X (Time-of-Flight) センサーから距離を読み取る
+(制御ループからは直接呼ばず、ir_sensor_service.py のスレッドが連続測定モードで読み続ける)
 """
 
 import board
@@ -9,7 +10,12 @@ import adafruit_vl53l0x
 import time
 
 class IRSensor:
-    def __init__(self):
+    def __init__(self, timing_budget_us=200000):
+        """
+        @param timing_budget_us: 1回の測定にかける時間 [マイクロ秒] (長いほど高精度・低速。センサーの既定は 33000)
+        """
+        self.timing_budget_us = timing_budget_us
+        self._continuous = False
         print("[IRSensor] I2CバスとVL53L0Xセンサーを初期化中...")
         try:
             # Raspberry Pi 5 の標準I2Cバス (SDA=GPIO2, SCL=GPIO3) を初期化
@@ -18,8 +24,8 @@ class IRSensor:
             # センサーを初期化
             self.sensor = adafruit_vl53l0x.VL53L0X(self.i2c)
 
-            # オプション: 高精度モードに設定 (速度は少し落ちる)
-            self.sensor.measurement_timing_budget = 200000
+            # 1回の測定時間 (200000 = 高精度モード。速度は落ちる)
+            self.sensor.measurement_timing_budget = timing_budget_us
 
             print("[IRSensor] VL53L0X センサー初期化完了。")
 
@@ -31,6 +37,44 @@ class IRSensor:
             print(f"[IRSensor] Error: VL53L0X センサーが見つかりません: {e}")
             self.sensor = None
 
+    @property
+    def connected(self):
+        return self.sensor is not None
+
+    def start_continuous(self):
+        """
+        連続測定モードにする (センサーが次々に測定し、get_distance_cm() は次の測定の完了を待って返す)
+        """
+        if self.sensor:
+            self.sensor.start_continuous()
+            self._continuous = True
+
+    def stop_continuous(self):
+        if self.sensor:
+            try:
+                self.sensor.stop_continuous()
+            except RuntimeError as e:
+                print(f"[IRSensor] Warning: 連続測定の停止に失敗: {e}")
+            self._continuous = False
+
+    def set_timing_budget(self, timing_budget_us):
+        """
+        1回の測定時間を変える (連続測定中なら止めて変えてから再開する)
+        (I2C を使うので、センサーを読んでいるスレッドから呼ぶこと)
+        """
+        self.timing_budget_us = timing_budget_us
+        if not self.sensor:
+            return
+        continuous = self._continuous
+        try:
+            if continuous:
+                self.sensor.stop_continuous()
+            self.sensor.measurement_timing_budget = timing_budget_us
+            if continuous:
+                self.sensor.start_continuous()
+        except (RuntimeError, ValueError) as e:
+            print(f"[IRSensor] Warning: 測定時間の変更に失敗: {e}")
+
     def get_distance_cm(self):
         """
         センサーから距離[cm]を取得する
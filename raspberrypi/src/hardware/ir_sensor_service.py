@@ -0,0 +1,208 @@
+"""
+ir_sensor_service.py
+IRセンサー (VL53L0X) を専用スレッドで連続測定し、フィルタ済みの最新値を共有メモリに置く。
+
+従来は制御ループ (CaptureStage) が毎回 get_distance_cm() を呼び、
+1回の測定 (timing budget = 200ms) が終わるまで待たされていた。
+ここでは:
+- センサーを連続測定モード (start_continuous) にして、専用スレッドで読み続ける
+- 外れ値に強い移動中央値 (モードごとの件数) -> 指数移動平均 (EMA) の順にフィルタする
+- (距離, 時刻, 有効フラグ) をシーケンスロック付きの共有配列 (multiprocessing.RawArray) に書く
+    書き込み開始で version を奇数、書き込み完了で偶数に進める (frame_bus.py と同じ方式)
+    読み手は version が偶数で、読む前後で変わっていなければ採用する (ロック不要・数マイクロ秒)
+
+共有配列のレイアウト: [version, 距離 cm, 時刻 (time.time()), 有効フラグ (1.0 / 0.0)]
+共有配列は別プロセスにも渡せる (IRSampleReader(service.shared) で読む)。
+
+測定モード (set_mode() で実行中に切り替える。I2C の操作はこのスレッドが次の測定の前に行う):
+- MODE_FAST     : 短い timing budget (~20ms)。探索・接近中
+- MODE_ACCURATE : 長い timing budget (~200ms)。掴む直前だけ
+切り替えのたびに、直前のモードで実際に出ていた測定レートを表示する。
+"""
+
+import collections
+import multiprocessing as mp
+import threading
+import time
+
+_VERSION, _DISTANCE, _TIMESTAMP, _VALID = range(4)
+_FIELDS = 4
+
+MODE_FAST = "fast"
+MODE_ACCURATE = "accurate"
+_DEFAULT_TIMING_BUDGETS_US = {MODE_FAST: 20000, MODE_ACCURATE: 200000}
+_DEFAULT_MEDIAN_WINDOWS = {MODE_FAST: 5, MODE_ACCURATE: 3}
+
+
+class IRSampleReader:
+    """共有配列から最新の測定値を読む側 (制御ループ / 別プロセス)"""
+
+    def __init__(self, shared, max_age_s=0.3):
+        """
+        @param shared: IRSensorService.shared (RawArray('d', 4))
+        @param max_age_s: これより古い測定値は無効として扱う [秒]
+        """
+        self.shared = shared
+        self.max_age_s = max_age_s
+
+    def read(self):
+        """
+        最新の測定値を返す (書き込み中なら書き終わるまで読み直す)
+        @return (tuple): (距離 cm, 時刻, 有効か)
+        """
+        shared = self.shared
+        while True:
+            version = shared[_VERSION]
+            if int(version) % 2 == 1:
+                time.sleep(0)  # 書き込み中 (同じプロセスの書き手スレッドに GIL を譲る)
+                continue
+            distance = shared[_DISTANCE]
+            timestamp = shared[_TIMESTAMP]
+            valid = shared[_VALID]
+            if shared[_VERSION] == version:
+                break
+        fresh = timestamp > 0 and time.time() - timestamp <= self.max_age_s
+        return distance, timestamp, bool(valid) and fresh
+
+    def get_distance_cm(self):
+        """IRSensor.get_distance_cm() と同じ形 (無効なら -1.0)"""
+        distance, _, valid = self.read()
+        return distance if valid else -1.0
+
+
+class IRSensorService(threading.Thread):
+    """IRSensor を連続測定モードで読み続け、フィルタ済みの値を共有配列に書くスレッド"""
+
+    def __init__(self, ir, timing_budgets_us=None, median_windows=None, ema_alpha=0.5,
+                 min_range_cm=1.0, max_range_cm=120.0, max_age_s=0.5, initial_mode=MODE_FAST):
+        """
+        @param ir: src/hardware/ir_sensor.py の IRSensor
+        @param timing_budgets_us: {モード: 1回の測定時間 [マイクロ秒]}
+        @param median_windows: {モード: 移動中央値を取る件数} (スパイク状の外れ値を消す)
+        @param ema_alpha: EMA の係数 (0..1、大きいほど新しい値に素早く追従する)
+        @param min_range_cm, max_range_cm: この範囲外の測定値は無効 (対象なしのとき VL53L0X は約 819cm を返す)
+        @param max_age_s: これより長く有効な測定が途切れたらフィルタをやり直す / 読み手は無効とみなす
+        """
+        super().__init__(name="IRSensorService", daemon=True)
+        self.ir = ir
+        self.timing_budgets_us = timing_budgets_us or _DEFAULT_TIMING_BUDGETS_US
+        self.median_windows = median_windows or _DEFAULT_MEDIAN_WINDOWS
+        self.ema_alpha = ema_alpha
+        self.min_range_cm = min_range_cm
+        self.max_range_cm = max_range_cm
+        self.max_age_s = max_age_s
+
+        self.shared = mp.RawArray("d", _FIELDS)
+        self.reader = IRSampleReader(self.shared, max_age_s)
+        self.samples = 0    # (ログ用) 測定した回数
+        self.rejected = 0   # (ログ用) 範囲外・エラーで捨てた回数
+
+        self._stop_event = threading.Event()
+        self._requested_mode = initial_mode  # set_mode() が書き、スレッドが次の測定の前に反映する
+        self._mode = None                    # センサーに反映済みのモード
+        self._mode_started = 0.0
+        self._mode_samples = 0
+        self._counts_started = time.time()
+        self._window = collections.deque()
+        self._ema = None
+        self._last_valid_time = 0.0
+
+    # --- 読み手向け (制御ループはこちらを呼ぶ) ---
+    def read(self):
+        """@return (tuple): (距離 cm, 時刻, 有効か)"""
+        return self.reader.read()
+
+    def get_distance_cm(self):
+        return self.reader.get_distance_cm()
+
+    @property
+    def mode(self):
+        """要求中の測定モード"""
+        return self._requested_mode
+
+    def set_mode(self, mode):
+        """測定モードを切り替える (待たない。スレッドが次の測定の前にセンサーへ反映する)"""
+        if mode not in self.timing_budgets_us:
+            raise ValueError(f"不明な IR の測定モード: {mode}")
+        self._requested_mode = mode
+
+    def pop_counts(self):
+        """(ログ用) 前回からの測定回数・捨てた回数・測定レート・今のモードを返してリセットする"""
+        now = time.time()
+        elapsed = max(now - self._counts_started, 1e-6)
+        counts = {"samples": self.samples, "rejected": self.rejected,
+                  "rate_hz": self.samples / elapsed, "mode": self._mode}
+        self.samples = self.rejected = 0
+        self._counts_started = now
+        return counts
+
+    # --- スレッド ---
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+    def run(self):
+        self._apply_mode(self._requested_mode)
+        self.ir.start_continuous()
+        print(f"[IRSensorService] 連続測定を開始 (モード {self._mode}, 中央値 + EMA α={self.ema_alpha})")
+        try:
+            while not self._stop_event.is_set():
+                if self._requested_mode != self._mode:
+                    self._apply_mode(self._requested_mode)
+
+                # (連続測定モードでは、次の測定が終わるまでここで待つ = timing budget ごとに1回)
+                raw_cm = self.ir.get_distance_cm()
+                if not self.ir.connected:
+                    time.sleep(self.ir.timing_budget_us / 1e6)  # ダミー値も実機と同じ間隔で出す
+                now = time.time()
+                self.samples += 1
+                self._mode_samples += 1
+
+                if self.min_range_cm <= raw_cm <= self.max_range_cm:
+                    self._publish(self._filter(raw_cm, now), now, True)
+                else:
+                    self.rejected += 1
+                    if now - self._last_valid_time > self.max_age_s:
+                        self._publish(-1.0, now, False)  # 対象が無い状態が続いている
+        finally:
+            self.ir.stop_continuous()
+
+    def _apply_mode(self, mode):
+        """センサーの測定時間を変え、フィルタをやり直す (直前のモードの測定レートを表示する)"""
+        now = time.time()
+        budget_us = self.timing_budgets_us[mode]
+        if self._mode is not None:
+            elapsed = max(now - self._mode_started, 1e-6)
+            print(f"[IRSensorService] モード切替: {self._mode} -> {mode} (budget {budget_us / 1000:.0f} ms) | "
+                  f"{self._mode} の測定レート {self._mode_samples / elapsed:.1f} Hz ({self._mode_samples} 回 / {elapsed:.1f} 秒)")
+        self.ir.set_timing_budget(budget_us)
+        self._mode = mode
+        self._mode_started = now
+        self._mode_samples = 0
+        # 測定の精度が変わるので、前のモードの値はフィルタに残さない
+        self._window = collections.deque(maxlen=self.median_windows[mode])
+        self._ema = None
+
+    def _filter(self, distance_cm, now):
+        """移動中央値 -> EMA (測定が途切れていたらやり直す)"""
+        if now - self._last_valid_time > self.max_age_s:
+            self._window.clear()
+            self._ema = None
+        self._last_valid_time = now
+
+        self._window.append(distance_cm)
+        median = sorted(self._window)[len(self._window) // 2]
+        if self._ema is None:
+            self._ema = median
+        else:
+            self._ema += self.ema_alpha * (median - self._ema)
+        return self._ema
+
+    def _publish(self, distance_cm, timestamp, valid):
+        """シーケンスロックで共有配列に書く (書き手はこのスレッドだけ)"""
+        shared = self.shared
+        shared[_VERSION] += 1  # 奇数: 書き込み中
+        shared[_DISTANCE] = distance_cm
+        shared[_TIMESTAMP] = timestamp
+        shared[_VALID] = 1.0 if valid else 0.0
+        shared[_VERSION] += 1  # 偶数: 書き込み完了
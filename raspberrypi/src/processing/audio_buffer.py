@@ -0,0 +1,77 @@
+"""
+audio_buffer.py
+音声データ (int16 PCM) の入れ物と WAV への変換。
+(マイク = src/hardware/audio.py と、認識に送る側 = src/core/speech_pipeline.py で共通に使う)
+
+- AudioRingBuffer : 固定長のリングバッファ。マイクのコールバックが書き続け、
+                    読み手は「通算のサンプル番号」の区間 [start, end) を指定して切り出す
+- encode_wav      : int16 のサンプル -> メモリ上の WAV (bytes)。ファイルには書かない
+"""
+
+import io
+import wave
+
+import numpy as np
+
+
+def encode_wav(samples, samplerate, channels=1):
+    """
+    int16 のサンプルをメモリ上で WAV にする
+    @param samples: (N,) or (N, channels) int16
+    @return (bytes): WAV ファイルの中身 (API にはファイル名と組にして渡す: ("speech.wav", data))
+    """
+    samples = np.ascontiguousarray(samples, dtype=np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(samplerate)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class AudioRingBuffer:
+    """
+    int16 の固定長リングバッファ (書き手は1つ)
+    end は通算で書き込んだサンプル数。読み手は end - capacity 以降の区間だけ読める
+    """
+
+    def __init__(self, capacity_samples, channels=1):
+        self.capacity = int(capacity_samples)
+        self.channels = channels
+        self._buffer = np.zeros((self.capacity, channels), dtype=np.int16)
+        self.end = 0
+
+    def write(self, block):
+        """(n, channels) int16 を書き込む (古いデータは上書きされる)"""
+        n = len(block)
+        if n >= self.capacity:
+            # 容量より長い分は最後の capacity サンプルだけ残す
+            self._buffer[:] = block[n - self.capacity:]
+            self._buffer[:] = np.roll(self._buffer, (self.end + n) % self.capacity, axis=0)
+        else:
+            pos = self.end % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buffer[pos:pos + first] = block[:first]
+            self._buffer[:n - first] = block[first:]
+        # (データを書き終えてから end を進める: 読み手が書きかけの区間を読まないように)
+        self.end += n
+
+    def oldest(self):
+        """まだ読める最も古いサンプル番号"""
+        return max(0, self.end - self.capacity)
+
+    def read(self, start, end):
+        """
+        区間 [start, end) のコピーを返す
+        @return (ndarray): (end - start, channels) int16
+        """
+        if start < self.oldest() or end > self.end or start > end:
+            raise ValueError(f"区間 [{start}, {end}) は読めません (読める範囲: [{self.oldest()}, {self.end}))")
+        n = end - start
+        pos = start % self.capacity
+        first = min(n, self.capacity - pos)
+        out = np.empty((n, self.channels), dtype=np.int16)
+        out[:first] = self._buffer[pos:pos + first]
+        out[first:] = self._buffer[:n - first]
+        return out
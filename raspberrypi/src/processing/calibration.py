@@ -0,0 +1,241 @@
+"""
+calibration.py
+スナップショットのログ (test_integrated_sys の /api/snapshot_log が書く calibration_data_log.jsonl) から、
+カメラの内部・外部パラメータと IR の距離カーブをまとめて最小二乗で求める (ハンドアイキャリブレーション)。
+
+考え方:
+- スナップショットは「グリッパー先端をターゲットに合わせた状態」で撮る
+  -> 関節角度の順運動学 (FK) で、ターゲットのアーム座標が分かる
+- そのアーム座標を、カメラモデルで
+    * 画素に投影したもの       と 検出のボックス中心 (x, y)
+    * カメラの奥行きにしたもの と IR の生の値をカーブで距離にしたもの
+  が一致するように、全スナップショットの残差を1本のベクトルにして
+  scipy.optimize.least_squares で一度に解く (外れ値に強い soft_l1 損失)
+
+求めるパラメータ: fx, fy, cx, cy, (k1, k2), 回転 (Rodrigues 3), 並進 (3), IR カーブ (a, b, c)
+IR カーブ: 距離 [cm] = a / (生の値 - b) - c  (Sharp GP2Y0A21 の形。従来の 6762 / (raw - 9) - 4)
+
+結果はバージョン付きの JSON (models/calibration/calibration_<日時>.json) に保存し、
+同じ内容を config.CALIBRATION_PATH (起動時に読むファイル) にも書く。
+"""
+
+import datetime
+import json
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+import config
+from src.processing.camera_model import make_transform, project_points
+from src.processing.ir_calibration import ir_curve_distance
+
+CALIBRATION_FORMAT_VERSION = 1
+DEFAULT_IR_CURVE = config.IR_ANALOG_CURVE
+# 初期値からのずれの許容量 (弱い事前分布)。外部パラメータは縛らない
+_DEFAULT_PRIOR_SIGMA = {
+    "fx": 100.0, "fy": 100.0, "cx": 30.0, "cy": 30.0,
+    "ir_a": 2000.0, "ir_b": 10.0, "ir_c": 5.0,
+}
+
+
+# ==============================================================================
+# 保存・読み込み (実行時はこちらだけを使う)
+# ==============================================================================
+
+def load_calibration(path=None):
+    """
+    起動時にキャリブレーションファイルを読む
+    ("camera" と "ir_curve" の片方だけのファイルもある。無い方は config.py の値を使う)
+    @return (dict): 無い / 形式が違う場合は None (config.py の値を使う)
+    """
+    path = path or config.CALIBRATION_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Calibration] Warning: {path} を読めません: {e}")
+        return None
+    if data.get("format_version") != CALIBRATION_FORMAT_VERSION:
+        print(f"[Calibration] Warning: {path} の形式 (version {data.get('format_version')}) に対応していません。")
+        return None
+    return data
+
+
+def save_calibration(data, output_dir=None, current_path=None):
+    """
+    バージョン付きのファイル名で保存し、起動時に読むファイル (current_path) にもコピーする
+    @return (str): 保存したファイルのパス
+    """
+    output_dir = output_dir or os.path.dirname(config.CALIBRATION_PATH)
+    current_path = current_path or config.CALIBRATION_PATH
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(output_dir, f"calibration_{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    shutil.copyfile(path, current_path)
+    return path
+
+
+# ==============================================================================
+# スナップショットの読み込み
+# ==============================================================================
+
+def load_snapshots(log_path, angles_key="user_angles"):
+    """
+    calibration_data_log.jsonl から、ターゲットが検出されていて IR の値があるものだけを読む
+    @param angles_key: 関節角度に使う列 ("user_angles" = IK と同じ角度の定義, "arduino_angles" = 逆回転後)
+    @return (dict): {"joints": (N, 4) [土台, 肩, 肘, 手首], "pixels": (N, 2), "ir_raw": (N,), "timestamps": (N,)}
+    """
+    joints, pixels, ir_raw, timestamps = [], [], [], []
+    skipped = 0
+    with open(log_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            target = entry.get("target_detection") or {}
+            angles = entry.get(angles_key)
+            if "x" not in target or "y" not in target or not angles or entry.get("ir_raw") is None:
+                skipped += 1
+                continue
+            joints.append([
+                angles[config.SERVO_ID_BASE],
+                angles[config.SERVO_ID_SHOULDER],
+                angles[config.SERVO_ID_ELBOW],
+                angles[config.SERVO_ID_WRIST],
+            ])
+            pixels.append([target["x"], target["y"]])
+            ir_raw.append(entry["ir_raw"])
+            timestamps.append(entry.get("timestamp", 0.0))
+    if skipped:
+        print(f"[Calibration] ターゲット未検出などで {skipped} 件のスナップショットを除外しました。")
+    return {
+        "joints": np.asarray(joints, dtype=np.float64).reshape(-1, 4),
+        "pixels": np.asarray(pixels, dtype=np.float64).reshape(-1, 2),
+        "ir_raw": np.asarray(ir_raw, dtype=np.float64),
+        "timestamps": np.asarray(timestamps, dtype=np.float64),
+    }
+
+
+# ==============================================================================
+# 最小二乗
+# ==============================================================================
+
+class _Parameters:
+    """最適化するパラメータのベクトル <-> 名前付きの値"""
+
+    def __init__(self, fit_distortion):
+        self.fit_distortion = fit_distortion
+        names = ["fx", "fy", "cx", "cy"]
+        if fit_distortion:
+            names += ["k1", "k2"]
+        names += ["rx", "ry", "rz", "tx", "ty", "tz", "ir_a", "ir_b", "ir_c"]
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def pack(self, K, dist, T_arm_cam, ir_curve):
+        rvec, _ = cv2.Rodrigues(np.asarray(T_arm_cam)[:3, :3])
+        values = {
+            "fx": K[0][0], "fy": K[1][1], "cx": K[0][2], "cy": K[1][2],
+            "k1": dist[0], "k2": dist[1],
+            "rx": rvec[0, 0], "ry": rvec[1, 0], "rz": rvec[2, 0],
+            "tx": T_arm_cam[0][3], "ty": T_arm_cam[1][3], "tz": T_arm_cam[2][3],
+            "ir_a": ir_curve["a"], "ir_b": ir_curve["b"], "ir_c": ir_curve["c"],
+        }
+        return np.array([values[name] for name in self.names], dtype=np.float64)
+
+    def unpack(self, p):
+        v = {name: p[i] for name, i in self.index.items()}
+        K = np.array([[v["fx"], 0.0, v["cx"]], [0.0, v["fy"], v["cy"]], [0.0, 0.0, 1.0]])
+        dist = np.zeros(5)
+        if self.fit_distortion:
+            dist[:2] = v["k1"], v["k2"]
+        R, _ = cv2.Rodrigues(np.array([v["rx"], v["ry"], v["rz"]]))
+        T = make_transform(R, [v["tx"], v["ty"], v["tz"]])
+        ir_curve = {"a": v["ir_a"], "b": v["ir_b"], "c": v["ir_c"]}
+        return K, dist, T, ir_curve
+
+
+def _residuals(p, params, points_arm, pixels, ir_raw, pixel_sigma, range_sigma, prior_index, prior_center, prior_sigma):
+    """全スナップショットの残差 (画素 2N + 距離 N + 事前分布) を1本のベクトルで返す"""
+    K, dist, T, ir_curve = params.unpack(p)
+    R, t = T[:3, :3], T[:3, 3]
+    cam = (points_arm - t) @ R  # (N, 3) アーム -> カメラ
+    projected = project_points(cam, K[0, 0], K[1, 1], K[0, 2], K[1, 2], dist if params.fit_distortion else None)
+
+    r_pixel = ((projected - pixels) / pixel_sigma).ravel()
+    r_range = (cam[:, 2] - ir_curve_distance(ir_raw, ir_curve)) / range_sigma
+    # 内部パラメータと IR カーブは初期値の近くに弱く引き寄せる
+    # (スナップショットが少ない / 距離が偏っていても、撮っていない範囲で解が暴れないように)
+    r_prior = (p[prior_index] - prior_center) / prior_sigma
+    return np.concatenate([r_pixel, r_range, r_prior])
+
+
+def fit_calibration(snapshots, initial_K, initial_dist, initial_T, initial_ir_curve,
+                    fit_distortion=False, pixel_sigma=3.0, range_sigma=1.5, prior_sigma=None):
+    """
+    全スナップショットをまとめて最小二乗で解く
+    @param pixel_sigma, range_sigma: 検出の画素 / IR の距離の想定ノイズ (残差の重み)
+    @param prior_sigma: {パラメータ名: 初期値からのずれの許容量}。None なら _DEFAULT_PRIOR_SIGMA
+    @return (dict): 保存用の辞書 (camera, ir_curve, 残差の統計)
+    """
+    # (実行時の load_calibration だけを使う GUI 側に scipy / FK を持ち込まないよう、ここで import する)
+    from scipy.optimize import least_squares
+    from src.processing.forward_kinematics import ForwardKinematics
+
+    fk = ForwardKinematics(config.ARM_L1_CM, config.ARM_L2_CM, config.ARM_BASE_HEIGHT_CM, config.ARM_L3_CM)
+    points_arm = fk.tool_positions(snapshots["joints"])
+    pixels = snapshots["pixels"]
+    ir_raw = snapshots["ir_raw"]
+
+    params = _Parameters(fit_distortion)
+    x0 = params.pack(initial_K, initial_dist, initial_T, initial_ir_curve)
+    n_unknowns = len(x0)
+    if 3 * len(points_arm) < n_unknowns:
+        raise ValueError(f"スナップショットが足りません ({len(points_arm)} 件。少なくとも {int(np.ceil(n_unknowns / 3))} 件必要)")
+
+    prior_sigma = prior_sigma or _DEFAULT_PRIOR_SIGMA
+    prior_index = np.array([params.index[name] for name in prior_sigma])
+    args = (params, points_arm, pixels, ir_raw, pixel_sigma, range_sigma,
+            prior_index, x0[prior_index].copy(), np.array(list(prior_sigma.values()), dtype=np.float64))
+    before = _residuals(x0, *args)
+    result = least_squares(_residuals, x0, args=args, loss="soft_l1", f_scale=2.0, x_scale="jac")
+    K, dist, T, ir_curve = params.unpack(result.x)
+
+    n = len(points_arm)
+    after = _residuals(result.x, *args)
+    pixel_error = np.linalg.norm(after[:2 * n].reshape(n, 2), axis=1) * pixel_sigma
+    range_error = np.abs(after[2 * n:3 * n]) * range_sigma
+    before_pixel = np.linalg.norm(before[:2 * n].reshape(n, 2), axis=1) * pixel_sigma
+    before_range = np.abs(before[2 * n:3 * n]) * range_sigma
+
+    return {
+        "format_version": CALIBRATION_FORMAT_VERSION,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "num_snapshots": int(n),
+        "solver": {"success": bool(result.success), "message": str(result.message), "nfev": int(result.nfev)},
+        "rms": {
+            "pixel_before": float(np.sqrt(np.mean(before_pixel ** 2))),
+            "pixel_after": float(np.sqrt(np.mean(pixel_error ** 2))),
+            "range_cm_before": float(np.sqrt(np.mean(before_range ** 2))),
+            "range_cm_after": float(np.sqrt(np.mean(range_error ** 2))),
+        },
+        "camera": {
+            "K": K.tolist(),
+            "dist": dist.tolist(),
+            "T_arm_cam": T.tolist(),
+            "width": config.CAMERA_RESOLUTION_WIDTH,
+            "height": config.CAMERA_RESOLUTION_HEIGHT,
+        },
+        "ir_curve": {key: float(value) for key, value in ir_curve.items()},
+        "per_snapshot": {
+            "pixel_error": pixel_error.round(3).tolist(),
+            "range_error_cm": range_error.round(3).tolist(),
+        },
+    }
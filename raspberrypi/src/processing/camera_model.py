@@ -0,0 +1,155 @@
+"""
+camera_model.py
+キャリブレーション済みのカメラモデル (内部パラメータ + 歪み + 外部パラメータ)。
+画素 + 奥行き -> アーム座標系 の変換を、制御ループと GUI で共通に使う。
+
+- K       : 3x3 の内部パラメータ (fx, fy, cx, cy)
+- dist    : OpenCV 形式の歪み係数 (k1, k2, p1, p2, k3)
+- T_arm_cam : 4x4 の同次変換 (カメラ座標系の点 -> アーム座標系の点)
+              p_arm = R @ p_cam + t
+
+起動時に1回だけ、逆行列・回転・並進・歪み補正のマップ (cv2.remap 用) を計算しておき、
+1フレームごとの変換は (N, 2) の画素をまとめて NumPy の行列演算で行う。
+奥行きは IR センサーの距離をカメラの Z (光軸方向) とみなす。
+"""
+
+import cv2
+import numpy as np
+
+import config
+
+
+def project_points(cam_points, fx, fy, cx, cy, dist=None):
+    """
+    カメラ座標の点 -> 画素 (OpenCV と同じ歪みモデル: k1, k2, p1, p2, k3)
+    (CameraModel と、キャリブレーションの最小二乗 (calibration.py) で共通に使う)
+    @param cam_points: (N, 3) or (3,)
+    @return (ndarray): (N, 2) or (2,)
+    """
+    cam_points = np.asarray(cam_points, dtype=np.float64)
+    x = cam_points[..., 0] / cam_points[..., 2]
+    y = cam_points[..., 1] / cam_points[..., 2]
+    if dist is not None and np.any(dist):
+        k1, k2, p1, p2, k3 = dist
+        r2 = x * x + y * y
+        radial = 1.0 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        x, y = (x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x),
+                y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y)
+    return np.stack([fx * x + cx, fy * y + cy], axis=-1)
+
+
+def make_transform(rotation, translation):
+    """3x3 回転 + 並進 -> 4x4 の同次変換"""
+    T = np.eye(4)
+    T[:3, :3] = rotation
+    T[:3, 3] = translation
+    return T
+
+
+class CameraModel:
+
+    def __init__(self, K, dist, T_arm_cam, width, height):
+        """
+        @param K: 3x3 の内部パラメータ行列
+        @param dist: 歪み係数 (k1, k2, p1, p2, k3)。None なら歪みなし
+        @param T_arm_cam: 4x4 (カメラ座標系 -> アーム座標系)
+        """
+        self.K = np.asarray(K, dtype=np.float64)
+        self.dist = np.zeros(5) if dist is None else np.asarray(dist, dtype=np.float64).reshape(-1)
+        self.dist = np.pad(self.dist, (0, max(0, 5 - self.dist.size)))[:5]
+        self.T_arm_cam = np.asarray(T_arm_cam, dtype=np.float64)
+        self.width = width
+        self.height = height
+
+        # --- 毎回の変換で使う値を事前に計算 ---
+        self.fx, self.fy = self.K[0, 0], self.K[1, 1]
+        self.cx, self.cy = self.K[0, 2], self.K[1, 2]
+        self.K_inv = np.linalg.inv(self.K)
+        self.R = self.T_arm_cam[:3, :3].copy()
+        self.t = self.T_arm_cam[:3, 3].copy()
+        self.T_cam_arm = np.linalg.inv(self.T_arm_cam)
+        self.has_distortion = bool(np.any(self.dist != 0.0))
+
+        # 歪み補正のマップ (画像全体を補正するとき用。歪みなしなら不要)
+        self._map1 = self._map2 = None
+        if self.has_distortion:
+            self._map1, self._map2 = cv2.initUndistortRectifyMap(
+                self.K, self.dist, None, self.K, (width, height), cv2.CV_16SC2
+            )
+
+    @classmethod
+    def from_config(cls, calibration=None):
+        """
+        キャリブレーションファイル (config.CALIBRATION_PATH) があればその値から、
+        無ければ config.py のカメラパラメータから作る
+        @param calibration: load_calibration() の結果 (None ならここで読む)
+        """
+        if calibration is None:
+            from src.processing.calibration import load_calibration
+            calibration = load_calibration()
+        if calibration is not None and "camera" in calibration:
+            camera = calibration["camera"]
+            print(f"[CameraModel] キャリブレーション結果 ({calibration.get('created_at')}) を使います。")
+            return cls(camera["K"], camera["dist"], camera["T_arm_cam"], camera["width"], camera["height"])
+
+        K = np.array([
+            [config.CAMERA_FOCAL_LENGTH_X, 0.0, config.CAMERA_CENTER_X],
+            [0.0, config.CAMERA_FOCAL_LENGTH_Y, config.CAMERA_CENTER_Y],
+            [0.0, 0.0, 1.0],
+        ])
+        T = make_transform(config.CAMERA_ROTATION_ARM_FROM_CAM, config.CAMERA_TRANSLATION_ARM_FROM_CAM_CM)
+        return cls(K, config.CAMERA_DISTORTION_COEFFS, T,
+                   config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT)
+
+    # --- 画像 ---
+    def undistort_image(self, frame, dst=None):
+        """フレーム全体の歪みを補正する (事前計算したマップで cv2.remap。歪みなしならそのまま返す)"""
+        if not self.has_distortion:
+            return frame
+        return cv2.remap(frame, self._map1, self._map2, cv2.INTER_LINEAR, dst=dst)
+
+    # --- 画素 -> アーム座標 ---
+    def normalize_pixels(self, pixels):
+        """
+        (N, 2) 画素 -> (N, 2) 正規化座標 (歪み補正済み, Z=1 の平面上の x, y)
+        """
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        if self.has_distortion:
+            return cv2.undistortPoints(pixels.reshape(-1, 1, 2), self.K, self.dist).reshape(-1, 2)
+        return (pixels - (self.cx, self.cy)) / (self.fx, self.fy)
+
+    def pixels_to_arm(self, pixels, depths):
+        """
+        画素と奥行きの組をまとめてアーム座標に変換する
+        @param pixels: (N, 2) 画素 (px, py)
+        @param depths: (N,) カメラの奥行き [cm] (スカラーなら全点で共通)
+        @return (ndarray): (N, 3) アーム座標 [cm]
+        """
+        normalized = self.normalize_pixels(pixels)
+        depths = np.broadcast_to(np.asarray(depths, dtype=np.float64), normalized.shape[:1])
+        cam = np.empty((normalized.shape[0], 3))
+        cam[:, :2] = normalized * depths[:, None]
+        cam[:, 2] = depths
+        return cam @ self.R.T + self.t
+
+    def pixel_to_arm(self, pixel, depth):
+        """1点版: (px, py) と奥行き -> (3,) アーム座標"""
+        return self.pixels_to_arm([pixel], depth)[0]
+
+    # --- アーム座標 -> 画素 ---
+    def arm_to_camera(self, points):
+        """(N, 3) or (3,) アーム座標 -> カメラ座標"""
+        return (np.asarray(points, dtype=np.float64) - self.t) @ self.R
+
+    def arm_to_pixel(self, points):
+        """
+        アーム座標 -> 画素 (歪みを含めて投影する)
+        @param points: (N, 3) or (3,)
+        @return (ndarray): (N, 2) or (2,)
+        """
+        dist = self.dist if self.has_distortion else None
+        return project_points(self.arm_to_camera(points), self.fx, self.fy, self.cx, self.cy, dist)
+
+    def arm_to_depth(self, points):
+        """アーム座標 -> カメラの奥行き (IR センサーが測る距離) [cm]"""
+        return self.arm_to_camera(points)[..., 2]
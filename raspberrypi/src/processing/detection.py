@@ -0,0 +1,134 @@
+"""
+detection.py
+物体検出 (YOLO) の結果の後処理。
+推論結果を NumPy 配列の Detections にまとめ、クラス絞り込み・信頼度しきい値・
+最良の1件の選択・ボックス中心の計算を、1件ずつのループではなく配列演算で行う。
+
+制御ループ (real_time_control.py) と GUI (test_integrated_sys) は、
+どちらもこの Detections を受け取って使う。
+
+- from_ultralytics : ultralytics (YOLOv8 など) の Results から作る
+- from_yolov5      : torch.hub の YOLOv5 (AutoShape) の Detections から作る
+"""
+
+import numpy as np
+
+
+def build_class_index(names):
+    """
+    モデルのクラス名 {id: name} (または名前のリスト) から、小文字の名前 -> id の辞書を作る
+    (モデル読み込み時に1回だけ作っておき、毎フレームの名前探索をなくす)
+    """
+    if not isinstance(names, dict):
+        names = dict(enumerate(names))
+    return {str(name).lower(): int(class_id) for class_id, name in names.items()}
+
+
+class Detections:
+    """
+    1フレーム分の検出結果 (N 件)
+    - boxes       : (N, 4) float32 [x1, y1, x2, y2] (画素)
+    - confidences : (N,) float32
+    - class_ids   : (N,) int32
+    - names       : {class_id: name}
+    """
+
+    __slots__ = ("boxes", "confidences", "class_ids", "names")
+
+    def __init__(self, boxes, confidences, class_ids, names=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.names = names or {}
+
+    @classmethod
+    def empty(cls, names=None):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+
+    def __len__(self):
+        return self.confidences.shape[0]
+
+    def centers(self):
+        """(N, 2) のボックス中心 [画素]"""
+        return (self.boxes[:, :2] + self.boxes[:, 2:]) * 0.5
+
+    def mask(self, class_id=None, min_confidence=0.0):
+        """クラスと信頼度の条件に合う行の (N,) bool"""
+        keep = self.confidences >= min_confidence
+        if class_id is not None:
+            keep &= self.class_ids == class_id
+        return keep
+
+    def filter(self, class_id=None, min_confidence=0.0):
+        """条件に合う行だけの Detections"""
+        keep = self.mask(class_id, min_confidence)
+        return Detections(self.boxes[keep], self.confidences[keep], self.class_ids[keep], self.names)
+
+    def best(self, class_id=None, min_confidence=0.0):
+        """
+        条件に合う中で最も信頼度の高い1件の行番号
+        @return (int): 該当なしなら None
+        """
+        scores = np.where(self.mask(class_id, min_confidence), self.confidences, -1.0)
+        if scores.size == 0:
+            return None
+        index = int(np.argmax(scores))
+        return index if scores[index] >= 0.0 else None
+
+    def best_center(self, class_id=None, min_confidence=0.0):
+        """
+        最も信頼度の高い1件のボックス中心
+        @return (tuple): (cx, cy) [int] or None
+        """
+        index = self.best(class_id, min_confidence)
+        if index is None:
+            return None
+        cx, cy = self.centers()[index]
+        return (int(cx), int(cy))
+
+    def to_list(self):
+        """JSON / GUI 用の dict のリスト"""
+        centers = self.centers()
+        return [
+            {
+                "class_id": int(self.class_ids[i]),
+                "name": self.names.get(int(self.class_ids[i]), str(int(self.class_ids[i]))),
+                "confidence": float(self.confidences[i]),
+                "box": [int(v) for v in self.boxes[i]],
+                "x": int(centers[i, 0]),
+                "y": int(centers[i, 1]),
+            }
+            for i in range(len(self))
+        ]
+
+
+def _to_numpy(tensor):
+    """torch.Tensor (GPU上でもよい) / ndarray -> ndarray"""
+    if hasattr(tensor, "cpu"):
+        tensor = tensor.cpu()
+    if hasattr(tensor, "numpy"):
+        return tensor.numpy()
+    return np.asarray(tensor)
+
+
+def from_ultralytics(results):
+    """ultralytics の推論結果 (Results のリスト) -> Detections (1枚目の画像分)"""
+    result = results[0]
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return Detections.empty(result.names)
+    return Detections(
+        _to_numpy(boxes.xyxy), _to_numpy(boxes.conf), _to_numpy(boxes.cls), result.names
+    )
+
+
+def from_yolov5(results):
+    """
+    torch.hub の YOLOv5 の推論結果 -> Detections (1枚目の画像分)
+    (results.pandas() を経由せず、(N, 6) [x1, y1, x2, y2, conf, cls] のテンソルを直接使う)
+    """
+    names = results.names if isinstance(results.names, dict) else dict(enumerate(results.names))
+    pred = _to_numpy(results.xyxy[0])
+    if pred.shape[0] == 0:
+        return Detections.empty(names)
+    return Detections(pred[:, :4], pred[:, 4], pred[:, 5], names)
@@ -0,0 +1,254 @@
+"""
+detector.py
+物体検出器のバックエンドを差し替えられるようにする共通インターフェース。
+どのバックエンドも detect(BGRフレーム, imgsz=None) -> Detections (src/processing/detection.py) を返す。
+imgsz は推論サイズの希望 (ROI の切り抜きなど小さい画像を小さいサイズで推論するため)。
+入力サイズが固定の OnnxDetector は無視する。
+
+- UltralyticsDetector : ultralytics.YOLO (PyTorch の eager 実行。これまでの制御ループの方式)
+- Yolov5HubDetector   : torch.hub の YOLOv5 (これまでの GUI の方式)
+- OnnxDetector        : エクスポートした ONNX を ONNX Runtime で実行する
+                        (providers に "OpenVINOExecutionProvider" を指定すれば OpenVINO でも動く)
+                        FP32 / INT8 (benchmarks/quantize_detector.py で作る) は
+                        config.DETECTOR_ONNX_PRECISION で選ぶ
+
+どれを使うかは config.DETECTOR_BACKEND で選ぶ (create_detector())。
+
+OnnxDetector の工夫:
+- 入力サイズは固定 (エクスポート時の imgsz)。レターボックス用のキャンバスと
+  入力テンソル (1, 3, S, S) float32 は起動時に1回だけ確保し、毎フレーム上書きする
+- IO binding で入出力のバッファを ONNX Runtime に直接渡す (推論ごとの確保・コピーなし)
+- スレッド数は「CPUコア数 - 制御ループ/カメラ用に残すコア数」
+  (推論が全コアを使うと、制御ループの周期が乱れるため)
+- NMS と座標の戻しは NumPy + cv2.dnn.NMSBoxes で行う
+"""
+
+import ast
+import os
+
+import cv2
+import numpy as np
+
+import config
+from src.processing.detection import Detections, from_ultralytics, from_yolov5
+
+BACKEND_ULTRALYTICS = "ultralytics"
+BACKEND_YOLOV5_HUB = "yolov5_hub"
+BACKEND_ONNX = "onnxruntime"
+
+_LETTERBOX_COLOR = 114  # YOLO の学習時と同じ余白の色
+_MAX_WH = 7680.0        # クラスごとに NMS するためのボックスのずらし量 (画像サイズより大きい値)
+
+
+def inference_threads(reserved_cores=None):
+    """推論に使うスレッド数 (制御ループ・カメラ用に reserved_cores 個のコアを残す)"""
+    if reserved_cores is None:
+        reserved_cores = config.DETECTOR_RESERVED_CORES
+    return max(1, (os.cpu_count() or 1) - reserved_cores)
+
+
+class UltralyticsDetector:
+    """ultralytics.YOLO (.pt) をそのまま使う"""
+
+    def __init__(self, model_path, conf_threshold=0.25, iou_threshold=0.45, num_threads=None):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(num_threads or inference_threads())
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def detect(self, frame, imgsz=None):
+        """@param frame: BGR (H, W, 3) uint8"""
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        return from_ultralytics(
+            self.model(frame, conf=self.conf_threshold, iou=self.iou_threshold, verbose=False, **kwargs)
+        )
+
+    def close(self):
+        pass
+
+
+class Yolov5HubDetector:
+    """torch.hub の YOLOv5 (ローカルのクローン + カスタム重み)"""
+
+    def __init__(self, repo_dir, model_path, num_threads=None):
+        import torch
+
+        torch.set_num_threads(num_threads or inference_threads())
+        self.model = torch.hub.load(repo_dir, "custom", path=model_path, source="local", verbose=False)
+        self.model.eval()
+        names = self.model.names
+        self.names = names if isinstance(names, dict) else dict(enumerate(names))
+
+    def detect(self, frame, imgsz=None):
+        """@param frame: BGR (H, W, 3) uint8 (YOLOv5 は numpy 入力を RGB とみなすので、ここで変換する)"""
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return from_yolov5(self.model(rgb, size=imgsz) if imgsz else self.model(rgb))
+
+    def close(self):
+        pass
+
+
+class OnnxDetector:
+    """
+    固定入力サイズの YOLO ONNX モデル (ultralytics / YOLOv5 の export) を ONNX Runtime で実行する
+    出力の形式は2種類に対応:
+    - YOLOv8 形式: (1, 4 + nc, N)       [cx, cy, w, h, クラス毎のスコア...]
+    - YOLOv5 形式: (1, N, 5 + nc)       [cx, cy, w, h, obj, クラス毎のスコア...]
+    """
+
+    def __init__(self, model_path, conf_threshold=0.25, iou_threshold=0.45,
+                 num_threads=None, providers=None, names=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or inference_threads()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=providers or ["CPUExecutionProvider"]
+        )
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        _, channels, self.input_h, self.input_w = model_input.shape
+        if not all(isinstance(v, int) for v in (channels, self.input_h, self.input_w)):
+            raise ValueError(f"入力サイズが固定されていません: {model_input.shape} (dynamic=False でエクスポートしてください)")
+
+        self.names = names or self._names_from_metadata() or {}
+
+        # --- 入出力バッファ (起動時に一度だけ確保) ---
+        self._canvas = np.full((self.input_h, self.input_w, 3), _LETTERBOX_COLOR, dtype=np.uint8)
+        self._input = np.empty((1, 3, self.input_h, self.input_w), dtype=np.float32)
+        self._output = np.empty([int(v) for v in model_output.shape], dtype=np.float32)
+        self._resized = None  # 入力フレームのサイズが決まってから確保する
+        self._letterbox = None
+
+        self._binding = self.session.io_binding()
+        self._binding.bind_cpu_input(model_input.name, self._input)
+        self._output_value = ort.OrtValue.ortvalue_from_numpy(self._output)
+        self._binding.bind_ortvalue_output(model_output.name, self._output_value)
+
+        print(f"[Detector] ONNX Runtime: {os.path.basename(model_path)} "
+              f"入力 {self.input_w}x{self.input_h}, スレッド数 {options.intra_op_num_threads}, "
+              f"providers {self.session.get_providers()}")
+
+    def _names_from_metadata(self):
+        """ultralytics の export はクラス名をメタデータ "names" に入れている"""
+        raw = self.session.get_modelmeta().custom_metadata_map.get("names")
+        if not raw:
+            return None
+        try:
+            return {int(k): str(v) for k, v in ast.literal_eval(raw).items()}
+        except (ValueError, SyntaxError, AttributeError):
+            return None
+
+    def _prepare_letterbox(self, height, width):
+        """フレームサイズごとに1回だけ、縮小率と余白を計算してバッファを確保する"""
+        scale = min(self.input_w / width, self.input_h / height)
+        new_w, new_h = int(round(width * scale)), int(round(height * scale))
+        left = (self.input_w - new_w) // 2
+        top = (self.input_h - new_h) // 2
+        self._resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        self._canvas[:] = _LETTERBOX_COLOR
+        self._letterbox = (height, width, scale, left, top, new_w, new_h)
+
+    def preprocess(self, frame):
+        """
+        BGR フレーム -> 入力テンソル (レターボックス + RGB + 0..1 + CHW) を上書き
+        (INT8 量子化のキャリブレーションも、推論時と同じこの前処理を使う)
+        @return (ndarray): (1, 3, S, S) float32 の入力バッファ (次の呼び出しで上書きされる)
+        """
+        height, width = frame.shape[:2]
+        if self._letterbox is None or self._letterbox[:2] != (height, width):
+            self._prepare_letterbox(height, width)
+        _, _, _, left, top, new_w, new_h = self._letterbox
+
+        if (new_w, new_h) == (width, height):
+            self._canvas[top:top + new_h, left:left + new_w] = frame
+        else:
+            cv2.resize(frame, (new_w, new_h), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+            self._canvas[top:top + new_h, left:left + new_w] = self._resized
+        # BGR -> RGB と HWC -> CHW はビューで行い、正規化と同時に入力テンソルへ書き込む
+        np.multiply(self._canvas[..., ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._input[0])
+        return self._input
+
+    def _postprocess(self):
+        """出力 -> しきい値 -> クラスごとの NMS -> 元フレームの画素座標"""
+        output = self._output[0]
+        if output.shape[0] < output.shape[1]:
+            # YOLOv8 形式 (4 + nc, N)
+            preds = output.T
+            class_scores = preds[:, 4:]
+        else:
+            # YOLOv5 形式 (N, 5 + nc): クラスのスコアに物体らしさを掛ける
+            preds = output
+            class_scores = preds[:, 5:] * preds[:, 4:5]
+
+        class_ids = np.argmax(class_scores, axis=1)
+        confidences = class_scores[np.arange(class_scores.shape[0]), class_ids]
+        keep = confidences >= self.conf_threshold
+        if not np.any(keep):
+            return Detections.empty(self.names)
+        boxes_cxcywh = preds[keep, :4]
+        confidences = confidences[keep]
+        class_ids = class_ids[keep]
+
+        # cxcywh -> xywh (NMSBoxes 用)。クラスごとにずらして、別クラス同士は抑制しない
+        xywh = boxes_cxcywh.copy()
+        xywh[:, :2] -= xywh[:, 2:] * 0.5
+        shifted = xywh.copy()
+        shifted[:, :2] += class_ids[:, None] * _MAX_WH
+        indices = cv2.dnn.NMSBoxes(
+            shifted.tolist(), confidences.tolist(), self.conf_threshold, self.iou_threshold
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if indices.size == 0:
+            return Detections.empty(self.names)
+
+        # レターボックスを戻して元フレームの座標に
+        height, width, scale, left, top, _, _ = self._letterbox
+        boxes = np.empty((indices.size, 4), dtype=np.float32)
+        boxes[:, :2] = xywh[indices, :2]
+        boxes[:, 2:] = xywh[indices, :2] + xywh[indices, 2:]
+        boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - left) / scale, 0, width)
+        boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - top) / scale, 0, height)
+        return Detections(boxes, confidences[indices], class_ids[indices], self.names)
+
+    def detect(self, frame, imgsz=None):
+        """@param frame: BGR (H, W, 3) uint8 (imgsz は無視。入力はエクスポート時のサイズに固定)"""
+        self.preprocess(frame)
+        self.session.run_with_iobinding(self._binding)
+        return self._postprocess()
+
+    def close(self):
+        self._binding.clear_binding_inputs()
+        self._binding.clear_binding_outputs()
+
+
+def create_detector(backend=None):
+    """
+    config の設定から検出器を作る
+    @param backend: BACKEND_* (None なら config.DETECTOR_BACKEND)
+    """
+    backend = backend or config.DETECTOR_BACKEND
+    if backend == BACKEND_ULTRALYTICS:
+        return UltralyticsDetector(
+            config.YOLO_MODEL_PATH, config.DETECTOR_CONF_THRESHOLD, config.DETECTOR_IOU_THRESHOLD
+        )
+    if backend == BACKEND_YOLOV5_HUB:
+        return Yolov5HubDetector(config.YOLOV5_REPO_DIR, config.YOLO_MODEL_PATH)
+    if backend == BACKEND_ONNX:
+        return OnnxDetector(
+            config.DETECTOR_ONNX_MODEL_PATHS[config.DETECTOR_ONNX_PRECISION],
+            config.DETECTOR_CONF_THRESHOLD,
+            config.DETECTOR_IOU_THRESHOLD,
+            providers=config.DETECTOR_ONNX_PROVIDERS,
+        )
+    raise ValueError(f"未知の検出器バックエンド: {backend}")
@@ -0,0 +1,116 @@
+"""
+forward_kinematics.py
+順運動学 (Forward Kinematics, FK) とヤコビアンを計算します。
+関節角度 [土台, 肩, 肘, 手首] から、手首・グリッパー先端の (X, Y, Z) 座標を求めます。
+(kinematics.py の KinematicsSolver と同じ角度の定義を使う)
+
+角度の定義 [度]:
+- 土台   : X軸(前方)=0度、Y軸(左)=90度
+- 肩     : L1 の水平線からの仰角
+- 肘     : 曲げ角 (0=まっすぐ, 180=折りたたみ)。L2 の仰角 = 肩 - 肘
+- 手首   : 90=L2の延長線上 (例: 探索ポーズで水平)。先端の仰角 = 肩 - 肘 + (手首 - 90)
+"""
+
+import numpy as np
+
+
+class ForwardKinematics:
+    def __init__(self, arm_l1_cm, arm_l2_cm, arm_base_height_cm, arm_l3_cm=0.0):
+        """
+        @param arm_l1_cm: 肩から肘の長さ (L1)
+        @param arm_l2_cm: 肘から手首の長さ (L2)
+        @param arm_base_height_cm: 地面から肩の軸までの高さ
+        @param arm_l3_cm: 手首からグリッパー先端までの長さ (L3)
+        """
+        self.l1 = float(arm_l1_cm)
+        self.l2 = float(arm_l2_cm)
+        self.l3 = float(arm_l3_cm)
+        self.base_height = float(arm_base_height_cm)
+
+    def _joint_terms(self, joint_angles_deg):
+        """
+        (N, 3) または (N, 4) の関節角度 [度] から、計算に使う三角関数をまとめて求める
+        (手首の列が無い場合は 90度 = L2の延長線上 とみなす)
+        """
+        q = np.asarray(joint_angles_deg, dtype=np.float64)
+        q = q.reshape(-1, q.shape[-1])
+        if q.shape[1] == 3:
+            q = np.column_stack([q, np.full(q.shape[0], 90.0)])
+
+        base = np.radians(q[:, 0])
+        shoulder = np.radians(q[:, 1])
+        forearm = shoulder - np.radians(q[:, 2])       # L2 の仰角
+        tool = forearm + np.radians(q[:, 3] - 90.0)   # 先端 (L3) の仰角
+
+        return {
+            "cos_base": np.cos(base), "sin_base": np.sin(base),
+            "cos_1": np.cos(shoulder), "sin_1": np.sin(shoulder),
+            "cos_12": np.cos(forearm), "sin_12": np.sin(forearm),
+            "cos_t": np.cos(tool), "sin_t": np.sin(tool),
+        }
+
+    def _to_xyz(self, terms, reach, height):
+        """(水平リーチ, 肩からの高さ) を土台の角度で回して (N, 3) にする"""
+        return np.column_stack([
+            reach * terms["cos_base"],
+            reach * terms["sin_base"],
+            self.base_height + height,
+        ])
+
+    def wrist_positions(self, joint_angles_deg):
+        """
+        手首 (L2の先端) の座標 [cm] (アーム基準)。calculate_ik の目標点に相当する
+        @return (ndarray): (N, 3)
+        """
+        c = self._joint_terms(joint_angles_deg)
+        reach = self.l1 * c["cos_1"] + self.l2 * c["cos_12"]
+        height = self.l1 * c["sin_1"] + self.l2 * c["sin_12"]
+        return self._to_xyz(c, reach, height)
+
+    def tool_positions(self, joint_angles_deg):
+        """
+        グリッパー先端 (手首から L3) の座標 [cm] (アーム基準)
+        @return (ndarray): (N, 3)
+        """
+        c = self._joint_terms(joint_angles_deg)
+        reach = self.l1 * c["cos_1"] + self.l2 * c["cos_12"] + self.l3 * c["cos_t"]
+        height = self.l1 * c["sin_1"] + self.l2 * c["sin_12"] + self.l3 * c["sin_t"]
+        return self._to_xyz(c, reach, height)
+
+    def jacobian(self, joint_angles_deg):
+        """
+        グリッパー先端の座標の、関節角度 [土台, 肩, 肘, 手首] に対する解析ヤコビアン
+        (角度1度あたりの移動量 [cm/度])
+        @return (ndarray): (N, 3, 4)
+        """
+        c = self._joint_terms(joint_angles_deg)
+        l1, l2, l3 = self.l1, self.l2, self.l3
+
+        reach = l1 * c["cos_1"] + l2 * c["cos_12"] + l3 * c["cos_t"]
+
+        # 各関節を動かしたときの (水平リーチ, 高さ) の変化 [cm/rad]
+        # 理由: 肩はL1,L2,L3すべてを、肘はL2,L3を、手首はL3だけを回す
+        #       (肘は「曲げ角」なので、増やすと仰角が下がる = 符号が逆)
+        d_reach = np.stack([
+            -(l1 * c["sin_1"] + l2 * c["sin_12"] + l3 * c["sin_t"]),
+            l2 * c["sin_12"] + l3 * c["sin_t"],
+            -l3 * c["sin_t"],
+        ], axis=1)
+        d_height = np.stack([
+            l1 * c["cos_1"] + l2 * c["cos_12"] + l3 * c["cos_t"],
+            -(l2 * c["cos_12"] + l3 * c["cos_t"]),
+            l3 * c["cos_t"],
+        ], axis=1)
+
+        n = reach.shape[0]
+        jac = np.empty((n, 3, 4))
+        # 土台: 水平面内で半径 reach の円周方向に動く
+        jac[:, 0, 0] = -reach * c["sin_base"]
+        jac[:, 1, 0] = reach * c["cos_base"]
+        jac[:, 2, 0] = 0.0
+        # 肩・肘・手首: 鉛直面内の動きを土台の向きに回す
+        jac[:, 0, 1:] = d_reach * c["cos_base"][:, None]
+        jac[:, 1, 1:] = d_reach * c["sin_base"][:, None]
+        jac[:, 2, 1:] = d_height
+
+        return jac * (np.pi / 180.0)
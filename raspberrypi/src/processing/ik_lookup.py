@@ -0,0 +1,126 @@
+"""
+ik_lookup.py
+逆運動学 (IK) の事前計算テーブル。
+アームの作業空間を格子に区切って各格子点の関節角度と到達可否を計算しておき、
+制御ループでは三角関数の代わりに三線形補間 (trilinear) で角度を引く。
+
+テーブルはアームの形状 (L1, L2, 土台の高さ) と格子間隔をキーにした
+.npy ファイルとしてディスクにキャッシュし、メモリマップで読み込む。
+(形状を変えるとキーが変わるので、自動的に作り直される)
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+# テーブル形式を変えたらこの値を上げる (古いキャッシュを使わないため)
+TABLE_FORMAT_VERSION = 1
+
+# 補間に使う8つの格子点で、角度の差がこれより大きければ補間せずに厳密解を使う
+# (土台角度の ±180度の折り返しや、リーチ境界付近の急変を避けるため)
+MAX_CORNER_SPREAD_DEG = 10.0
+
+
+class IKLookupTable:
+    """
+    (nx, ny, nz, 4) float32 の格子テーブル。
+    最後の軸は [土台, 肩, 肘, 到達可否(1.0/0.0)]。
+    """
+
+    def __init__(self, table, origin, resolution_cm):
+        self.table = table
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.resolution = float(resolution_cm)
+        self.shape = np.array(table.shape[:3])
+
+    @staticmethod
+    def cache_key(l1, l2, base_height, resolution_cm):
+        """形状定数と格子間隔から、キャッシュファイル名用のキーを作る"""
+        text = f"v{TABLE_FORMAT_VERSION}:{l1!r}:{l2!r}:{base_height!r}:{resolution_cm!r}"
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def grid_bounds(l1, l2, base_height):
+        """作業空間 (肩を中心とした半径 L1+L2 の球) を囲む箱 (min, max)"""
+        reach = l1 + l2
+        return (
+            np.array([-reach, -reach, base_height - reach]),
+            np.array([reach, reach, base_height + reach]),
+        )
+
+    @classmethod
+    def load_or_build(cls, solver, cache_dir, resolution_cm):
+        """
+        キャッシュがあればメモリマップで読み込み、無ければ作ってから保存する
+        @param solver: KinematicsSolver (calculate_ik_batch で格子点を解く)
+        """
+        key = cls.cache_key(solver.l1, solver.l2, solver.base_height, resolution_cm)
+        path = os.path.join(cache_dir, f"ik_lut_{key}.npy")
+        origin, upper = cls.grid_bounds(solver.l1, solver.l2, solver.base_height)
+
+        if os.path.exists(path):
+            print(f"[IK-LUT] キャッシュを読み込み: {path}")
+            return cls(np.load(path, mmap_mode="r"), origin, resolution_cm)
+
+        print(f"[IK-LUT] テーブルを作成中 (格子間隔 {resolution_cm}cm)...")
+        counts = np.floor((upper - origin) / resolution_cm).astype(int) + 1
+        axes = [origin[i] + np.arange(counts[i]) * resolution_cm for i in range(3)]
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+        angles, reachable = solver.calculate_ik_batch(grid)
+        table = np.empty((grid.shape[0], 4), dtype=np.float32)
+        table[:, :3] = np.nan_to_num(angles, nan=0.0)
+        table[:, 3] = reachable
+        table = table.reshape(*counts, 4)
+
+        # 途中で落ちても壊れたキャッシュが残らないよう、一時ファイル経由で保存
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+        print(f"[IK-LUT] テーブルを保存: {path} ({table.nbytes / 1e6:.1f} MB)")
+
+        return cls(np.load(path, mmap_mode="r"), origin, resolution_cm)
+
+    def lookup(self, targets_arm):
+        """
+        (N, 3) の目標座標を三線形補間で引く
+        @return (tuple): (angles, reachable, exact_needed)
+                 angles       : (N, 3) [土台, 肩, 肘] (補間できなかった行は NaN)
+                 reachable    : (N,) bool (8つの格子点すべてが到達可能)
+                 exact_needed : (N,) bool (境界付近などで厳密解が必要な行)
+        """
+        targets = np.asarray(targets_arm, dtype=np.float64).reshape(-1, 3)
+        f = (targets - self.origin) / self.resolution
+
+        inside = np.all((f >= 0) & (f <= self.shape - 1), axis=1)
+        i0 = np.clip(np.floor(f).astype(np.intp), 0, self.shape - 2)
+        t = np.clip(f - i0, 0.0, 1.0)
+
+        # 8つの格子点を集めて重み付き和
+        values = np.zeros((targets.shape[0], 4))
+        corner_min = np.full((targets.shape[0], 4), np.inf)
+        corner_max = np.full((targets.shape[0], 4), -np.inf)
+        for dx in (0, 1):
+            wx = t[:, 0] if dx else 1.0 - t[:, 0]
+            for dy in (0, 1):
+                wy = t[:, 1] if dy else 1.0 - t[:, 1]
+                for dz in (0, 1):
+                    wz = t[:, 2] if dz else 1.0 - t[:, 2]
+                    corner = self.table[i0[:, 0] + dx, i0[:, 1] + dy, i0[:, 2] + dz]
+                    values += (wx * wy * wz)[:, None] * corner
+                    np.minimum(corner_min, corner, out=corner_min)
+                    np.maximum(corner_max, corner, out=corner_max)
+
+        all_reachable = inside & (corner_min[:, 3] > 0.5)
+        none_reachable = ~inside | (corner_max[:, 3] < 0.5)
+        smooth = np.all(corner_max[:, :3] - corner_min[:, :3] <= MAX_CORNER_SPREAD_DEG, axis=1)
+
+        reachable = all_reachable & smooth
+        exact_needed = ~reachable & ~none_reachable
+
+        angles = values[:, :3]
+        angles[~reachable] = np.nan
+        return angles, reachable, exact_needed
@@ -0,0 +1,102 @@
+"""
+ir_calibration.py
+アナログの IR 距離センサー (Sharp GP2Y0A21。Arduino の analogRead = 10bit の生の値) の
+生の値 -> 距離 [cm] の変換。
+
+- カーブ: 距離 = a / (生の値 - b) - c  (従来 GUI に直書きされていた 6762 / (raw - 9) - 4 の形)
+- fit_ir_curve(): 実測の (生の値, 本当の距離) の組からカーブの係数を最小二乗で求める
+- IrLookupTable : カーブを 10bit の全範囲 (1024 通り) で事前に計算した表。
+                  範囲外への切り詰めも表に含めるので、変換は配列の1回の参照だけ
+                  (GUI の表示、検出結果の距離、スナップショットのログで共通に使う)
+
+係数はキャリブレーションファイル (config.CALIBRATION_PATH の "ir_curve") があればそれを、
+無ければ config.IR_ANALOG_CURVE を使う。
+"""
+
+import numpy as np
+
+import config
+
+ADC_LEVELS = 1024  # Arduino の analogRead (10bit)
+
+
+def ir_curve_distance(ir_raw, curve):
+    """IR の生の値 -> 距離 [cm] (a / (raw - b) - c。切り詰めなし)"""
+    return curve["a"] / (np.asarray(ir_raw, dtype=np.float64) - curve["b"]) - curve["c"]
+
+
+def fit_ir_curve(ir_raw, distances_cm, initial_curve=None):
+    """
+    (生の値, 本当の距離) の組からカーブの係数を求める (外れ値に強い soft_l1 損失)
+    @param ir_raw: (N,) 生の値
+    @param distances_cm: (N,) 定規などで測った距離 [cm]
+    @return (tuple): (カーブ {"a", "b", "c"}, 距離の残差 (N,) [cm])
+    """
+    from scipy.optimize import least_squares
+
+    ir_raw = np.asarray(ir_raw, dtype=np.float64)
+    distances_cm = np.asarray(distances_cm, dtype=np.float64)
+    if len(ir_raw) < 3:
+        raise ValueError(f"測定の組が足りません ({len(ir_raw)} 組。少なくとも 3 組必要)")
+    initial_curve = initial_curve or config.IR_ANALOG_CURVE
+
+    def residuals(p):
+        return ir_curve_distance(ir_raw, {"a": p[0], "b": p[1], "c": p[2]}) - distances_cm
+
+    x0 = [initial_curve["a"], initial_curve["b"], initial_curve["c"]]
+    # b は測定した生の値より小さくないと、カーブが途中で発散する
+    upper_b = float(ir_raw.min()) - 1.0
+    x0[1] = min(x0[1], upper_b - 1.0)
+    result = least_squares(residuals, x0, loss="soft_l1", f_scale=1.0,
+                           bounds=([0.0, -np.inf, -np.inf], [np.inf, upper_b, np.inf]))
+    curve = {"a": float(result.x[0]), "b": float(result.x[1]), "c": float(result.x[2])}
+    return curve, residuals(result.x)
+
+
+class IrLookupTable:
+    """生の値 (0..1023) -> 距離 [cm] の表"""
+
+    def __init__(self, curve, min_cm=10.0, max_cm=80.0, levels=ADC_LEVELS):
+        """
+        @param curve: {"a", "b", "c"}
+        @param min_cm, max_cm: センサーが測れる範囲。範囲外はこの値に切り詰める
+        """
+        self.curve = dict(curve)
+        self.min_cm = min_cm
+        self.max_cm = max_cm
+
+        raw = np.arange(levels, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = ir_curve_distance(raw, curve)
+        # 生の値が b 以下 (カーブの漸近線より手前) = 反射がほとんど無い = 遠い
+        distance[raw <= curve["b"]] = max_cm
+        self.table = np.clip(distance, min_cm, max_cm).astype(np.float32)
+
+    @classmethod
+    def from_config(cls, calibration=None):
+        """
+        キャリブレーションファイルの "ir_curve" (無ければ config.IR_ANALOG_CURVE) から作る
+        @param calibration: load_calibration() の結果 (None ならここで読む)
+        """
+        if calibration is None:
+            from src.processing.calibration import load_calibration
+            calibration = load_calibration()
+        curve = config.IR_ANALOG_CURVE
+        if calibration is not None and "ir_curve" in calibration:
+            curve = calibration["ir_curve"]
+        min_cm, max_cm = config.IR_ANALOG_DISTANCE_RANGE_CM
+        return cls(curve, min_cm, max_cm)
+
+    def distance(self, ir_raw):
+        """生の値 -> 距離 [cm] (表の範囲外の値は端に丸める)"""
+        index = int(ir_raw + 0.5)
+        if index < 0:
+            index = 0
+        elif index >= len(self.table):
+            index = len(self.table) - 1
+        return float(self.table[index])
+
+    def distances(self, ir_raw):
+        """(N,) 生の値 -> (N,) 距離 [cm]"""
+        index = np.clip(np.rint(np.asarray(ir_raw)), 0, len(self.table) - 1).astype(np.intp)
+        return self.table[index]
@@ -6,6 +6,8 @@ kinematics.py (要件3対応)
 
 import numpy as np
 
+from src.processing.ik_lookup import IKLookupTable
+
 class KinematicsSolver:
     def __init__(self, arm_l1_cm, arm_l2_cm, arm_base_height_cm):
         """
@@ -24,82 +26,98 @@ class KinematicsSolver:
         # (L1^2 + L2^2) は計算中によく使うので先に計算しておく
         self.l1_sq_plus_l2_sq = self.l1**2 + self.l2**2
 
+        # 事前計算テーブル (build_lookup_table() を呼ぶまでは None)
+        self.lookup_table = None
+
         print(f"[IK] 3D Kinematics Solver 初期化完了 (L1:{self.l1}, L2:{self.l2})")
 
-    def calculate_ik(self, target_x_arm, target_y_arm, target_z_arm):
+    def calculate_ik_batch(self, targets_arm):
         """
-        目標の(X, Y, Z)座標 [cm] (アーム基準) から、
-        サーボ0(土台), 1(肩), 2(肘)の角度を計算する
+        複数の目標座標 [cm] (アーム基準) をまとめて解く (ベクトル化版)
 
-        @return (dict): {"base": int, "shoulder": int, "elbow": int}
-                       または計算不能な場合 None
+        @param targets_arm: (N, 3) の配列 [[X, Y, Z], ...]
+        @return (tuple): (angles, reachable)
+                 angles    : (N, 3) float配列 [土台, 肩, 肘] [度] (0-180にクリップ済み)
+                             到達不能な行は NaN
+                 reachable : (N,) bool配列 (アームが届くかどうか)
         """
-        try:
-            # --- 1. 土台の角度 (サーボ5) の計算 (Req 1) ---
-            # (X, Y) 平面での角度を計算
-            # 理由: X軸(前方)を0度、Y軸(左)を90度とするため、arctan2(y, x) を使用
-            theta_0_rad = np.arctan2(target_y_arm, target_x_arm)
-            theta_0_deg = np.degrees(theta_0_rad)
-
-            # --- 2. 肩と肘の角度 (サーボ1, 2) の計算 ---
-
-            # (X,Y)平面での水平リーチ長 (r) を計算
-            r = np.sqrt(target_x_arm**2 + target_y_arm**2)
-
-            # 肩の軸(0,0,base_height)から見た、目標の相対的な高さ (z_prime)
-            z_prime = target_z_arm - self.base_height
-
-            # 肩の軸から目標までの「直線距離」 (d)
-            # (ピタゴラスの定理: d^2 = r^2 + z_prime^2)
-            d_squared = r**2 + z_prime**2
-            d = np.sqrt(d_squared)
-
-            # (A) リーチチェック: そもそもアームが届くか？
-            if d > self.l1_plus_l2:
-                # print("[IK] リーチ外 (遠すぎ)")
-                return None # 遠すぎる
-            if d < self.l1_minus_l2_abs:
-                # print("[IK] リーチ外 (近すぎ)")
-                return None # 近すぎる (肘が曲がりきれない)
-
-            # (B) 肘の角度 (サーボ2) - 余弦定理
-            # 理由: L1, L2, d の3辺からなる三角形の角度(phi_2)を求める
-            cos_phi_2_arg = (self.l1**2 + self.l2**2 - d_squared) / (2 * self.l1 * self.l2)
-            # 浮動小数点誤差で 1.00001 などになるのを防ぐ
-            cos_phi_2_arg = np.clip(cos_phi_2_arg, -1.0, 1.0)
-
-            phi_2_rad = np.arccos(cos_phi_2_arg)
-
-            # 理由: サーボの角度定義 (0=まっすぐ, 180=折りたたみ) に合わせる
-            theta_2_rad = np.pi - phi_2_rad
-            theta_2_deg = np.degrees(theta_2_rad)
-
-            # (C) 肩の角度 (サーボ1) - 余弦定理
-            # 理由: 水平線からの角度(alpha)と、L1とdがなす角度(beta)の合計
-
-            # 角度 alpha (水平線(r)と、肩-目標の直線(d)がなす角度)
+        targets = np.asarray(targets_arm, dtype=np.float64).reshape(-1, 3)
+        x, y, z = targets[:, 0], targets[:, 1], targets[:, 2]
+
+        # --- 1. 土台の角度 (サーボ5) ---
+        # 理由: X軸(前方)を0度、Y軸(左)を90度とするため、arctan2(y, x) を使用
+        theta_0_deg = np.degrees(np.arctan2(y, x))
+
+        # --- 2. 肩と肘の角度 (サーボ1, 2) ---
+        # 水平リーチ長 (r)、肩の軸から見た相対的な高さ (z_prime)、直線距離 (d)
+        r = np.hypot(x, y)
+        z_prime = z - self.base_height
+        d_squared = r**2 + z_prime**2
+        d = np.sqrt(d_squared)
+
+        # (A) リーチチェック: 遠すぎ / 近すぎ (肘が曲がりきれない) / d=0 (肩の軸上)
+        reachable = (
+            np.isfinite(d)
+            & (d <= self.l1_plus_l2)
+            & (d >= self.l1_minus_l2_abs)
+            & (d > 0.0)
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # (B) 肘の角度 - 余弦定理 (0=まっすぐ, 180=折りたたみ)
+            cos_phi_2_arg = np.clip((self.l1_sq_plus_l2_sq - d_squared) / (2 * self.l1 * self.l2), -1.0, 1.0)
+            theta_2_deg = 180.0 - np.degrees(np.arccos(cos_phi_2_arg))
+
+            # (C) 肩の角度 - 水平線からの角度(alpha) + L1とdがなす角度(beta)
             alpha_rad = np.arctan2(z_prime, r)
+            cos_beta_arg = np.clip((self.l1**2 + d_squared - self.l2**2) / (2 * self.l1 * d), -1.0, 1.0)
+            theta_1_deg = np.degrees(alpha_rad + np.arccos(cos_beta_arg))
+
+        # --- 3. 最終結果の整形 (0-180 にクリップ) ---
+        angles = np.clip(np.stack([theta_0_deg, theta_1_deg, theta_2_deg], axis=1), 0.0, 180.0)
+        angles[~reachable] = np.nan
 
-            # 角度 beta (L1とdがなす角度)
-            cos_beta_arg = (self.l1**2 + d_squared - self.l2**2) / (2 * self.l1 * d)
-            cos_beta_arg = np.clip(cos_beta_arg, -1.0, 1.0)
+        return angles, reachable
 
-            beta_rad = np.arccos(cos_beta_arg)
+    def build_lookup_table(self, cache_dir, resolution_cm):
+        """
+        作業空間全体のIKテーブルを作成 (またはキャッシュから読み込み) する。
+        以降の calculate_ik / lookup_ik_batch は三線形補間で角度を引く。
+        """
+        self.lookup_table = IKLookupTable.load_or_build(self, cache_dir, resolution_cm)
 
-            # 理由: 0度=水平(前方)
-            theta_1_rad = alpha_rad + beta_rad
-            theta_1_deg = np.degrees(theta_1_rad)
+    def lookup_ik_batch(self, targets_arm):
+        """
+        calculate_ik_batch と同じ入出力で、事前計算テーブルから角度を引く。
+        補間できない行 (到達境界の近くなど) だけ厳密解で埋める。
+        """
+        if self.lookup_table is None:
+            return self.calculate_ik_batch(targets_arm)
 
-            # --- 3. 最終結果の整形 ---
-            # 角度が 0-180 の範囲に収まっているか最終クリップ
-            final_angles = {
-                "base":     int(np.clip(theta_0_deg, 0, 180)),
-                "shoulder": int(np.clip(theta_1_deg, 0, 180)),
-                "elbow":    int(np.clip(theta_2_deg, 0, 180))
-            }
+        angles, reachable, exact_needed = self.lookup_table.lookup(targets_arm)
+        if np.any(exact_needed):
+            targets = np.asarray(targets_arm, dtype=np.float64).reshape(-1, 3)
+            exact_angles, exact_reachable = self.calculate_ik_batch(targets[exact_needed])
+            angles[exact_needed] = exact_angles
+            reachable[exact_needed] = exact_reachable
+        return angles, reachable
 
-            return final_angles
+    def calculate_ik(self, target_x_arm, target_y_arm, target_z_arm):
+        """
+        目標の(X, Y, Z)座標 [cm] (アーム基準) から、
+        サーボ0(土台), 1(肩), 2(肘)の角度を計算する
+        (バッチ版の1点版。テーブル作成済みならテーブルを引く)
 
-        except Exception as e:
-            print(f"[IK] Error: 逆運動学の計算中にエラー: {e}")
+        @return (dict): {"base": int, "shoulder": int, "elbow": int}
+                       または計算不能な場合 None
+        """
+        angles, reachable = self.lookup_ik_batch([[target_x_arm, target_y_arm, target_z_arm]])
+        if not reachable[0]:
             return None
+
+        base, shoulder, elbow = angles[0]
+        return {
+            "base":     int(base),
+            "shoulder": int(shoulder),
+            "elbow":    int(elbow)
+        }
@@ -0,0 +1,197 @@
+"""
+roi_tracker.py
+ターゲットを見つけた後は、毎フレーム全画面で検出器を回さずに追跡する (track-then-detect)。
+
+1フレームごとの処理は次のどれか1つ:
+- track : 前フレームからの光学フロー (Lucas-Kanade) でボックスを動かす (数 ms)
+- crop  : redetect_interval フレームごとに、ボックスの周りを切り抜いて検出器で位置を補正する
+          (切り抜きの大きさに合わせて小さい推論サイズを使う。入力固定の ONNX は 640 のまま)
+- full  : 追跡の信頼度 (フローの往復誤差が小さい特徴点の割合) が下がった、
+          切り抜きの中に見つからなかった、まだ見つけていない、のいずれかなら全画面で検出する
+
+KCF / CSRT は opencv-contrib が必要なので、OpenCV 本体だけで動く光学フローを使う。
+返す Detections は全画面の画素座標なので、find_target_in_results はそのまま使える。
+"""
+
+import cv2
+import numpy as np
+
+from src.processing.detection import Detections
+
+MODE_FULL = "full"
+MODE_CROP = "crop"
+MODE_TRACK = "track"
+
+_LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+_MAX_FB_ERROR_PX = 1.0  # 往復 (forward-backward) で戻った点のずれの許容量 [画素]
+_MIN_POINTS = 4
+_MIN_BOX_SIZE_PX = 8
+
+
+class RoiTracker:
+
+    def __init__(self, detector, redetect_interval=5, crop_padding=0.5, crop_min_size=160,
+                 min_confidence=0.25, min_track_quality=0.5, max_features=40):
+        """
+        @param detector: src/processing/detector.py の検出器
+        @param redetect_interval: 何フレームごとに切り抜きで検出し直すか
+        @param crop_padding: 切り抜きの余白 (ボックスの幅・高さに対する割合、片側)
+        @param min_track_quality: これを下回ったら追跡をやめて全画面で探す (0..1)
+        """
+        self.detector = detector
+        self.redetect_interval = redetect_interval
+        self.crop_padding = crop_padding
+        self.crop_min_size = crop_min_size
+        self.min_confidence = min_confidence
+        self.min_track_quality = min_track_quality
+        self.max_features = max_features
+
+        self._gray = None        # グレースケールの2枚のバッファ (今回 / 前回) を交互に使う
+        self._gray_index = 0
+        self.counts = {MODE_FULL: 0, MODE_CROP: 0, MODE_TRACK: 0}
+        self.reset()
+
+    def reset(self):
+        """追跡を捨てる (次のフレームは全画面で検出する)"""
+        self._box = None         # [x1, y1, x2, y2] float32 (全画面の画素座標)
+        self._class_id = None
+        self._confidence = 0.0   # 最後に検出器が出した信頼度
+        self._quality = 0.0      # 直近の追跡の信頼度 (0..1)
+        self._points = None      # 追跡中の特徴点 (K, 1, 2) float32
+        self._prev_gray = None
+        self._frames_since_detect = 0
+
+    def pop_counts(self):
+        """(ログ用) 前回からの各モードの回数を返してリセットする"""
+        counts = dict(self.counts)
+        for mode in self.counts:
+            self.counts[mode] = 0
+        return counts
+
+    def update(self, frame, class_id):
+        """
+        1フレーム分の処理
+        @param frame: BGR (H, W, 3) uint8
+        @return (tuple): (Detections (全画面の座標), モード)
+        """
+        gray = self._to_gray(frame)
+
+        if self._box is not None and class_id == self._class_id:
+            if self._frames_since_detect + 1 < self.redetect_interval:
+                if self._track(gray):
+                    self._frames_since_detect += 1
+                    self.counts[MODE_TRACK] += 1
+                    return self._tracked_detections(), MODE_TRACK
+            else:
+                detections = self._detect_crop(frame, gray, class_id)
+                if detections is not None:
+                    self.counts[MODE_CROP] += 1
+                    return detections, MODE_CROP
+
+        # 追跡していない / 見失った -> 全画面で探す
+        self.reset()
+        detections = self.detector.detect(frame)
+        index = detections.best(class_id, self.min_confidence)
+        if index is not None:
+            self._lock(gray, detections.boxes[index], detections.confidences[index], class_id)
+        self.counts[MODE_FULL] += 1
+        return detections, MODE_FULL
+
+    def _to_gray(self, frame):
+        """BGR -> グレースケール (事前に確保した2枚を交互に使う)"""
+        height, width = frame.shape[:2]
+        if self._gray is None or self._gray.shape[1:] != (height, width):
+            self._gray = np.empty((2, height, width), dtype=np.uint8)
+        self._gray_index ^= 1
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray[self._gray_index])
+
+    def _lock(self, gray, box, confidence, class_id):
+        """検出したボックスで追跡を始める (ボックス内の特徴点を取り直す)"""
+        height, width = gray.shape
+        x1, y1, x2, y2 = np.clip(box, 0, [width, height, width, height]).astype(int)
+        points = None
+        if x2 - x1 >= _MIN_BOX_SIZE_PX and y2 - y1 >= _MIN_BOX_SIZE_PX:
+            points = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_features, 0.01, 5)
+        if points is not None:
+            points = points.astype(np.float32) + np.array([x1, y1], dtype=np.float32)
+
+        self._box = np.asarray(box, dtype=np.float32).copy()
+        self._class_id = class_id
+        self._confidence = float(confidence)
+        self._quality = 1.0
+        self._points = points
+        self._prev_gray = gray
+        self._frames_since_detect = 0
+
+    def _track(self, gray):
+        """
+        前フレームからの光学フローでボックスを動かす (移動は中央値、拡大率は点の間隔の比の中央値)
+        @return (bool): 追跡の信頼度が足りなければ False
+        """
+        if self._points is None or len(self._points) < _MIN_POINTS:
+            return False
+        points = self._points
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None, **_LK_PARAMS)
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, moved, None, **_LK_PARAMS)
+        fb_error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+        good = (status.reshape(-1) == 1) & (status_back.reshape(-1) == 1) & (fb_error < _MAX_FB_ERROR_PX)
+
+        self._quality = float(np.mean(good))
+        if self._quality < self.min_track_quality or np.count_nonzero(good) < _MIN_POINTS:
+            return False
+
+        old = points.reshape(-1, 2)[good]
+        new = moved.reshape(-1, 2)[good]
+        shift = np.median(new - old, axis=0)
+        d_old = np.linalg.norm(old[:, None] - old[None, :], axis=2)
+        d_new = np.linalg.norm(new[:, None] - new[None, :], axis=2)
+        valid = d_old > 1.0
+        scale = float(np.median(d_new[valid] / d_old[valid])) if np.any(valid) else 1.0
+
+        center = (self._box[:2] + self._box[2:]) * 0.5 + shift
+        half = (self._box[2:] - self._box[:2]) * 0.5 * scale
+        box = np.concatenate([center - half, center + half])
+
+        height, width = gray.shape
+        if not (0 <= center[0] < width and 0 <= center[1] < height) or np.any(half * 2 < _MIN_BOX_SIZE_PX):
+            return False  # 画面外に出た / 潰れた
+
+        self._box = box.astype(np.float32)
+        self._points = new.reshape(-1, 1, 2)
+        self._prev_gray = gray
+        return True
+
+    def _tracked_detections(self):
+        """追跡中のボックス1件の Detections (信頼度 = 検出時の信頼度 x 追跡の信頼度)"""
+        return Detections(
+            self._box[None], [self._confidence * self._quality], [self._class_id], self.detector.names
+        )
+
+    def _detect_crop(self, frame, gray, class_id):
+        """
+        ボックスの周りを切り抜いて検出し直す
+        @return (Detections): 全画面の座標に戻した検出結果。切り抜きに居なければ None
+        """
+        height, width = frame.shape[:2]
+        size = self._box[2:] - self._box[:2]
+        size = np.maximum(size * (1.0 + 2.0 * self.crop_padding), self.crop_min_size)
+        center = (self._box[:2] + self._box[2:]) * 0.5
+        x1, y1 = np.clip(center - size * 0.5, 0, [width, height]).astype(int)
+        x2, y2 = np.clip(center + size * 0.5, 0, [width, height]).astype(int)
+        if x2 - x1 < _MIN_BOX_SIZE_PX or y2 - y1 < _MIN_BOX_SIZE_PX:
+            return None
+
+        # 推論サイズは切り抜きの長辺を 32 の倍数に切り上げたもの (全画面の 640 より小さい)
+        imgsz = int(min(640, np.ceil(max(x2 - x1, y2 - y1) / 32.0) * 32))
+        detections = self.detector.detect(frame[y1:y2, x1:x2], imgsz=imgsz)
+        index = detections.best(class_id, self.min_confidence)
+        if index is None:
+            return None
+
+        detections.boxes += np.array([x1, y1, x1, y1], dtype=np.float32)
+        self._lock(gray, detections.boxes[index], detections.confidences[index], class_id)
+        return detections
@@ -0,0 +1,193 @@
+"""
+target_estimator.py
+ターゲットの位置を、検出 (画素) と IR (距離) から拡張カルマンフィルタ (EKF) で推定する。
+
+状態: アーム座標系の [X, Y, Z, Vx, Vy, Vz] (cm, cm/s)。等速度モデル
+      (速度の変化は白色の加速度ノイズとして扱う)
+観測: - 画素 (px, py)  : ピンホールモデルで状態から予測する (非線形 -> 数値微分でヤコビアン)
+      - 距離 d [cm]    : カメラの奥行き (IR センサーの距離)
+      画素と距離は、それぞれ届いた時刻・頻度のまま別々に更新する。
+
+- 検出が来ないフレームは predict() だけで位置を進める (max_coast_s までは見失い扱いにしない)
+- 予測から外れすぎた観測 (マハラノビス距離のゲート外) は捨てる。
+  続けて外れる場合はターゲットが入れ替わったとみなしてやり直す
+
+画素 <-> アーム座標の変換は呼び出し側から関数で渡す (カメラモデルを差し替えられるように)。
+"""
+
+import numpy as np
+
+# カイ二乗分布の 99.9% 点 (自由度 = 観測の次元)
+_GATE_CHI2 = {1: 10.83, 2: 13.82}
+_MAX_CONSECUTIVE_REJECTS = 5
+_JACOBIAN_STEP_CM = 1e-3
+
+
+class TargetEstimator:
+
+    def __init__(self, arm_to_pixel, arm_to_range, pixel_to_arm,
+                 pixel_noise_px=4.0, range_noise_cm=1.5, accel_noise_cm_s2=20.0,
+                 initial_velocity_std_cm_s=10.0, max_coast_s=0.5):
+        """
+        @param arm_to_pixel: (3,) アーム座標 -> (2,) 画素 (px, py)
+        @param arm_to_range: (3,) アーム座標 -> IR センサーが測る距離 [cm]
+        @param pixel_to_arm: ((px, py), 距離) -> (3,) アーム座標 (初期化用)
+        @param accel_noise_cm_s2: 想定する加速度の大きさ (大きいほど観測に素早く追従する)
+        @param max_coast_s: 画素の観測が無いまま予測だけで進めてよい時間 [秒]
+        """
+        self.arm_to_pixel = arm_to_pixel
+        self.arm_to_range = arm_to_range
+        self.pixel_to_arm = pixel_to_arm
+        self.pixel_noise = np.eye(2) * pixel_noise_px ** 2
+        self.range_noise = np.eye(1) * range_noise_cm ** 2
+        self.accel_noise = accel_noise_cm_s2 ** 2
+        self.initial_velocity_var = initial_velocity_std_cm_s ** 2
+        self.max_coast_s = max_coast_s
+
+        self.rejected = 0  # (ログ用) ゲートで捨てた観測の累計
+        # 最後に受け取った IR の測定時刻 (IR は別スレッドで自分の周期で測るので、
+        # 検出のたびに同じ測定が届く。同じ測定を何度も使うと距離の共分散が縮みすぎる)
+        # (reset() では消さない: 初期化に使った測定を、初期化直後にもう一度使わないように)
+        self._last_range_time = None
+        self.reset()
+
+    def reset(self):
+        """推定を捨てる (次の画素 + 距離の観測で初期化し直す)"""
+        self.x = np.zeros(6)
+        self.P = np.eye(6)
+        self.t = None
+        self.last_pixel_time = None
+        self._pending_range = None  # 初期化前に届いた距離 (時刻, 距離)
+        self._consecutive_rejects = 0
+
+    @property
+    def initialized(self):
+        return self.t is not None
+
+    def is_lost(self, now):
+        """画素の観測が max_coast_s より長く途切れたら True"""
+        return not self.initialized or now - self.last_pixel_time > self.max_coast_s
+
+    def position(self):
+        return self.x[:3].copy()
+
+    def velocity(self):
+        return self.x[3:].copy()
+
+    def range_estimate(self):
+        """推定位置での IR の距離 [cm] (生の IR の値よりノイズが少ない)"""
+        return float(self.arm_to_range(self.x[:3]))
+
+    def predict(self, now):
+        """状態を now まで進める (過去の時刻なら何もしない)"""
+        if not self.initialized:
+            return
+        dt = now - self.t
+        if dt <= 0:
+            return
+        F = np.eye(6)
+        F[:3, 3:] = np.eye(3) * dt
+        # 白色加速度ノイズ (離散化した Q)
+        q = self.accel_noise
+        Q = np.zeros((6, 6))
+        Q[:3, :3] = np.eye(3) * (dt ** 4 / 4) * q
+        Q[:3, 3:] = Q[3:, :3] = np.eye(3) * (dt ** 3 / 2) * q
+        Q[3:, 3:] = np.eye(3) * (dt ** 2) * q
+
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        self.t = now
+
+    def update_pixel(self, timestamp, pixel_coords):
+        """
+        検出の画素座標で更新する
+        (初期化前は、直近の距離の観測と組み合わせて初期化する)
+        @return (bool): 観測を使ったら True (ゲートで捨てた / 初期化できない場合は False)
+        """
+        z = np.asarray(pixel_coords, dtype=float)
+        if not self.initialized:
+            if self._pending_range is None or timestamp - self._pending_range[0] > self.max_coast_s:
+                return False  # 組み合わせられる最近の距離が無い
+            self._initialize(timestamp, z, self._pending_range[1])
+            return True
+
+        self.predict(timestamp)
+        H = self._jacobian(self.arm_to_pixel, 2)
+        innovation = z - np.asarray(self.arm_to_pixel(self.x[:3]), dtype=float)
+        if self._correct(innovation, H, self.pixel_noise):
+            self.last_pixel_time = max(self.last_pixel_time, timestamp)
+            return True
+        return False
+
+    def update_range(self, timestamp, distance_cm):
+        """
+        IR の距離で更新する (初期化前は、次の画素の観測まで取っておく)
+        前回より新しい測定 (timestamp) でなければ何もしない
+        """
+        if self._last_range_time is not None and timestamp <= self._last_range_time:
+            return False
+        self._last_range_time = timestamp
+        if not self.initialized:
+            self._pending_range = (timestamp, distance_cm)
+            return False
+        self.predict(timestamp)
+        H = self._jacobian(lambda p: [self.arm_to_range(p)], 1)
+        innovation = np.array([distance_cm - self.arm_to_range(self.x[:3])])
+        return self._correct(innovation, H, self.range_noise)
+
+    def _initialize(self, timestamp, pixel, distance_cm):
+        """画素 + 距離から位置を逆算し、速度0 (大きめの不確かさ) で始める"""
+        self.x[:3] = np.asarray(self.pixel_to_arm(pixel, distance_cm), dtype=float)
+        self.x[3:] = 0.0
+        # 位置の不確かさは、画素と距離のノイズを逆算の傾きで写したもの
+        J = self._inverse_jacobian(pixel, distance_cm)
+        R = np.zeros((3, 3))
+        R[:2, :2] = self.pixel_noise
+        R[2, 2] = self.range_noise[0, 0]
+        self.P = np.zeros((6, 6))
+        self.P[:3, :3] = J @ R @ J.T + np.eye(3) * 1e-6
+        self.P[3:, 3:] = np.eye(3) * self.initial_velocity_var
+        self.t = timestamp
+        self.last_pixel_time = timestamp
+        self._consecutive_rejects = 0
+
+    def _correct(self, innovation, H, R):
+        """カルマン更新 (ゲート外なら捨てる)。@return (bool): 更新したら True"""
+        S = H @ self.P @ H.T + R
+        S_inv = np.linalg.inv(S)
+        if float(innovation @ S_inv @ innovation) > _GATE_CHI2[len(innovation)]:
+            self.rejected += 1
+            self._consecutive_rejects += 1
+            if self._consecutive_rejects >= _MAX_CONSECUTIVE_REJECTS:
+                self.reset()  # 続けて外れる = 別の物体 / 大きく動いた
+            return False
+        self._consecutive_rejects = 0
+
+        K = self.P @ H.T @ S_inv
+        self.x = self.x + K @ innovation
+        # (Joseph 形式: 数値誤差で P が非対称・負にならないように)
+        I_KH = np.eye(6) - K @ H
+        self.P = I_KH @ self.P @ I_KH.T + K @ R @ K.T
+        return True
+
+    def _jacobian(self, fn, dim):
+        """観測関数の位置についてのヤコビアン (中心差分)。速度の列は 0"""
+        H = np.zeros((dim, 6))
+        p = self.x[:3]
+        for i in range(3):
+            step = np.zeros(3)
+            step[i] = _JACOBIAN_STEP_CM
+            H[:, i] = (np.asarray(fn(p + step), dtype=float) - np.asarray(fn(p - step), dtype=float)) / (2 * _JACOBIAN_STEP_CM)
+        return H
+
+    def _inverse_jacobian(self, pixel, distance_cm):
+        """(px, py, d) -> アーム座標 の傾き (初期化時の共分散用)"""
+        J = np.zeros((3, 3))
+        base = np.array([pixel[0], pixel[1], distance_cm], dtype=float)
+        for i in range(3):
+            step = np.zeros(3)
+            step[i] = 0.5
+            hi, lo = base + step, base - step
+            J[:, i] = (np.asarray(self.pixel_to_arm(hi[:2], hi[2]), dtype=float)
+                       - np.asarray(self.pixel_to_arm(lo[:2], lo[2]), dtype=float))
+        return J
@@ -0,0 +1,80 @@
+"""
+target_index.py
+LLM が返したターゲット名 ("りんご", "Apple", "ふね" など) を、
+検出モデルのクラスIDに解決するための索引。
+
+モデル読み込み時に1回だけ作る:
+- モデルのクラス名そのもの (正規化したもの)
+- config.TARGET_SYNONYMS の別名 (日本語・表記ゆれ・英語の言い換え)
+をすべて正規化して {名前: クラスID} の辞書にまとめる。
+解決はタスク受信時に1回だけ行い、毎フレームの処理ではクラスIDだけを使う。
+
+正規化: Unicode NFKC (全角/半角の統一) -> 小文字 -> カタカナをひらがなに ->
+        空白・"_"・"-" を除去
+"""
+
+import re
+import unicodedata
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+_KATAKANA_START, _KATAKANA_END = ord("ァ"), ord("ヶ")
+_KANA_OFFSET = ord("ァ") - ord("ぁ")
+
+
+def normalize_name(text):
+    """表記ゆれを吸収した比較用の名前"""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    text = "".join(
+        chr(ord(c) - _KANA_OFFSET) if _KATAKANA_START <= ord(c) <= _KATAKANA_END else c
+        for c in text
+    )
+    return _SEPARATORS.sub("", text)
+
+
+class TargetIndex:
+
+    def __init__(self, class_names, synonyms=None):
+        """
+        @param class_names: モデルのクラス名 {id: name} (または名前のリスト)
+        @param synonyms: {クラス名: [別名, ...]} (モデルに無いクラスの行は無視する)
+        """
+        if not isinstance(class_names, dict):
+            class_names = dict(enumerate(class_names))
+        self.class_names = {int(class_id): str(name) for class_id, name in class_names.items()}
+
+        self._index = {}
+        for class_id, name in self.class_names.items():
+            self._add(name, class_id)
+
+        for canonical, aliases in (synonyms or {}).items():
+            class_id = self._index.get(normalize_name(canonical))
+            if class_id is None:
+                continue  # このモデルが持っていないクラス
+            for alias in aliases:
+                self._add(alias, class_id)
+
+    def _add(self, name, class_id):
+        key = normalize_name(name)
+        if not key:
+            return
+        existing = self._index.setdefault(key, class_id)
+        if existing != class_id:
+            print(f"[TargetIndex] Warning: 別名 '{name}' が複数のクラスに対応しています "
+                  f"({self.class_names[existing]} / {self.class_names[class_id]})。先の定義を使います。")
+
+    def resolve(self, target_name):
+        """
+        ターゲット名 -> クラスID
+        @return (int): 見つからなければ None
+        """
+        if not target_name:
+            return None
+        key = normalize_name(target_name)
+        class_id = self._index.get(key)
+        if class_id is None and key.endswith("s"):
+            class_id = self._index.get(key[:-1])  # 英語の複数形 ("ships" -> "ship")
+        return class_id
+
+    def known_names(self):
+        """(ログ用) 解決できる名前の一覧"""
+        return sorted(self._index)
@@ -0,0 +1,139 @@
+"""
+trajectory.py
+関節空間の軌道生成。
+現在の姿勢から目標の姿勢までを、時間でパラメータ化した滑らかな軌道にする。
+(目標を一気に送って time.sleep() で待つ代わりに、一定周期で途中の角度を流すため)
+
+- minimum_jerk : 躍度最小 (加速度も連続で最も滑らか)
+- trapezoidal  : 台形速度 (最大速度・最大加速度を守る)
+
+全関節は同じ時間スケーリングを共有する (同時に動き出し、同時に止まる)。
+"""
+
+import math
+
+import numpy as np
+
+PROFILE_MINIMUM_JERK = "minimum_jerk"
+PROFILE_TRAPEZOIDAL = "trapezoidal"
+
+# 躍度最小軌道のピーク速度 = 1.875 * 移動量 / 時間
+_MIN_JERK_PEAK_VELOCITY_RATIO = 1.875
+
+
+class JointTrajectory:
+    """
+    start -> goal を duration 秒で結ぶ軌道 (全サーボ分の角度リスト)
+    """
+
+    def __init__(self, start_angles, goal_angles, duration, profile=PROFILE_MINIMUM_JERK, accel_fraction=0.5):
+        """
+        @param accel_fraction: 台形速度の加速区間が全体に占める割合 (0-0.5)
+        """
+        self.start = np.asarray(start_angles, dtype=np.float64)
+        self.goal = np.asarray(goal_angles, dtype=np.float64)
+        self.delta = self.goal - self.start
+        self.duration = float(duration)
+        self.profile = profile
+        self.accel_fraction = min(max(accel_fraction, 1e-6), 0.5)
+        self.start_time = None
+
+    def begin(self, now):
+        """ストリーミング開始時刻を記録する"""
+        self.start_time = now
+        return self
+
+    def _scaling(self, tau):
+        """正規化時間 tau (0-1) -> 進み具合 s (0-1)"""
+        tau = np.clip(tau, 0.0, 1.0)
+        if self.profile == PROFILE_TRAPEZOIDAL:
+            ta = self.accel_fraction
+            v = 1.0 / (1.0 - ta)  # 正規化したときの巡航速度
+            return np.where(
+                tau < ta,
+                0.5 * v / ta * tau**2,
+                np.where(
+                    tau <= 1.0 - ta,
+                    v * (tau - 0.5 * ta),
+                    1.0 - 0.5 * v / ta * (1.0 - tau) ** 2,
+                ),
+            )
+        return tau**3 * (10.0 - 15.0 * tau + 6.0 * tau**2)
+
+    def sample(self, times):
+        """
+        開始からの経過時間 [秒] (スカラーまたは配列) での角度
+        @return (ndarray): (サーボ数,) または (M, サーボ数)
+        """
+        t = np.asarray(times, dtype=np.float64)
+        tau = t / self.duration if self.duration > 0 else np.ones_like(t)
+        s = self._scaling(tau)
+        return self.start + np.multiply.outer(s, self.delta)
+
+    def angles_at(self, now):
+        """ストリーミング用: 時刻 now の角度 (int のリスト)"""
+        return [int(round(a)) for a in self.sample(now - self.start_time)]
+
+    def finished(self, now):
+        return self.start_time is not None and now - self.start_time >= self.duration
+
+
+class TrajectoryPlanner:
+    """
+    関節速度・加速度の上限から軌道の時間を決め、JointTrajectory を作る
+    """
+
+    def __init__(self, ik_solver, max_speed_deg_s, max_accel_deg_s2, min_duration_s=0.0,
+                 profile=PROFILE_MINIMUM_JERK):
+        self.ik = ik_solver
+        self.max_speed = float(max_speed_deg_s)
+        self.max_accel = float(max_accel_deg_s2)
+        self.min_duration = float(min_duration_s)
+        self.profile = profile
+
+    def _duration_for(self, max_delta):
+        """最も大きく動く関節が速度・加速度の上限を超えない最短時間"""
+        if max_delta <= 0.0:
+            return self.min_duration
+        if self.profile == PROFILE_TRAPEZOIDAL:
+            if max_delta >= self.max_speed**2 / self.max_accel:
+                duration = max_delta / self.max_speed + self.max_speed / self.max_accel
+            else:
+                duration = 2.0 * math.sqrt(max_delta / self.max_accel)  # 三角速度 (巡航なし)
+        else:
+            duration = max(
+                _MIN_JERK_PEAK_VELOCITY_RATIO * max_delta / self.max_speed,
+                # 躍度最小軌道のピーク加速度 = 5.77 * 移動量 / 時間^2
+                math.sqrt(5.7735 * max_delta / self.max_accel),
+            )
+        return max(duration, self.min_duration)
+
+    def plan_to_angles(self, start_angles, goal_angles):
+        """関節角度 -> 関節角度 の軌道"""
+        max_delta = float(np.max(np.abs(np.subtract(goal_angles, start_angles))))
+        duration = self._duration_for(max_delta)
+
+        accel_fraction = 0.5
+        if self.profile == PROFILE_TRAPEZOIDAL and duration > 0.0:
+            accel_fraction = min(0.5, (self.max_speed / self.max_accel) / duration)
+        return JointTrajectory(start_angles, goal_angles, duration, self.profile, accel_fraction)
+
+    def plan_to_point(self, start_angles, target_xyz, joint_ids, overrides=None):
+        """
+        アーム基準の (X, Y, Z) [cm] への軌道 (土台・肩・肘は IK で決める)
+        @param joint_ids: (土台, 肩, 肘) のサーボ番号
+        @param overrides: {サーボ番号: 角度} (手首・グリッパーなど固定したい関節)
+        @return (JointTrajectory): 到達不能なら None
+        """
+        angles_dict = self.ik.calculate_ik(*target_xyz)
+        if not angles_dict:
+            return None
+
+        goal = list(start_angles)
+        base_id, shoulder_id, elbow_id = joint_ids
+        goal[base_id] = angles_dict["base"]
+        goal[shoulder_id] = angles_dict["shoulder"]
+        goal[elbow_id] = angles_dict["elbow"]
+        for servo_id, angle in (overrides or {}).items():
+            goal[servo_id] = angle
+        return self.plan_to_angles(start_angles, goal)
@@ -0,0 +1,83 @@
+"""
+vad.py
+マイクのブロックを1つずつ受け取り、発話の区間 (通算のサンプル番号 [start, end)) を切り出す
+ストリーミングの音声区間検出 (VAD)。
+
+- 判定はブロックごとのエネルギー (RMS)。しきい値は
+  max(固定のしきい値, 周囲の雑音レベル x noise_ratio) (雑音レベルは無音の間だけ追従する)
+- 音声が end_silence_s 続けて途切れたら発話の終わり
+- 語頭が欠けないよう、始まりの pre_roll_s 前から切り出す (音声はリングバッファに残っている)
+- min_speech_s より短いもの (物音など) は捨てる。max_utterance_s を超えたら途中で区切る
+"""
+
+import numpy as np
+
+_NOISE_ADAPT = 0.05  # 雑音レベルの追従の速さ (無音のブロックごと)
+
+
+class StreamingVad:
+
+    def __init__(self, samplerate, threshold=0.01, end_silence_s=0.8, min_speech_s=0.3,
+                 pre_roll_s=0.3, max_utterance_s=15.0, noise_ratio=3.0):
+        """
+        @param threshold: 音声とみなす RMS の下限 (float の -1..1 の振幅で。config.AUDIO_SILENCE_THRESHOLD)
+        """
+        self.threshold = threshold
+        self.end_silence = int(end_silence_s * samplerate)
+        self.min_speech = int(min_speech_s * samplerate)
+        self.pre_roll = int(pre_roll_s * samplerate)
+        self.max_utterance = int(max_utterance_s * samplerate)
+        self.noise_ratio = noise_ratio
+        self.noise_level = threshold / noise_ratio
+        self.reset()
+
+    def reset(self):
+        """発話の途中の状態を捨てる (読み飛ばしが起きたときなど)"""
+        self.in_speech = False
+        self._start = 0          # 発話の始まり (pre_roll を含む)
+        self._last_voice = 0     # 最後に音声だったブロックの終わり
+        self._voiced = 0         # 発話中の音声ブロックの合計サンプル数
+
+    def current_threshold(self):
+        return max(self.threshold, self.noise_level * self.noise_ratio)
+
+    def process(self, block, end_index):
+        """
+        1ブロック分を判定する
+        @param block: (n, channels) or (n,) int16
+        @param end_index: このブロックの終わりの通算サンプル番号
+        @return (list): 確定した発話の区間 [(start, end), ...] (ほとんどのブロックでは空)
+        """
+        samples = np.asarray(block, dtype=np.float32) / 32768.0
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        n = len(block)
+        start_index = end_index - n
+        voiced = rms > self.current_threshold()
+        utterances = []
+
+        if not self.in_speech:
+            if voiced:
+                self.in_speech = True
+                self._start = max(0, start_index - self.pre_roll)
+                self._last_voice = end_index
+                self._voiced = n
+            else:
+                self.noise_level += _NOISE_ADAPT * (rms - self.noise_level)
+            return utterances
+
+        if voiced:
+            self._last_voice = end_index
+            self._voiced += n
+        elif end_index - self._last_voice >= self.end_silence:
+            # 発話の終わり (後ろは少しだけ余白を残す)
+            if self._voiced >= self.min_speech:
+                utterances.append((self._start, min(end_index, self._last_voice + self.pre_roll)))
+            self.reset()
+            return utterances
+
+        if end_index - self._start >= self.max_utterance:
+            # 長すぎるので区切って先に認識させる (発話は続いているものとして次の区間を始める)
+            utterances.append((self._start, end_index))
+            self._start = end_index
+            self._voiced = 0
+        return utterances
@@ -4,6 +4,10 @@
  * Python側の全ての制御コマンド(0x01, 0x02, 0x03)に対応するための統合スケッチ。
  * サーボ制御 (6軸) と IRセンサー読み取りの両方に対応。
  * * ★ デバッグ修正点: 冗長な Serial.print をコメントアウトし、通信負荷を軽減 ★
+ * 応答を返すコマンド (0x02, 0x03) は末尾に通し番号 SEQ (1バイト) が付く。応答にそのまま付けて返し、
+ * Python側 (serial_engine.py) はそれで要求と応答を突き合わせる。
+ *   [0xFF, 0x02, SEQ]                     -> "IR_READ:<SEQ>:<値>"
+ *   [0xFF, 0x03, A0, A1, A2, A3, A4, A5, SEQ] -> "All servos set: <SEQ>"
  */
 
 #include <Arduino.h>
@@ -31,8 +35,11 @@ enum class SerialState
     // 単軸用
     WAITING_FOR_INDEX,
     WAITING_FOR_ANGLE,
+    // IRセンサー取得用
+    WAITING_FOR_IR_SEQ,
     // 6軸同時制御用
-    WAITING_FOR_ALL_ANGLES_0_5
+    WAITING_FOR_ALL_ANGLES_0_5,
+    WAITING_FOR_ALL_ANGLES_SEQ
 };
 
 SerialState currentState = SerialState::WAITING_FOR_START;
@@ -73,13 +80,7 @@ void processIncomingByte(uint8_t byte)
         }
         else if (byte == CMD_GET_IR_SENSOR) // ★ IRセンサーコマンド処理 ★
         {
-            // --- ★ 修正点 1: 応答を返し、TX負荷をかける ★ ---
-            int sensorValue = analogRead(IR_SENSOR_PIN);
-            Serial.print("IR_READ:");
-            Serial.println(sensorValue);
-            // --- ★ 修正点 1 終わり ★ ---
-
-            currentState = SerialState::WAITING_FOR_START; // 処理後リセット
+            currentState = SerialState::WAITING_FOR_IR_SEQ; // 通し番号を待ってから応答する
         }
         else if (byte == CMD_SET_ALL_ANGLES)
         {
@@ -111,11 +112,31 @@ void processIncomingByte(uint8_t byte)
         currentState = SerialState::WAITING_FOR_START;
         break;
 
+    case SerialState::WAITING_FOR_IR_SEQ:
+    {
+        // --- ★ 修正点 1: 応答を返し、TX負荷をかける ★ ---
+        int sensorValue = analogRead(IR_SENSOR_PIN);
+        Serial.print("IR_READ:");
+        Serial.print(byte); // 通し番号
+        Serial.print(":");
+        Serial.println(sensorValue);
+        // --- ★ 修正点 1 終わり ★ ---
+
+        currentState = SerialState::WAITING_FOR_START; // 処理後リセット
+        break;
+    }
+
     case SerialState::WAITING_FOR_ALL_ANGLES_0_5:
         allAngles[angleByteCount] = byte;
         angleByteCount++;
 
         if (angleByteCount == 6)
+        {
+            currentState = SerialState::WAITING_FOR_ALL_ANGLES_SEQ; // 通し番号を待ってから実行する
+        }
+        break;
+
+    case SerialState::WAITING_FOR_ALL_ANGLES_SEQ:
         {
             // --- ★ 修正点 3: 応答をコメントアウトし、TX負荷を軽減 ★ ---
             // Serial.print("All servos set: ");
@@ -128,7 +149,8 @@ void processIncomingByte(uint8_t byte)
             // Serial.println();
 
             // 処理が成功したことだけを簡潔に Python に返す (TX LEDの連続点滅を防ぐ)
-            Serial.println("All servos set: "); // 応答を極力短くする
+            Serial.print("All servos set: "); // 応答を極力短くする
+            Serial.println(byte);              // 通し番号
 
             for (int i = 0; i < 6; i++)
             {
@@ -2,7 +2,10 @@ import serial
 import time
 import struct
 import config
-from typing import List
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from src.hardware.serial_engine import SerialEngine, CHANNEL_ACK
 
 # --- Arduinoとの通信プロトコル定義 ---
 START_BYTE = config.PACKET_HEADER
@@ -14,11 +17,13 @@ CMD_SET_ALL_ANGLES = 0x03
 class ArduinoCom:
     """
     Arduinoとのシリアル通信を管理し、コマンドを送信するクラス
+    (接続確立後の送受信はすべて SerialEngine が担当し、呼び出し側はブロックしない)
     """
     def __init__(self, port, baud_rate):
         self.port = port
         self.baud_rate = baud_rate
         self.ser = None
+        self.engine = None
         self.is_ready = False
 
     def open_and_wait_for_ready(self):
@@ -71,6 +76,10 @@ class ArduinoCom:
                 self.ser = None
                 return False
 
+            # 3. 以降の送受信はエンジン (writerキュー + readerスレッド) に任せる
+            self.engine = SerialEngine(self.ser)
+            self.engine.start()
+
             self.is_ready = True
             return True
 
@@ -78,13 +87,14 @@ class ArduinoCom:
             print(f"[ArduinoCom] エラー: ポート再オープン失敗または通信エラー: {e}")
             return False
 
-    def send_servo_command(self, servo_index: int, angle: int) -> bool:
+    def send_servo_command(self, servo_index: int, angle: int) -> Optional[Future]:
         """
-        単一のサーボ角度コマンドを送信し、Arduinoの実行応答を待つ。
+        単一のサーボ角度コマンドを送信キューに積む。
+        (Arduino側は単軸コマンドに応答しないため、書き込み完了で Future が完了する)
         """
-        if not self.ser or not self.is_ready:
+        if not self.engine or not self.is_ready:
             print("[ArduinoCom] エラー: 通信が確立されていません。")
-            return False
+            return None
 
         angle = max(0, min(180, angle))
 
@@ -95,70 +105,41 @@ class ArduinoCom:
             servo_index,
             angle
         )
-
-        try:
-            self.ser.flushInput()
-            self.ser.write(packet)
-
-            self.ser.timeout = 1
-            response = self.ser.readline().decode('utf-8').strip()
-
-            if response.startswith(f"Executing: Servo {servo_index}"):
-                print(f"[ArduinoCom] 実行完了: {response}")
-                return True
-            else:
-                print(f"[ArduinoCom] 警告: 予期せぬ応答: {response}")
-                return False
-
-        except Exception as e:
-            print(f"[ArduinoCom] 送信エラー: {e}")
-            return False
+        return self.engine.submit(packet)
 
     # ★ 新規追加: 6軸同時制御コマンド (app.pyが依存) ★
-    def send_multi_servo_command(self, angles: List[int]) -> bool:
+    def send_multi_servo_command(self, angles: List[int],
+                                 callback: Optional[Callable[[Future], None]] = None) -> Optional[Future]:
         """
         6軸すべてのサーボ角度を同時に送信する。
-        プロトコル: [0xFF, 0x03, A0, A1, A2, A3, A4, A5] (計8バイト)
+        プロトコル: [0xFF, 0x03, A0, A1, A2, A3, A4, A5, SEQ] (計9バイト。SEQ は SerialEngine が付ける)
+        応答 "All servos set: <SEQ>" を待たずに Future を返す
+        (応答が届くと True で完了、届かなければ TimeoutError で完了する)。
         """
-        if not self.ser or not self.is_ready:
+        if not self.engine or not self.is_ready:
             print("[ArduinoCom] エラー: 通信が確立されていません。")
-            return False
+            return None
 
         if len(angles) != 6:
             print(f"[ArduinoCom] エラー: 角度リストは6要素必要です ({len(angles)}を受け取り)。")
-            return False
+            return None
 
         # 0-180の範囲にクリップ
         clipped_angles = [max(0, min(180, a)) for a in angles]
 
-        # 8バイトのバイナリパケットを作成
+        # 8バイトのバイナリパケットを作成 (末尾の通し番号は SerialEngine が付ける)
         packet = struct.pack(
             '<BBBBBBBB',
             START_BYTE,
             CMD_SET_ALL_ANGLES,
             *clipped_angles
         )
-
-        try:
-            self.ser.flushInput()
-            self.ser.write(packet)
-
-            # Arduinoからの実行応答を待つ (例: "All servos set: 90, 90...")
-            self.ser.timeout = 1
-            response = self.ser.readline().decode('utf-8').strip()
-
-            if response.startswith("All servos set:"):
-                # print(f"[ArduinoCom] 6軸実行完了: {response}")
-                return True
-            else:
-                print(f"[ArduinoCom] 警告: 6軸制御で予期せぬ応答: {response}")
-                return False
-
-        except Exception as e:
-            print(f"[ArduinoCom] 6軸送信エラー: {e}")
-            return False
+        return self.engine.submit(packet, expect=CHANNEL_ACK, callback=callback)
 
     def close(self):
+        if self.engine:
+            self.engine.stop()
+            self.engine = None
         if self.ser:
             self.ser.close()
             self.is_ready = False
@@ -39,7 +39,18 @@ REALTIME_PY_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/setup_p
 # --- 依存モジュール (変更なし) ---
 ARD_COM_FILE_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/setup_programs/test_integrated_sys/arduino_com.py"
 IR_SENSOR_FILE_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/setup_programs/test_integrated_sys/ir_sensor.py"
+SERIAL_ENGINE_FILE_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/setup_programs/test_integrated_sys/serial_engine.py"
 CAMERA_MODULE_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/hardware/camera.py"
+# フレームバス (CameraProcess -> 各プロセス の共有メモリ) は src/core に置く
+FRAME_BUS_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/core/frame_bus.py"
+CAMERA_PROCESS_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/core/camera_process.py"
+LATENCY_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/core/latency.py"
+# 検出結果の後処理 (GUIと制御ループで共通) は src/processing に置く
+DETECTION_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/processing/detection.py"
+DETECTOR_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/processing/detector.py"
+CAMERA_MODEL_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/processing/camera_model.py"
+CALIBRATION_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/processing/calibration.py"
+IR_CALIBRATION_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/src/processing/ir_calibration.py"
 PYTHON_CONFIG_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/config.py"
 
 
@@ -95,7 +106,7 @@ RSYNC_CMD="sshpass -e ssh $SSH_OPTS"
 # ステップ1: ラズパイ側に作業ディレクトリと依存フォルダを作成
 echo " STEP 1: RPi側に作業ディレクトリと依存フォルダを作成中..."
 # src/hardware と models フォルダを作成
-sshpass -e ssh $SSH_OPTS "$REMOTE_USER_HOST" "mkdir -p $REMOTE_WORK_DIR/src/hardware $REMOTE_WORK_DIR/models"
+sshpass -e ssh $SSH_OPTS "$REMOTE_USER_HOST" "mkdir -p $REMOTE_WORK_DIR/src/hardware $REMOTE_WORK_DIR/src/core $REMOTE_WORK_DIR/src/processing $REMOTE_WORK_DIR/models"
 echo "✅ ディレクトリ確認 完了。"
 
 # ステップ2: ファイル転送 (Mac -> RPi)
@@ -109,13 +120,25 @@ rsync -avz --delete -e "$RSYNC_CMD" "$TEMP_BUILD_DIR/" "$REMOTE_USER_HOST:$REMOT
 REMOTE_HARDWARE_PATH="$REMOTE_WORK_DIR/src/hardware"
 
 echo " - Python 依存モジュール転送 (src/hardware)..."
-# arduino_com.py, ir_sensor.py, camera.py を src/hardware に転送
+# arduino_com.py, ir_sensor.py, serial_engine.py, camera.py を src/hardware に転送
 rsync -avz -e "$RSYNC_CMD" \
     "$ARD_COM_FILE_SRC" \
     "$IR_SENSOR_FILE_SRC" \
+    "$SERIAL_ENGINE_FILE_SRC" \
     "$CAMERA_MODULE_SRC" \
     "$REMOTE_USER_HOST:$REMOTE_HARDWARE_PATH/"
 
+echo " - Python 依存モジュール転送 (src/core)..."
+# frame_bus.py, camera_process.py, latency.py を src/core に転送
+rsync -avz -e "$RSYNC_CMD" \
+    "$FRAME_BUS_SRC" \
+    "$CAMERA_PROCESS_SRC" \
+    "$LATENCY_SRC" \
+    "$REMOTE_USER_HOST:$REMOTE_WORK_DIR/src/core/"
+
+echo " - Python 依存モジュール転送 (src/processing)..."
+rsync -avz -e "$RSYNC_CMD" "$DETECTION_SRC" "$DETECTOR_SRC" "$CAMERA_MODEL_SRC" "$CALIBRATION_SRC" "$IR_CALIBRATION_SRC" "$REMOTE_USER_HOST:$REMOTE_WORK_DIR/src/processing/"
+
 # --- ★ 修正点: メインアプリの転送ロジックを変更 ★ ---
 echo " - Python メインアプリ (main.py, orchestrator.py, realtime.py) をルートに転送..."
 # 3つのコアファイルを RPiの $REMOTE_WORK_DIR/ へ転送
@@ -130,6 +153,14 @@ rsync -avz -e "$RSYNC_CMD" \
 echo " - Python 設定ファイル (config.py) 転送..."
 rsync -avz -e "$RSYNC_CMD" "$PYTHON_CONFIG_SRC" "$REMOTE_USER_HOST:$REMOTE_WORK_DIR/"
 
+# ハンドアイキャリブレーションの結果 (benchmarks/calibrate_hand_eye.py が作る。あれば転送)
+CALIBRATION_FILE_SRC="/Users/yutoseki/develop/private-dev/iot-pj/robot-arm-pj/raspberrypi/models/calibration/current.json"
+if [ -f "$CALIBRATION_FILE_SRC" ]; then
+    echo " - キャリブレーションファイル (current.json) 転送..."
+    sshpass -e ssh $SSH_OPTS "$REMOTE_USER_HOST" "mkdir -p $REMOTE_WORK_DIR/models/calibration"
+    rsync -avz -e "$RSYNC_CMD" "$CALIBRATION_FILE_SRC" "$REMOTE_USER_HOST:$REMOTE_WORK_DIR/models/calibration/"
+fi
+
 # 2c. YOLOv5 モデルとコードベース転送 (変更なし)
 echo " - YOLOv5 コードベース転送..."
 sshpass -e ssh $SSH_OPTS "$REMOTE_USER_HOST" "mkdir -p $REMOTE_WORK_DIR/yolov5"
@@ -7,6 +7,9 @@ import sys
 try:
     from orchestrator_process import OrchestratorProcess
     from real_time_control_process import RealTimeControlProcess
+    from src.core.frame_bus import FrameBus
+    from src.core.camera_process import CameraProcess
+    import config
 except ImportError:
     print("[Main] エラー: orchestrator_process.py または real_time_control_process.py が見つかりません。")
     sys.exit(1)
@@ -24,14 +27,27 @@ def main():
     # 'd' = double (浮動小数点数)
     ir_value_shared = mp.Value('d', 0.0)
 
+    # 3. CameraProcess -> 各プロセス への「カメラフレーム」共有用バス (共有メモリ)
+    frame_bus = FrameBus.create(
+        config.FRAME_BUS_NAME, config.FRAME_BUS_SLOTS,
+        config.CAMERA_RESOLUTION_HEIGHT, config.CAMERA_RESOLUTION_WIDTH,
+    )
+
     try:
+        # --- カメラプロセス (フレームバスへの書き込み) の作成 ---
+        camera_process = CameraProcess(
+            config.FRAME_BUS_NAME, config.CAMERA_ID,
+            config.CAMERA_RESOLUTION_WIDTH, config.CAMERA_RESOLUTION_HEIGHT,
+        )
+
         # --- プロセスA (リアルタイム制御/脊髄) の作成 ---
         process_a = RealTimeControlProcess(task_queue, ir_value_shared)
 
         # --- プロセスB (API・思考/頭脳) の作成 ---
-        process_b = OrchestratorProcess(task_queue, ir_value_shared)
+        process_b = OrchestratorProcess(task_queue, ir_value_shared, config.FRAME_BUS_NAME)
 
         print("[Main] 両プロセスを開始します...")
+        camera_process.start()
         process_a.start()
         process_b.start()
 
@@ -59,6 +75,12 @@ def main():
             process_a.terminate()
             process_a.join(timeout=3)
 
+        if 'camera_process' in locals() and camera_process.is_alive():
+            print("[Main] カメラプロセスを終了します...")
+            camera_process.terminate()
+            camera_process.join(timeout=3)
+
+        frame_bus.close()
         print("[Main] システムをシャットダウンしました。")
 
 if __name__ == "__main__":
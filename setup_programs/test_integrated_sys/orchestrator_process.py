@@ -5,13 +5,16 @@ import time
 import base64
 from flask import Flask, render_template_string, Response, request, jsonify
 import threading
-import torch
 import traceback
 import json
 from typing import List
 
 # --- 必要なハードウェアモジュール ---
-from src.hardware.camera import Camera
+# (カメラは CameraProcess が持ち、フレームはフレームバスから読む)
+from src.core.frame_bus import FrameBus
+from src.processing.detector import create_detector
+from src.processing.camera_model import CameraModel
+from src.processing.ir_calibration import IrLookupTable
 # (ArduinoCom と ir_sensor は RealTime プロセスが担当するので、ここではインポートしない)
 import config
 
@@ -20,11 +23,19 @@ import config
 # ==============================================================================
 
 app = Flask(__name__)
-camera = None
+frame_bus = None
 yolo_model = None
+camera_model = None
+ir_table = None  # IR の生の値 -> 距離 [cm] の表 (GUI表示・検出結果・スナップショットのログで共通)
 g_current_target = None
 g_target_lock = threading.Lock()
 
+# 推論スレッドが公開する最新の結果 (g_latest_cond で保護)
+g_latest_cond = threading.Condition()
+g_latest_seq = 0            # 公開ごとに+1
+g_latest_jpeg = None        # 注釈付きフレーム (JPEG)
+g_latest_detections = []    # 検出リスト
+
 task_queue_mp = None
 ir_value_shared_mp = None
 
@@ -73,6 +84,11 @@ def apply_servo_constraints(angle_list: List[int]) -> List[int]:
 
 
 # --- YOLOv5 処理とフレーム生成 (カメラ/YOLO担当) ---
+# 推論はバックグラウンドの1スレッド (inference_worker) だけが行い、
+# 注釈付きJPEGと検出リストを「最新の結果」として公開する。
+# /video_feed の各クライアントはその結果を配るだけなので、
+# ブラウザのタブを増やしても推論の回数は増えない。
+
 @app.route('/video_feed')
 def video_feed():
     """ カメラ映像のストリーム (M-JPEG) """
@@ -80,69 +96,65 @@ def video_feed():
                     mimetype = "multipart/x-mixed-replace; boundary=frame")
 
 def generate_frames():
-    global camera, g_current_target, yolo_model
+    """ 各HTTPクライアント用: 新しい結果が公開されるたびに、そのJPEGを送る """
+    last_seq = 0
+    while True:
+        with g_latest_cond:
+            if not g_latest_cond.wait_for(lambda: g_latest_seq > last_seq, timeout=1.0):
+                continue # (推論スレッドが止まっていても接続は保つ)
+            last_seq = g_latest_seq
+            jpeg = g_latest_jpeg
 
-    if camera is None:
-        try:
-            camera = Camera(
-                config.CAMERA_ID,
-                config.CAMERA_RESOLUTION_WIDTH,
-                config.CAMERA_RESOLUTION_HEIGHT
-            )
-            print("[Orchestrator] カメラ初期化完了。")
-        except Exception as e:
-            print(f"[Orchestrator] [FATAL] カメラ初期化エラー: {e}")
-            return
+        # ストリームとして返す
+        yield(b'--frame\r\n'
+              b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+def inference_worker():
+    """ バックグラウンドスレッド: フレームバスの最新フレームで推論し、結果を公開する """
+    global g_current_target, yolo_model, g_latest_seq, g_latest_jpeg, g_latest_detections
 
+    last_frame_seq = 0
     while True:
-        ret, frame = camera.get_frame()
-        if not ret:
-            print("[Orchestrator] カメラフレーム取得失敗。")
-            time.sleep(0.2)
+        ref = frame_bus.wait_latest(last_frame_seq, timeout=0.5)
+        if ref is None:
+            print("[Orchestrator] カメラフレーム取得失敗 (フレームバスが更新されていません)。")
             continue
+        last_frame_seq = ref.seq
+        # バスのフレームは読み取り専用なので、描画用にコピーする
+        frame = ref.frame.copy()
 
         # 1. YOLOv5 推論
         detections = []
         if yolo_model:
             try:
-                results = yolo_model(frame)
-                df = results.pandas().xyxy[0]
+                # (検出器は BGR を受け取り、必要な色変換はバックエンド側で行う)
+                # クラス0・信頼度0.5超の絞り込みは配列演算で行い、残った数件だけを描画する
+                found = yolo_model.detect(frame).filter(class_id=0, min_confidence=0.5)
                 raw_ir_value = ir_value_shared_mp.value
 
-                for _, row in df.iterrows():
-                    cls = int(row['class'])
-                    conf = float(row['confidence'])
-
-                    if cls == 0 and conf > 0.5:
-                        x1, y1, x2, y2 = map(int, [row['xmin'], row['ymin'], row['xmax'], row['ymax']])
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                        # 距離計算
-                        if raw_ir_value < 80:
-                            distance_cm = 80.0
-                        elif raw_ir_value > 550:
-                            distance_cm = 10.0
-                        else:
-                            try:
-                                distance_cm = (6762 / (raw_ir_value - 9)) - 4
-                                if distance_cm > 80.0: distance_cm = 80.0
-                                if distance_cm < 10.0: distance_cm = 10.0
-                            except ZeroDivisionError:
-                                distance_cm = 80.0
-
-                        center_x = (x1 + x2) // 2
-                        center_y = (y1 + y2) // 2
-                        label = f"Ship: {conf:.2f} | IR:{raw_ir_value:.0f} | D:{distance_cm:.1f}cm"
-                        cv2.putText(frame, label, (x1, y1 - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                        detections.append({
-                            'x': center_x,
-                            'y': center_y,
-                            'distance_cm': distance_cm,
-                            'ir_value': raw_ir_value,
-                            'confidence': conf
-                        })
+                # 距離 (フレーム内の全検出で同じIR値を使うので1回だけ。範囲の切り詰めも表に含まれる)
+                distance_cm = ir_table.distance(raw_ir_value)
+
+                # 全検出のボックス中心をまとめてアーム座標に変換 (制御ループと同じカメラモデル)
+                arm_coords = camera_model.pixels_to_arm(found.centers(), distance_cm)
+
+                for det, arm_xyz in zip(found.to_list(), arm_coords):
+                    x1, y1, x2, y2 = det['box']
+                    conf = det['confidence']
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+                    label = f"Ship: {conf:.2f} | IR:{raw_ir_value:.0f} | D:{distance_cm:.1f}cm"
+                    cv2.putText(frame, label, (x1, y1 - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+                    detections.append({
+                        'x': det['x'],
+                        'y': det['y'],
+                        'distance_cm': distance_cm,
+                        'ir_value': raw_ir_value,
+                        'confidence': conf,
+                        'arm_xyz': [round(float(v), 2) for v in arm_xyz],
+                    })
             except Exception as e:
                 print(f"[Orchestrator] YOLO推論エラー: {e}")
                 traceback.print_exc()
@@ -165,19 +177,27 @@ def generate_frames():
                         cx, cy = g_current_target['x'], g_current_target['y']
                         cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
 
-        # 3. フレームをJPEGにエンコード
+        # 3. フレームをJPEGにエンコード (エンコードも全クライアントで1回だけ)
         (flag, encodedImage) = cv2.imencode(".jpg", frame)
         if not flag:
             continue
 
-        # 4. ストリームとして返す
-        yield(b'--frame\r\n'
-              b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encodedImage) + b'\r\n')
-
-        time.sleep(0.01) # 映像ストリームの負荷軽減
+        # 4. 最新の結果として公開し、待っている全クライアントを起こす
+        with g_latest_cond:
+            g_latest_seq += 1
+            g_latest_jpeg = encodedImage.tobytes()
+            g_latest_detections = detections
+            g_latest_cond.notify_all()
 
 
 # --- Flask Routes (API) ---
+@app.route('/api/detections')
+def api_detections():
+    """ 最新の検出リスト取得API (推論スレッドが公開した結果を読むだけ) """
+    with g_latest_cond:
+        return jsonify({'seq': g_latest_seq, 'detections': g_latest_detections})
+
+
 @app.route('/api/move_only', methods=['POST'])
 def api_move_only():
     """ 新API: アームを動かす指示のみ (ログ記録なし) """
@@ -222,6 +242,7 @@ def api_snapshot_log():
         'user_angles': user_angles,
         'arduino_angles': arduino_angles, # ログ記録時に最終的な物理角度も記録
         'ir_raw': ir_raw,
+        'ir_distance_cm': ir_table.distance(ir_raw),  # (記録時のカーブでの距離。キャリブレーションは ir_raw を使う)
         'target_detection': target_data,
         'log_type': 'MANUAL_SNAPSHOT'
     }
@@ -243,9 +264,14 @@ def api_snapshot_log():
 
 @app.route('/api/ir_value')
 def api_ir_value():
-    """ IRセンサー値取得API (共有メモリから読むだけ) """
+    """ IRセンサー値取得API (共有メモリから読み、距離は表で変換する) """
     ir_value = ir_value_shared_mp.value
-    return jsonify({'ir_raw': ir_value})
+    return jsonify({
+        'ir_raw': ir_value,
+        'distance_cm': ir_table.distance(ir_value),
+        'min_cm': ir_table.min_cm,
+        'max_cm': ir_table.max_cm,
+    })
 
 
 @app.route('/')
@@ -369,19 +395,10 @@ HTML_TEMPLATE = """
                 const data = await response.json();
                 const rawValue = data.ir_raw;
                 irRawDisplay.textContent = rawValue.toFixed(0);
-                let estimatedDistance = "---";
-                if (rawValue < 80) { estimatedDistance = "80.0+"; }
-                else if (rawValue > 550) { estimatedDistance = "<10.0"; }
-                else {
-                    try {
-                        let dist = (6762 / (rawValue - 9)) - 4;
-                        if (dist > 80.0) dist = 80.0;
-                        if (dist < 10.0) dist = 10.0;
-                        estimatedDistance = dist.toFixed(1);
-                    } catch (e) {
-                        estimatedDistance = "Calc Err";
-                    }
-                }
+                // 距離はサーバー側で表 (IrLookupTable) から引いた値をそのまま表示する
+                let estimatedDistance = data.distance_cm.toFixed(1);
+                if (data.distance_cm >= data.max_cm) { estimatedDistance = data.max_cm.toFixed(1) + "+"; }
+                else if (data.distance_cm <= data.min_cm) { estimatedDistance = "<" + data.min_cm.toFixed(1); }
                 distanceCmDisplay.textContent = estimatedDistance;
             } catch (error) {
                 irRawDisplay.textContent = "COMM ERROR";
@@ -485,35 +502,38 @@ class OrchestratorProcess(mp.Process):
     オーケストレータープロセス (頭脳)
     - Flaskサーバー、YOLO推論、カメラ処理を担当
     """
-    def __init__(self, task_queue, ir_value_shared):
+    def __init__(self, task_queue, ir_value_shared, frame_bus_name):
         super().__init__()
         self.task_queue = task_queue
         self.ir_value_shared = ir_value_shared
+        self.frame_bus_name = frame_bus_name
 
     def run(self):
         """ プロセスのメイン実行内容 """
-        global yolo_model, task_queue_mp, ir_value_shared_mp
+        global yolo_model, camera_model, ir_table, task_queue_mp, ir_value_shared_mp, frame_bus
 
         task_queue_mp = self.task_queue
         ir_value_shared_mp = self.ir_value_shared
-
-        print("[Orchestrator] YOLOv5モデルをロード中...")
+        frame_bus = FrameBus.attach(self.frame_bus_name)
+        camera_model = CameraModel.from_config()
+        ir_table = IrLookupTable.from_config()
+        curve = ir_table.curve
+        print(f"[Orchestrator] IR 距離の表: 距離 = {curve['a']:.1f} / (raw - {curve['b']:.2f}) - {curve['c']:.2f} "
+              f"({ir_table.min_cm:.0f}〜{ir_table.max_cm:.0f} cm)")
+
+        print(f"[Orchestrator] YOLOv5モデルをロード中 (バックエンド: {config.GUI_DETECTOR_BACKEND})...")
         try:
-            yolo_model = torch.hub.load(
-                '/home/yutoseki/robot_arm_project/yolov5',
-                'custom',
-                path='/home/yutoseki/robot_arm_project/models/best.pt',
-                source='local',
-                force_reload=True,
-                verbose=False
-            )
-            yolo_model.eval()
+            # (torch.hub / ONNX Runtime の切り替えは config.GUI_DETECTOR_BACKEND で行う)
+            yolo_model = create_detector(config.GUI_DETECTOR_BACKEND)
             print("[Orchestrator] YOLOv5モデル ロード完了。")
         except Exception:
             print("[Orchestrator] [FATAL] YOLOv5モデル ロード失敗:")
             traceback.print_exc()
             return
 
+        # 推論はこのスレッド1本だけで行う (HTTPクライアントは結果を配るだけ)
+        threading.Thread(target=inference_worker, name="InferenceWorker", daemon=True).start()
+
         print("[Orchestrator] Web GUIを起動します (http://0.0.0.0:5000)...")
         try:
             app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
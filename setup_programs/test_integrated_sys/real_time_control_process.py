@@ -3,7 +3,7 @@ import time
 
 # --- 必要なハードウェアモジュール ---
 from src.hardware.arduino_com import ArduinoCom
-from src.hardware.ir_sensor import get_ir_sensor_reading
+from src.hardware.ir_sensor import request_ir_sensor_reading
 import config
 
 class RealTimeControlProcess(mp.Process):
@@ -12,12 +12,14 @@ class RealTimeControlProcess(mp.Process):
     - Arduinoとのシリアル通信を専有する
     - Orchestrator (頭脳) からの角度指示をキューで待つ
     - IRセンサーの値を定期的に読み取り、共有メモリに書き込む
+    (シリアルの送受信は SerialEngine に任せ、このループは応答を待たない)
     """
     def __init__(self, task_queue, ir_value_shared):
         super().__init__()
         self.task_queue = task_queue
         self.ir_value_shared = ir_value_shared
         self.arduino_com = None
+        self.ir_future = None  # 応答待ちのIR要求 (同時に1つだけ)
 
     def setup(self):
         """ Arduinoの接続をセットアップ """
@@ -32,6 +34,21 @@ class RealTimeControlProcess(mp.Process):
             print("[RealTime] [FATAL ERROR] Arduinoの接続に失敗しました。")
             return False
 
+    def _on_multi_servo_done(self, future):
+        """ 6軸コマンドの応答 (SerialEngineのreaderスレッド上で呼ばれる) """
+        if future.exception() is not None:
+            print(f"[RealTime] 警告: 6軸制御の応答なし: {future.exception()}")
+
+    def _on_ir_reading(self, future):
+        """ IR値の応答 (SerialEngineのreaderスレッド上で呼ばれる) """
+        if future.exception() is not None:
+            print(f"[IR Sensor] 警告: {future.exception()}")
+            return
+        raw_val = future.result()
+        if raw_val > 0.0:
+            # 共有メモリの値をアトミックに更新
+            self.ir_value_shared.value = raw_val
+
     def run(self):
         """ プロセスのメイン実行ループ """
         if not self.setup():
@@ -49,8 +66,8 @@ class RealTimeControlProcess(mp.Process):
                     angles_to_set = self.task_queue.get(block=False)
 
                     if angles_to_set and len(angles_to_set) == 6:
-                        # Arduinoに6軸同時制御コマンドを送信
-                        self.arduino_com.send_multi_servo_command(angles_to_set)
+                        # Arduinoに6軸同時制御コマンドを送信 (応答はコールバックで確認)
+                        self.arduino_com.send_multi_servo_command(angles_to_set, callback=self._on_multi_servo_done)
                         # print(f"[RealTime] アーム動作実行: {angles_to_set}") # デバッグ用
 
                 except mp.queues.Empty:
@@ -59,11 +76,9 @@ class RealTimeControlProcess(mp.Process):
 
                 # --- 2. IRセンサーの値を読み取り、Orchestratorと共有 ---
                 # センサーポーリングは 200ms ごと (50ms * 4)
-                if loop_counter % 4 == 0:
-                    raw_val = get_ir_sensor_reading(self.arduino_com.ser)
-                    if raw_val > 0.0:
-                        # 共有メモリの値をアトミックに更新
-                        self.ir_value_shared.value = raw_val
+                # 前回の要求の応答がまだなら、新しい要求は積まない
+                if loop_counter % 4 == 0 and (self.ir_future is None or self.ir_future.done()):
+                    self.ir_future = request_ir_sensor_reading(self.arduino_com.engine, callback=self._on_ir_reading)
 
                 loop_counter += 1
 
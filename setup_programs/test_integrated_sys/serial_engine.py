@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import serial
+
+# --- 応答の種類 (チャネル) ---
+CHANNEL_ACK = "ack"   # "All servos set: <seq>" (6軸同時制御の実行応答)
+CHANNEL_IR = "ir"     # "IR_READ:<seq>:<値>"
+CHANNEL_LOG = "log"   # 上記以外 (起動ログ、デバッグ出力など)
+
+
+def classify_line(line: str):
+    """
+    Arduinoからの1行を (チャネル, 通し番号, 値) に分類する。
+    通し番号を返さない古いスケッチの応答 ("IR_READ:<値>", "All servos set:") は通し番号 None。
+    """
+    if line.startswith("IR_READ:"):
+        fields = line.split(":")[1:]
+        try:
+            if len(fields) == 2:
+                return CHANNEL_IR, int(fields[0]), float(fields[1])
+            return CHANNEL_IR, None, float(fields[0])
+        except ValueError:
+            return CHANNEL_LOG, None, line
+    if line.startswith("All servos set:"):
+        seq = line.split(":", 1)[1].strip()
+        return CHANNEL_ACK, int(seq) if seq.isdigit() else None, True
+    return CHANNEL_LOG, None, line
+
+
+class SerialEngine:
+    """
+    シリアルポートを専有し、書き込みキュー1本と読み取りスレッド1本で
+    非同期に送受信するエンジン。
+
+    - 送信はすべて submit() 経由でキューに積み、writerスレッドだけが書き込む
+    - readerスレッドは受信行をチャネルごとに振り分ける
+    - 応答を期待する要求には通し番号(seq, 1バイト)を振ってパケットの末尾に付けて送り、
+      Arduinoが応答に付けて返した通し番号と突き合わせて Future を完了させる
+      (タイムアウトした要求の応答が遅れて届いても、次の要求の応答と取り違えない)
+    - 通し番号を返さない古いスケッチの応答は、チャネルの未完了要求のうち最も古いものと突き合わせる
+      (タイムアウトした数だけ、遅れて届く応答を読み捨ててから突き合わせる)
+
+    flushInput()/reset_input_buffer() は使わない。捨てると他の要求の応答まで消えるため。
+    """
+
+    def __init__(self, ser: serial.Serial, response_timeout: float = 0.5):
+        self.ser = ser
+        self.response_timeout = response_timeout
+
+        self._write_queue = queue.Queue()
+        # チャネル -> {seq: (Future, 締め切り)} (送信順)
+        self._pending = {CHANNEL_ACK: OrderedDict(), CHANNEL_IR: OrderedDict()}
+        # (通し番号の無い応答用) タイムアウトした要求の数 = これから遅れて届くかもしれない応答の数
+        self._timed_out = {CHANNEL_ACK: 0, CHANNEL_IR: 0}
+        self._pending_lock = threading.Lock()
+        self._listeners = {CHANNEL_ACK: [], CHANNEL_IR: [], CHANNEL_LOG: []}
+        self._seq = 0
+        self._stop_event = threading.Event()
+
+        self._writer = threading.Thread(target=self._writer_loop, name="SerialWriter", daemon=True)
+        self._reader = threading.Thread(target=self._reader_loop, name="SerialReader", daemon=True)
+
+    # ------------------------------------------------------------------
+    # 公開API
+    # ------------------------------------------------------------------
+    def start(self):
+        # readline() を使わずに読むので、短いタイムアウトで十分
+        self.ser.timeout = 0.05
+        self._writer.start()
+        self._reader.start()
+        print("[SerialEngine] 送信/受信スレッドを開始しました。")
+
+    def stop(self):
+        self._stop_event.set()
+        self._write_queue.put(None)  # writerの待機を解除
+        for t in (self._writer, self._reader):
+            if t.is_alive():
+                t.join(timeout=1.0)
+        self._fail_all_pending(RuntimeError("SerialEngine stopped"))
+        print("[SerialEngine] 送信/受信スレッドを停止しました。")
+
+    def submit(self, packet: bytes, expect: Optional[str] = None,
+               callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        パケットを書き込みキューに積み、すぐに Future を返す。
+
+        @param expect: 応答を待つチャネル (CHANNEL_ACK / CHANNEL_IR)。
+                       指定した場合は packet の末尾に通し番号 (1バイト) を付けて送る。
+                       None なら書き込み完了時点で Future を完了する。
+        @param callback: Future 完了時に呼ぶ関数 (readerスレッド上で呼ばれる)
+        """
+        future = Future()
+        with self._pending_lock:
+            self._seq = (self._seq + 1) & 0xFF
+            future.seq = self._seq
+        if callback:
+            future.add_done_callback(callback)
+
+        if self._stop_event.is_set():
+            future.set_exception(RuntimeError("SerialEngine stopped"))
+            return future
+
+        self._write_queue.put((packet, expect, future))
+        return future
+
+    def add_listener(self, channel: str, callback: Callable):
+        """要求と無関係に届く行も含め、チャネルの全受信値を callback(value) で受け取る"""
+        self._listeners[channel].append(callback)
+
+    # ------------------------------------------------------------------
+    # writer スレッド
+    # ------------------------------------------------------------------
+    def _writer_loop(self):
+        while not self._stop_event.is_set():
+            item = self._write_queue.get()
+            if item is None:
+                break
+            packet, expect, future = item
+
+            if expect:
+                packet = packet + bytes([future.seq])
+                # 応答が書き込みより先に届いても取りこぼさないよう、先に登録する
+                deadline = time.time() + self.response_timeout
+                with self._pending_lock:
+                    self._pending[expect][future.seq] = (future, deadline)
+
+            try:
+                self.ser.write(packet)
+            except (serial.SerialException, OSError) as e:
+                print(f"[SerialEngine] 送信エラー: {e}")
+                if expect:
+                    with self._pending_lock:
+                        self._pending[expect].pop(future.seq, None)
+                self._resolve(future, exception=e)
+                continue
+
+            if not expect:
+                self._resolve(future, result=True)
+
+    # ------------------------------------------------------------------
+    # reader スレッド
+    # ------------------------------------------------------------------
+    def _reader_loop(self):
+        buffer = bytearray()
+        while not self._stop_event.is_set():
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                print(f"[SerialEngine] 受信エラー: {e}")
+                break
+
+            if chunk:
+                buffer.extend(chunk)
+                while True:
+                    newline = buffer.find(b"\n")
+                    if newline < 0:
+                        break
+                    line = buffer[:newline].decode("utf-8", errors="ignore").strip()
+                    del buffer[:newline + 1]
+                    if line:
+                        self._dispatch(line)
+
+            self._expire_pending()
+
+    def _dispatch(self, line: str):
+        channel, seq, value = classify_line(line)
+
+        if channel in self._pending:
+            with self._pending_lock:
+                entry = self._pop_pending(channel, seq)
+            if entry:
+                self._resolve(entry[0], result=value)
+            elif seq is not None:
+                print(f"[SerialEngine] タイムアウト後に届いた応答を破棄: {line}")
+        elif channel == CHANNEL_LOG and not self._listeners[CHANNEL_LOG]:
+            print(f"[ArduinoLog] {value}")
+
+        for listener in self._listeners[channel]:
+            try:
+                listener(value)
+            except Exception as e:
+                print(f"[SerialEngine] リスナーでエラー: {e}")
+
+    def _expire_pending(self):
+        now = time.time()
+        expired = []
+        with self._pending_lock:
+            for channel, pending in self._pending.items():
+                while pending:
+                    seq, (future, deadline) = next(iter(pending.items()))
+                    if deadline >= now:
+                        break
+                    del pending[seq]
+                    self._timed_out[channel] += 1
+                    expired.append(future)
+        for future in expired:
+            self._resolve(future, exception=TimeoutError(f"seq {future.seq}: 応答タイムアウト"))
+
+    # ------------------------------------------------------------------
+    # 内部ヘルパー
+    # ------------------------------------------------------------------
+    def _pop_pending(self, channel, seq):
+        """応答に対応する未完了要求を取り出す (_pending_lock を持って呼ぶ)。無ければ None"""
+        pending = self._pending[channel]
+        if seq is not None:
+            self._timed_out[channel] = 0  # 通し番号を返すスケッチなら、読み捨ての数えは要らない
+            return pending.pop(seq, None)
+        # 通し番号の無い応答: タイムアウトした要求の応答が先に届くので、その数だけ読み捨てる
+        if self._timed_out[channel] > 0:
+            self._timed_out[channel] -= 1
+            return None
+        return pending.popitem(last=False)[1] if pending else None
+
+    def _fail_all_pending(self, exception):
+        with self._pending_lock:
+            futures = [e[0] for q in self._pending.values() for e in q.values()]
+            for q in self._pending.values():
+                q.clear()
+        for future in futures:
+            self._resolve(future, exception=exception)
+
+    @staticmethod
+    def _resolve(future: Future, result=None, exception=None):
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)